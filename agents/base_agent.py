@@ -4,17 +4,42 @@ from llm.llm_interface import LLMInterface
 class BaseAgent(ABC):
     """所有Agent的基类"""
     
+    # 不随检查点保存的属性（LLM接口及运行时资源），子类可扩展
+    transient_attributes = ('llm_interface',)
+    
     def __init__(self, name, civilization_id=None, llm_interface=None):
         self.name = name
         self.civilization_id = civilization_id  # None表示系统级Agent
         self.llm_interface = llm_interface or LLMInterface()
         self.memory = []  # Agent的记忆/历史
+        self.advice_gate = None  # 顾问建议复用（utils.advice_gate.AdviceGate），None表示每回合都重新生成
         
     def add_to_memory(self, event):
         """添加事件到Agent记忆"""
         self.memory.append(event)
         # 可能需要限制记忆大小或实现更复杂的记忆管理
         
+    def get_state(self):
+        """导出可恢复的Agent状态，不含LLM接口、运行时资源和对其他Agent的引用"""
+        return {key: value for key, value in vars(self).items()
+                if key not in self.transient_attributes and not _is_agent_reference(value)}
+    
+    def set_state(self, state):
+        """恢复get_state导出的状态"""
+        for key, value in state.items():
+            setattr(self, key, value)
+    
+    def reusable_advice(self, world_state, inputs):
+        """提示词输入与上次生成建议时相同（或在容差内）时返回上次的建议，否则返回None"""
+        if self.advice_gate is None:
+            return None
+        return self.advice_gate.lookup(world_state.current_turn, inputs)
+    
+    def remember_advice(self, world_state, inputs, advice):
+        """记录新生成的建议及其提示词输入，供之后的回合复用"""
+        if self.advice_gate is not None:
+            self.advice_gate.store(world_state.current_turn, inputs, advice)
+    
     def get_memory_context(self, limit=10):
         """获取记忆上下文用于LLM提示"""
         return self.memory[-limit:] if len(self.memory) > limit else self.memory
@@ -24,9 +49,15 @@ class BaseAgent(ABC):
         """处理当前世界状态并做出决策"""
         pass
     
-    def generate_decision(self, prompt, context=None):
+    def generate_decision(self, prompt, context=None, **kwargs):
         """使用LLM生成决策"""
         if context is None:
             context = self.get_memory_context()
         
-        return self.llm_interface.generate_response(prompt, context) 
\ No newline at end of file
+        return self.llm_interface.generate_response(prompt, context, **kwargs) 
+
+def _is_agent_reference(value):
+    """判断属性是否为对其他Agent的引用（单个Agent或Agent字典）"""
+    if isinstance(value, BaseAgent):
+        return True
+    return isinstance(value, dict) and bool(value) and all(isinstance(v, BaseAgent) for v in value.values())
\ No newline at end of file
@@ -1,5 +1,10 @@
 from agents.base_agent import BaseAgent
 from llm.prompt_templates import CULTURAL_ADVICE_TEMPLATE
+from llm.llm_interface import StructuredOutputError
+from llm.rate_limiter import PRIORITY_CRITICAL
+from utils.logger import get_logger
+
+logger = get_logger(__name__)
 
 class CulturalAgent(BaseAgent):
     """负责文化事务的Agent"""
@@ -17,18 +22,25 @@ class CulturalAgent(BaseAgent):
         cultural_trends = self._analyze_cultural_trends(world_state)
         research_opportunities = self._analyze_research_opportunities(world_state)
         
-        prompt = CULTURAL_ADVICE_TEMPLATE.format(
-            minister_name=self.name,
-            cultural_style=self.cultural_style,
-            civilization_state=civilization_state,
-            cultural_achievements=self.cultural_achievements,
-            research_projects=self.research_projects,
-            cultural_influence=self.cultural_influence,
-            cultural_trends=cultural_trends,
-            research_opportunities=research_opportunities
-        )
+        inputs = {
+            'minister_name': self.name,
+            'cultural_style': self.cultural_style,
+            'civilization_state': civilization_state,
+            'cultural_achievements': self.cultural_achievements,
+            'research_projects': self.research_projects,
+            'cultural_influence': self.cultural_influence,
+            'cultural_trends': cultural_trends,
+            'research_opportunities': research_opportunities
+        }
+        
+        # 输入没有明显变化时沿用上次的建议
+        advice = self.reusable_advice(world_state, inputs)
+        if advice is not None:
+            return advice
         
+        prompt = CULTURAL_ADVICE_TEMPLATE.format(**inputs)
         advice = self.generate_decision(prompt)
+        self.remember_advice(world_state, inputs, advice)
         
         # 记录到记忆
         self.add_to_memory({
@@ -39,12 +51,32 @@ class CulturalAgent(BaseAgent):
         
         return advice
     
+    def heuristic_advice(self, world_state):
+        """不调用LLM的确定性文化建议：研究前提条件最多（影响最大）的可研究技术，没有时发展教育"""
+        research_opportunities = self._analyze_research_opportunities(world_state)
+        
+        orders = []
+        if research_opportunities:
+            # max取第一个最大值，技术表顺序固定，结果确定
+            best = max(research_opportunities, key=lambda o: len(o['prerequisites']))
+            orders.append({'type': 'research', 'target': best['technology'], 'resources': 20, 'priority': 2})
+        else:
+            orders.append({'type': 'education', 'target': None, 'resources': 10, 'priority': 3})
+        
+        return {
+            'research_opportunities': research_opportunities,
+            'orders': orders
+        }
+    
     def process(self, world_state, **kwargs):
         """处理当前回合的文化事务"""
         leader_decision = kwargs.get('leader_decision', '')
         
-        # 分析领导决策中的文化指令
-        cultural_orders = self._extract_cultural_orders(leader_decision)
+        # 分析领导决策中的文化指令；结构化决策已包含命令列表时直接使用
+        if isinstance(leader_decision, dict) and 'cultural_orders' in leader_decision:
+            cultural_orders = leader_decision['cultural_orders']
+        else:
+            cultural_orders = self._extract_cultural_orders(leader_decision)
         
         # 执行文化行动
         actions = []
@@ -139,11 +171,14 @@ class CulturalAgent(BaseAgent):
                             "priority": "number"
                         }
                     ]
-                }
+                },
+                task="extraction",
+                priority=PRIORITY_CRITICAL
             )
-            return response.get("cultural_orders", [])
-        except:
-            # 如果结构化解析失败，返回空列表
+            return response["cultural_orders"]
+        except StructuredOutputError as e:
+            # 结构化解析失败时本回合不执行文化命令，但要明确报告而不是静默忽略
+            logger.warning(f"{self.name} could not extract cultural orders: {e}")
             return []
     
     def _execute_cultural_order(self, order, world_state):
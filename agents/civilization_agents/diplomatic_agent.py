@@ -23,15 +23,22 @@ class DiplomaticAgent(BaseAgent):
         civilization_state = world_state.get_civilization_state(self.civilization_id)
         other_civs = world_state.get_other_civilizations(self.civilization_id)
         
-        prompt = DIPLOMATIC_ADVICE_TEMPLATE.format(
-            diplomat_name=self.name,
-            diplomatic_style=self.diplomatic_style,
-            civilization_state=civilization_state,
-            other_civilizations=other_civs,
-            current_relations=self.relations
-        )
+        inputs = {
+            'diplomat_name': self.name,
+            'diplomatic_style': self.diplomatic_style,
+            'civilization_state': civilization_state,
+            'other_civilizations': other_civs,
+            'current_relations': self.relations
+        }
         
+        # 输入没有明显变化时沿用上次的建议
+        advice = self.reusable_advice(world_state, inputs)
+        if advice is not None:
+            return advice
+        
+        prompt = DIPLOMATIC_ADVICE_TEMPLATE.format(**inputs)
         advice = self.generate_decision(prompt)
+        self.remember_advice(world_state, inputs, advice)
         
         # 记录到记忆
         self.add_to_memory({
@@ -42,8 +49,29 @@ class DiplomaticAgent(BaseAgent):
         
         return advice
         
+    def heuristic_advice(self, world_state):
+        """不调用LLM的确定性外交建议：与关系最差（且为负）的文明缓和关系"""
+        other_civs = world_state.get_other_civilizations(self.civilization_id)
+        
+        orders = []
+        if other_civs:
+            worst = min(other_civs, key=lambda civ_id: (self.relations.get(civ_id, 0), str(civ_id)))
+            if self.relations.get(worst, 0) < 0:
+                orders.append({
+                    'type': 'negotiate',
+                    'target': worst,
+                    'topic': 'improve_relations',
+                    'stance': 'conciliatory',
+                    'priority': 2
+                })
+        
+        return {
+            'relations': dict(self.relations),
+            'orders': orders
+        }
+        
     def negotiate(self, other_diplomat, world_state, topic):
-        """与其他文明的外交Agent进行谈判"""
+        """与其他文明的外交Agent进行谈判，LLM调用失败时抛出LLMError由调用方处理"""
         our_civ = world_state.get_civilization_state(self.civilization_id)
         their_civ = world_state.get_civilization_state(other_diplomat.civilization_id)
         current_relation = self.relations.get(other_diplomat.civilization_id, 0)
@@ -81,8 +109,25 @@ class DiplomaticAgent(BaseAgent):
                 action = self._initiate_diplomatic_action(civ_id, relation, world_state)
                 diplomatic_actions.append(action)
         
+        # 执行结构化领导决策中的外交命令
+        leader_decision = kwargs.get('leader_decision')
+        if isinstance(leader_decision, dict):
+            for order in leader_decision.get('diplomatic_orders', []):
+                action = self._execute_diplomatic_order(order, world_state)
+                if action:
+                    diplomatic_actions.append(action)
+        
         return diplomatic_actions
     
+    def _execute_diplomatic_order(self, order, world_state):
+        """执行领导下达的外交命令"""
+        # 实现外交命令执行逻辑
+        return {
+            'action': order.get('type', 'diplomacy'),
+            'details': order,
+            'result': 'pending'
+        }
+    
     def _should_initiate_diplomacy(self, civ_id, relation):
         """决定是否应该主动与某文明进行外交"""
         # 这里可以实现更复杂的逻辑
@@ -1,5 +1,10 @@
 from agents.base_agent import BaseAgent
 from llm.prompt_templates import ECONOMIC_ADVICE_TEMPLATE
+from llm.llm_interface import StructuredOutputError
+from llm.rate_limiter import PRIORITY_CRITICAL
+from utils.logger import get_logger
+
+logger = get_logger(__name__)
 
 class EconomicAgent(BaseAgent):
     """负责经济事务的Agent"""
@@ -17,18 +22,25 @@ class EconomicAgent(BaseAgent):
         economic_trends = self._analyze_economic_trends(world_state)
         trade_opportunities = self._analyze_trade_opportunities(world_state)
         
-        prompt = ECONOMIC_ADVICE_TEMPLATE.format(
-            treasurer_name=self.name,
-            economic_style=self.economic_style,
-            civilization_state=civilization_state,
-            resources=self.resources,
-            infrastructure=self.infrastructure,
-            trade_agreements=self.trade_agreements,
-            economic_trends=economic_trends,
-            trade_opportunities=trade_opportunities
-        )
+        inputs = {
+            'treasurer_name': self.name,
+            'economic_style': self.economic_style,
+            'civilization_state': civilization_state,
+            'resources': self.resources,
+            'infrastructure': self.infrastructure,
+            'trade_agreements': self.trade_agreements,
+            'economic_trends': economic_trends,
+            'trade_opportunities': trade_opportunities
+        }
+        
+        # 输入没有明显变化时沿用上次的建议
+        advice = self.reusable_advice(world_state, inputs)
+        if advice is not None:
+            return advice
         
+        prompt = ECONOMIC_ADVICE_TEMPLATE.format(**inputs)
         advice = self.generate_decision(prompt)
+        self.remember_advice(world_state, inputs, advice)
         
         # 记录到记忆
         self.add_to_memory({
@@ -39,12 +51,34 @@ class EconomicAgent(BaseAgent):
         
         return advice
     
+    def heuristic_advice(self, world_state):
+        """不调用LLM的确定性经济建议：优先与贸易机会最多的文明建立贸易，否则建设基础设施"""
+        trade_opportunities = self._analyze_trade_opportunities(world_state)
+        
+        orders = []
+        if trade_opportunities:
+            counts = {}
+            for opportunity in trade_opportunities:
+                counts[opportunity['civilization_id']] = counts.get(opportunity['civilization_id'], 0) + 1
+            partner = min(counts, key=lambda civ_id: (-counts[civ_id], str(civ_id)))
+            orders.append({'type': 'trade', 'target': partner, 'resources': 20, 'priority': 2})
+        else:
+            orders.append({'type': 'build', 'target': None, 'resources': 20, 'priority': 3})
+        
+        return {
+            'trade_opportunities': trade_opportunities,
+            'orders': orders
+        }
+    
     def process(self, world_state, **kwargs):
         """处理当前回合的经济事务"""
         leader_decision = kwargs.get('leader_decision', '')
         
-        # 分析领导决策中的经济指令
-        economic_orders = self._extract_economic_orders(leader_decision)
+        # 分析领导决策中的经济指令；结构化决策已包含命令列表时直接使用
+        if isinstance(leader_decision, dict) and 'economic_orders' in leader_decision:
+            economic_orders = leader_decision['economic_orders']
+        else:
+            economic_orders = self._extract_economic_orders(leader_decision)
         
         # 执行经济行动
         actions = []
@@ -122,11 +156,14 @@ class EconomicAgent(BaseAgent):
                             "priority": "number"
                         }
                     ]
-                }
+                },
+                task="extraction",
+                priority=PRIORITY_CRITICAL
             )
-            return response.get("economic_orders", [])
-        except:
-            # 如果结构化解析失败，返回空列表
+            return response["economic_orders"]
+        except StructuredOutputError as e:
+            # 结构化解析失败时本回合不执行经济命令，但要明确报告而不是静默忽略
+            logger.warning(f"{self.name} could not extract economic orders: {e}")
             return []
     
     def _execute_economic_order(self, order, world_state):
@@ -1,27 +1,103 @@
 from agents.base_agent import BaseAgent
-from llm.prompt_templates import LEADER_DECISION_TEMPLATE
+from llm.prompt_templates import LEADER_DECISION_TEMPLATE, LEADER_STRUCTURED_DECISION_INSTRUCTIONS
+from llm.llm_interface import LLMError, StructuredOutputError, DeadlineExceeded
+from llm.rate_limiter import PRIORITY_CRITICAL
+from llm.deadline import note_degradation
+from utils.concurrency import map_concurrently
+from models.decision import build_decision, SOURCE_HEURISTIC
+from utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+# 通用命令格式，与各部门提取命令时使用的格式一致
+ORDER_FORMAT = {
+    "type": "string",
+    "target": "string or null",
+    "resources": "number",
+    "priority": "number"
+}
+
+# 结构化领导决策格式：摘要 + 各部门可直接执行的命令列表
+LEADER_DECISION_FORMAT = {
+    "summary": "string",
+    "military_orders": [ORDER_FORMAT],
+    "economic_orders": [ORDER_FORMAT],
+    "cultural_orders": [ORDER_FORMAT],
+    "diplomatic_orders": [
+        {
+            "type": "string",
+            "target": "string or null",
+            "topic": "string",
+            "stance": "string",
+            "priority": "number"
+        }
+    ]
+}
 
 class LeaderAgent(BaseAgent):
     """文明的领导Agent，负责最终决策"""
     
-    def __init__(self, name, civilization_id, leadership_style, llm_interface=None):
+    transient_attributes = ('llm_interface', 'surrogate')
+    
+    def __init__(self, name, civilization_id, leadership_style, llm_interface=None, structured_decision=False,
+                 surrogate=None, surrogate_threshold=0.8, advice_workers=1):
         super().__init__(name, civilization_id, llm_interface)
         self.leadership_style = leadership_style  # 例如：独裁、民主、军事等
         self.advisors = {}  # 存储顾问Agent的引用
+        # 为True时领导直接输出结构化决策（见LEADER_DECISION_FORMAT），各部门无需再调用LLM提取命令
+        self.structured_decision = structured_decision
+        # 决策代理模型（models.surrogate.DecisionSurrogate），置信度达到阈值时直接采用，不再咨询顾问和调用LLM
+        self.surrogate = surrogate
+        self.surrogate_threshold = surrogate_threshold
+        self.surrogate_decisions = 0  # 采用代理模型决策的次数
+        self.llm_decisions = 0  # 调用LLM决策的次数
+        self.last_advice = {}  # 各顾问最近一次的建议，回合时间不足时沿用
+        self.advice_workers = advice_workers  # 并发征询顾问的线程数，1表示依次征询
         
     def register_advisor(self, role, agent):
         """注册顾问Agent"""
         self.advisors[role] = agent
         
     def collect_advice(self, world_state):
-        """从所有顾问收集建议"""
-        advice = {}
-        for role, advisor in self.advisors.items():
-            advice[role] = advisor.provide_advice(world_state)
-        return advice
+        """从所有顾问收集建议（advice_workers大于1时并发征询）
+        
+        回合时间不足或LLM调用失败时沿用该顾问上一次的建议，没有时使用启发式建议。
+        """
+        roles = list(self.advisors)
+        results = map_concurrently(lambda role: self._advice_from(role, world_state), roles, self.advice_workers)
+        return dict(zip(roles, results))
+    
+    def _advice_from(self, role, world_state):
+        advisor = self.advisors[role]
+        try:
+            advice = advisor.provide_advice(world_state)
+            self.last_advice[role] = advice
+            return advice
+        except LLMError as e:
+            if not isinstance(e, DeadlineExceeded):
+                logger.warning(f"{advisor.name} could not provide advice: {e}")
+            if role in self.last_advice:
+                note_degradation('advice', 'previous_advice', {'civilization_id': self.civilization_id, 'role': role})
+                return self.last_advice[role]
+            note_degradation('advice', 'heuristic_advice', {'civilization_id': self.civilization_id, 'role': role})
+            return advisor.heuristic_advice(world_state)
         
     def process(self, world_state, **kwargs):
         """处理当前状态并做出领导决策"""
+        # 常规局面先查询代理模型
+        if self.surrogate is not None:
+            decision, confidence = self.surrogate.predict(self.civilization_id, world_state.civilization_states)
+            if confidence >= self.surrogate_threshold:
+                decision['confidence'] = confidence
+                self.surrogate_decisions += 1
+                self.add_to_memory({
+                    'turn': world_state.current_turn,
+                    'type': 'decision',
+                    'content': decision
+                })
+                return decision
+        self.llm_decisions += 1
+        
         # 收集所有顾问的建议
         advice = self.collect_advice(world_state)
         
@@ -38,8 +114,17 @@ class LeaderAgent(BaseAgent):
             population_feedback=advice.get('population', 'No feedback')
         )
         
-        # 使用LLM生成决策
-        decision = self.generate_decision(prompt)
+        # 使用LLM生成决策（回合关键路径），回合时间耗尽或LLM调用失败时改用启发式决策
+        try:
+            if self.structured_decision:
+                decision = self._generate_structured_decision(prompt)
+            else:
+                decision = self.generate_decision(prompt, priority=PRIORITY_CRITICAL)
+        except LLMError as e:
+            if not isinstance(e, DeadlineExceeded):
+                logger.warning(f"{self.name} could not make a decision, using heuristic decision: {e}")
+            note_degradation('leader', 'heuristic_decision', {'civilization_id': self.civilization_id})
+            return self.heuristic_decision(world_state)
         
         # 记录决策到记忆
         self.add_to_memory({
@@ -48,4 +133,69 @@ class LeaderAgent(BaseAgent):
             'content': decision
         })
         
-        return decision 
\ No newline at end of file
+        return decision
+    
+    def heuristic_decision(self, world_state):
+        """不调用LLM的确定性领导决策（快进模式）
+        
+        汇总各顾问的heuristic_advice，生成与LEADER_DECISION_FORMAT相同结构的决策，
+        各部门直接执行其中的命令，无需再提取。
+        """
+        advice = {role: advisor.heuristic_advice(world_state) for role, advisor in self.advisors.items()}
+        military = advice.get('military', {})
+        population = advice.get('population', {})
+        
+        orders = {
+            'military_orders': list(military.get('orders', [])),
+            'economic_orders': list(advice.get('economic', {}).get('orders', [])),
+            'cultural_orders': list(advice.get('cultural', {}).get('orders', [])),
+            'diplomatic_orders': list(advice.get('diplomatic', {}).get('orders', []))
+        }
+        
+        # 严重的社会问题优先调配资源解决
+        if population.get('critical_issues'):
+            orders['economic_orders'].insert(0, {
+                'type': 'allocate',
+                'target': population['most_urgent_need'],
+                'resources': 30,
+                'priority': 1
+            })
+        
+        # 面对强敌时同时寻求外交缓和
+        high_threats = [t for t in military.get('threats', []) if t['threat_level'] == 'high']
+        targeted = {order['target'] for order in orders['diplomatic_orders']}
+        for threat in high_threats:
+            if threat['civilization_id'] not in targeted:
+                orders['diplomatic_orders'].append({
+                    'type': 'negotiate',
+                    'target': threat['civilization_id'],
+                    'topic': 'non_aggression',
+                    'stance': 'conciliatory',
+                    'priority': 1
+                })
+        
+        decision = build_decision(orders, SOURCE_HEURISTIC)
+        
+        self.add_to_memory({
+            'turn': world_state.current_turn,
+            'type': 'decision',
+            'content': decision
+        })
+        
+        return decision
+    
+    def _generate_structured_decision(self, prompt):
+        """生成包含各部门命令的结构化决策，失败时退回自由文本决策"""
+        try:
+            return self.llm_interface.generate_structured_response(
+                prompt + LEADER_STRUCTURED_DECISION_INSTRUCTIONS,
+                context=self.get_memory_context(),
+                response_format=LEADER_DECISION_FORMAT,
+                priority=PRIORITY_CRITICAL
+            )
+        except DeadlineExceeded:
+            raise
+        except StructuredOutputError as e:
+            # 退回自由文本，由各部门自行提取命令
+            logger.warning(f"{self.name} could not produce a structured decision: {e}")
+            return self.generate_decision(prompt, priority=PRIORITY_CRITICAL)
\ No newline at end of file
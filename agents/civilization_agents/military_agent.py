@@ -1,5 +1,10 @@
 from agents.base_agent import BaseAgent
 from llm.prompt_templates import MILITARY_ADVICE_TEMPLATE
+from llm.llm_interface import StructuredOutputError
+from llm.rate_limiter import PRIORITY_CRITICAL
+from utils.logger import get_logger
+
+logger = get_logger(__name__)
 
 class MilitaryAgent(BaseAgent):
     """负责军事事务的Agent"""
@@ -16,17 +21,24 @@ class MilitaryAgent(BaseAgent):
         threats = self._analyze_threats(world_state)
         opportunities = self._analyze_opportunities(world_state)
         
-        prompt = MILITARY_ADVICE_TEMPLATE.format(
-            general_name=self.name,
-            military_style=self.military_style,
-            civilization_state=civilization_state,
-            current_military=self.military_units,
-            military_tech=self.military_tech,
-            threats=threats,
-            opportunities=opportunities
-        )
+        inputs = {
+            'general_name': self.name,
+            'military_style': self.military_style,
+            'civilization_state': civilization_state,
+            'current_military': self.military_units,
+            'military_tech': self.military_tech,
+            'threats': threats,
+            'opportunities': opportunities
+        }
+        
+        # 输入没有明显变化时沿用上次的建议
+        advice = self.reusable_advice(world_state, inputs)
+        if advice is not None:
+            return advice
         
+        prompt = MILITARY_ADVICE_TEMPLATE.format(**inputs)
         advice = self.generate_decision(prompt)
+        self.remember_advice(world_state, inputs, advice)
         
         # 记录到记忆
         self.add_to_memory({
@@ -37,12 +49,37 @@ class MilitaryAgent(BaseAgent):
         
         return advice
     
+    def heuristic_advice(self, world_state):
+        """不调用LLM的确定性军事建议：有强敌时防御，有威胁时训练，没有威胁且有机会时进攻最弱者"""
+        threats = self._analyze_threats(world_state)
+        opportunities = self._analyze_opportunities(world_state)
+        
+        orders = []
+        high_threats = sorted((t for t in threats if t['threat_level'] == 'high'),
+                              key=lambda t: (-t['military_power'], str(t['civilization_id'])))
+        if high_threats:
+            orders.append({'type': 'defend', 'target': high_threats[0]['civilization_id'], 'resources': 30, 'priority': 1})
+        elif threats:
+            orders.append({'type': 'train', 'target': None, 'resources': 20, 'priority': 2})
+        elif opportunities:
+            weakest = min(opportunities, key=lambda o: (o['military_power'], str(o['civilization_id'])))
+            orders.append({'type': 'attack', 'target': weakest['civilization_id'], 'resources': 25, 'priority': 2})
+        
+        return {
+            'threats': threats,
+            'opportunities': opportunities,
+            'orders': orders
+        }
+    
     def process(self, world_state, **kwargs):
         """处理当前回合的军事事务"""
         leader_decision = kwargs.get('leader_decision', '')
         
-        # 分析领导决策中的军事指令
-        military_orders = self._extract_military_orders(leader_decision)
+        # 分析领导决策中的军事指令；结构化决策已包含命令列表时直接使用
+        if isinstance(leader_decision, dict) and 'military_orders' in leader_decision:
+            military_orders = leader_decision['military_orders']
+        else:
+            military_orders = self._extract_military_orders(leader_decision)
         
         # 执行军事行动
         actions = []
@@ -121,11 +158,14 @@ class MilitaryAgent(BaseAgent):
                             "priority": "number"
                         }
                     ]
-                }
+                },
+                task="extraction",
+                priority=PRIORITY_CRITICAL
             )
-            return response.get("military_orders", [])
-        except:
-            # 如果结构化解析失败，返回空列表
+            return response["military_orders"]
+        except StructuredOutputError as e:
+            # 结构化解析失败时本回合不执行军事命令，但要明确报告而不是静默忽略
+            logger.warning(f"{self.name} could not extract military orders: {e}")
             return []
     
     def _execute_military_order(self, order, world_state):
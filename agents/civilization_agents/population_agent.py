@@ -1,5 +1,9 @@
 from agents.base_agent import BaseAgent
 from llm.prompt_templates import POPULATION_FEEDBACK_TEMPLATE
+from llm.llm_interface import StructuredOutputError
+from utils.logger import get_logger
+
+logger = get_logger(__name__)
 
 class PopulationAgent(BaseAgent):
     """代表普通民众的Agent"""
@@ -28,17 +32,24 @@ class PopulationAgent(BaseAgent):
         social_issues = self._identify_social_issues()
         popular_demands = self._identify_popular_demands()
         
-        prompt = POPULATION_FEEDBACK_TEMPLATE.format(
-            civilization_name=civilization_state.get('name', f'Civilization {self.civilization_id}'),
-            population=self.population,
-            happiness=self.happiness,
-            demographics=self.demographics,
-            needs=self.needs,
-            social_issues=social_issues,
-            popular_demands=popular_demands
-        )
+        inputs = {
+            'civilization_name': civilization_state.get('name', f'Civilization {self.civilization_id}'),
+            'population': self.population,
+            'happiness': self.happiness,
+            'demographics': self.demographics,
+            'needs': self.needs,
+            'social_issues': social_issues,
+            'popular_demands': popular_demands
+        }
+        
+        # 输入没有明显变化时沿用上次的反馈
+        feedback = self.reusable_advice(world_state, inputs)
+        if feedback is not None:
+            return feedback
         
+        prompt = POPULATION_FEEDBACK_TEMPLATE.format(**inputs)
         feedback = self.generate_decision(prompt)
+        self.remember_advice(world_state, inputs, feedback)
         
         # 记录到记忆
         self.add_to_memory({
@@ -49,6 +60,17 @@ class PopulationAgent(BaseAgent):
         
         return feedback
     
+    def heuristic_advice(self, world_state):
+        """不调用LLM的确定性民众反馈：社会问题和满足度最低的需求"""
+        social_issues = self._identify_social_issues()
+        
+        return {
+            'social_issues': social_issues,
+            'critical_issues': [issue for issue in social_issues if issue['severity'] == 'critical'],
+            'most_urgent_need': min(self.needs, key=self.needs.get),
+            'happiness': self.happiness
+        }
+    
     def process(self, world_state, **kwargs):
         """处理当前回合的人口变化"""
         # 人口Agent主要是被动的，不执行具体行动
@@ -158,16 +180,20 @@ class PopulationAgent(BaseAgent):
         - 负值表示幸福度下降
         - 正值表示幸福度上升
         - 数值大小表示影响程度
-        
-        只返回一个数字，不要有其他内容。
         """
         
+        # 简单评分任务，先用小模型，超出范围或无法解析时再升级
         try:
-            response = self.generate_decision(prompt).strip()
-            # 尝试将响应转换为数字
-            return float(response)
-        except:
-            # 如果无法解析为数字，假设影响为零
+            response = self.llm_interface.generate_structured_response(
+                prompt,
+                response_format={"happiness_change": "number from -10 to 10"},
+                task="scoring",
+                validator=lambda result: -10 <= result["happiness_change"] <= 10
+            )
+            return float(response["happiness_change"])
+        except StructuredOutputError as e:
+            # 如果无法得到有效评分，假设影响为零
+            logger.warning(f"{self.name} could not score decision impact: {e}")
             return 0
     
     def _calculate_growth_rate(self, civ_state, world_state):
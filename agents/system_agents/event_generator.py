@@ -1,11 +1,41 @@
 from agents.base_agent import BaseAgent
-from llm.prompt_templates import EVENT_GENERATION_TEMPLATE
+from llm.prompt_templates import EVENT_GENERATION_TEMPLATE, EVENT_BATCH_GENERATION_TEMPLATE
+from llm.llm_interface import StructuredOutputError
+from llm.rate_limiter import PRIORITY_BACKGROUND
 import random
+import numpy as np
+from utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+# 事件内容的响应格式
+EVENT_CONTENT_FORMAT = {
+    'title': 'Event title',
+    'description': 'Detailed description of the event',
+    'effects': {
+        'political': 'Political effects',
+        'economic': 'Economic effects',
+        'military': 'Military effects',
+        'cultural': 'Cultural effects',
+        'population': 'Population effects'
+    },
+    # 每回合对文明状态的数值修正，由core.event_effects.EventEffectEngine在持续期内逐回合应用
+    'modifiers': {
+        'economic_power': 'number or null: per-turn change to economic power',
+        'military_power': 'number or null: per-turn change to military power',
+        'cultural_influence': 'number or null: per-turn change to cultural influence',
+        'happiness': 'number or null: per-turn change to happiness (0-100 scale)',
+        'population': 'number or null: per-turn relative population change, e.g. -0.01'
+    },
+    'duration': 'integer number of turns the event effects will last'
+}
 
 class EventGeneratorAgent(BaseAgent):
     """创造随机事件的系统级Agent"""
     
-    def __init__(self, name, llm_interface=None):
+    transient_attributes = ('llm_interface', 'event_library')
+    
+    def __init__(self, name, llm_interface=None, batch_mode=False, batch_size=10, event_library=None, seed=None):
         super().__init__(name, None, llm_interface)  # 系统级Agent没有文明ID
         self.event_types = [
             'political', 'economic', 'military', 'cultural', 
@@ -17,9 +47,20 @@ class EventGeneratorAgent(BaseAgent):
             'crisis': 0.02  # 每回合2%几率发生危机事件
         }
         self.generated_events = []  # 记录生成的事件
+        self.batch_mode = batch_mode  # 为True时一个回合的所有事件合并为少量LLM请求
+        self.batch_size = batch_size  # 每个批量请求最多包含的事件数
+        self.event_library = event_library  # 预生成事件库（utils.event_library.EventLibrary），未覆盖的组合才实时生成
+        # 批量模式抽取事件用的随机数生成器，由模拟种子初始化，随Agent状态保存到恢复点
+        self.rng = np.random.default_rng(seed)
+        
+    def generate_events(self, world_state, civilizations, offline=False):
+        """生成当前回合的随机事件
+        
+        offline为True时不调用LLM：只使用事件库中的事件，库中没有的组合本回合跳过（随机数照常抽取）。
+        """
+        if self.batch_mode:
+            return self._generate_events_batched(world_state, civilizations, offline)
         
-    def generate_events(self, world_state, civilizations):
-        """生成当前回合的随机事件"""
         events = []
         
         # 为每个文明生成可能的事件
@@ -27,7 +68,7 @@ class EventGeneratorAgent(BaseAgent):
             # 检查是否生成各类事件
             for event_scale, probability in self.event_probabilities.items():
                 if random.random() < probability:
-                    event = self._generate_event(world_state, civilization, event_scale)
+                    event = self._generate_event(world_state, civilization, event_scale, offline)
                     if event:
                         events.append(event)
                         # 添加到世界状态
@@ -43,11 +84,18 @@ class EventGeneratorAgent(BaseAgent):
         civilizations = kwargs.get('civilizations', {})
         return self.generate_events(world_state, civilizations)
     
-    def _generate_event(self, world_state, civilization, event_scale):
+    def _generate_event(self, world_state, civilization, event_scale, offline=False):
         """生成特定规模的事件"""
         # 选择事件类型
         event_type = random.choice(self.event_types)
         
+        # 优先从预生成事件库抽样
+        if self.event_library is not None and self.event_library.has(event_type, event_scale):
+            template = self.event_library.sample(event_type, event_scale, civilization)
+            return self._build_event(civilization, event_type, event_scale, template)
+        if offline:
+            return None
+        
         # 获取文明状态
         civ_state = world_state.get_civilization_state(civilization.id)
         
@@ -60,23 +108,97 @@ class EventGeneratorAgent(BaseAgent):
             current_turn=world_state.current_turn
         )
         
-        event_response = self.generate_structured_response(
-            prompt,
-            response_format={
-                'title': 'Event title',
-                'description': 'Detailed description of the event',
-                'effects': {
-                    'political': 'Political effects',
-                    'economic': 'Economic effects',
-                    'military': 'Military effects',
-                    'cultural': 'Cultural effects',
-                    'population': 'Population effects'
-                },
-                'duration': 'How many turns the event effects will last'
-            }
+        try:
+            event_response = self.llm_interface.generate_structured_response(
+                prompt,
+                response_format=EVENT_CONTENT_FORMAT,
+                priority=PRIORITY_BACKGROUND  # 事件内容不阻塞回合推进，回合时间不足时跳过
+            )
+        except StructuredOutputError as e:
+            # 无法生成有效事件时本回合跳过该事件
+            logger.warning(f"could not generate {event_scale} {event_type} event for {civilization.name}: {e}")
+            return None
+        
+        return self._build_event(civilization, event_type, event_scale, event_response)
+    
+    def _generate_events_batched(self, world_state, civilizations, offline=False):
+        """批量生成当前回合的随机事件：一次抽样所有触发的事件，再分块合并为少量LLM请求"""
+        civ_list = list(civilizations.values())
+        scales = list(self.event_probabilities.items())
+        
+        # 一次性抽取所有 文明 x 规模 的随机数矩阵，再为触发的事件一次性抽取类型
+        probabilities = np.array([probability for _, probability in scales])
+        draws = self.rng.random((len(civ_list), len(scales)))
+        civ_indices, scale_indices = np.nonzero(draws < probabilities)
+        type_indices = self.rng.integers(len(self.event_types), size=len(civ_indices))
+        triggered = [
+            (civ_list[civ_index], self.event_types[type_index], scales[scale_index][0])
+            for civ_index, scale_index, type_index in zip(civ_indices, scale_indices, type_indices)
+        ]
+        
+        events = []
+        
+        # 事件库覆盖的组合直接抽样，其余的合并为批量LLM请求
+        live_requests = []
+        for civilization, event_type, event_scale in triggered:
+            if self.event_library is not None and self.event_library.has(event_type, event_scale):
+                template = self.event_library.sample(event_type, event_scale, civilization)
+                event = self._build_event(civilization, event_type, event_scale, template)
+                events.append(event)
+                world_state.add_event(event)
+            elif not offline:
+                live_requests.append((civilization, event_type, event_scale))
+        
+        for start in range(0, len(live_requests), self.batch_size):
+            chunk = live_requests[start:start + self.batch_size]
+            for event in self._generate_event_chunk(world_state, chunk):
+                events.append(event)
+                world_state.add_event(event)
+        
+        self.generated_events.extend(events)
+        return events
+    
+    def _generate_event_chunk(self, world_state, chunk):
+        """用一次结构化LLM请求生成一组事件"""
+        civilization_states = {}
+        event_requests = []
+        for index, (civilization, event_type, event_scale) in enumerate(chunk):
+            civilization_states[civilization.name] = world_state.get_civilization_state(civilization.id)
+            event_requests.append({
+                'index': index,
+                'civilization': civilization.name,
+                'event_scale': event_scale,
+                'event_type': event_type
+            })
+        
+        prompt = EVENT_BATCH_GENERATION_TEMPLATE.format(
+            current_turn=world_state.current_turn,
+            event_count=len(chunk),
+            civilization_states=civilization_states,
+            event_requests=event_requests
         )
         
-        # 构建事件对象
+        try:
+            response = self.llm_interface.generate_structured_response(
+                prompt,
+                response_format={'events': [dict(EVENT_CONTENT_FORMAT, index='integer index of the requested event')]},
+                max_tokens=max(self.llm_interface.config.max_tokens, 300 * len(chunk)),
+                priority=PRIORITY_BACKGROUND
+            )
+        except StructuredOutputError as e:
+            logger.warning(f"could not generate batch of {len(chunk)} events: {e}")
+            return []
+        
+        # 按index将结果分发回对应的事件请求，缺失的事件本回合跳过
+        responses = {item.get('index'): item for item in response['events'] if isinstance(item, dict)}
+        events = []
+        for index, (civilization, event_type, event_scale) in enumerate(chunk):
+            if index in responses:
+                events.append(self._build_event(civilization, event_type, event_scale, responses[index]))
+        return events
+    
+    def _build_event(self, civilization, event_type, event_scale, event_response):
+        """根据LLM生成的内容构建事件对象"""
         event = {
             'type': 'random_event',
             'subtype': event_type,
@@ -85,6 +207,8 @@ class EventGeneratorAgent(BaseAgent):
             'title': event_response.get('title', f'{event_scale.capitalize()} {event_type} event'),
             'description': event_response.get('description', ''),
             'effects': event_response.get('effects', {}),
+            'modifiers': {field: value for field, value in (event_response.get('modifiers') or {}).items()
+                          if value is not None},
             'duration': int(event_response.get('duration', 1)),
             'turns_remaining': int(event_response.get('duration', 1))
         }
@@ -1,5 +1,10 @@
 from agents.base_agent import BaseAgent
 from llm.prompt_templates import HISTORICAL_ASSESSMENT_TEMPLATE
+from llm.llm_interface import StructuredOutputError
+from llm.rate_limiter import PRIORITY_BACKGROUND
+from utils.logger import get_logger
+
+logger = get_logger(__name__)
 
 class HistoricalArbiterAgent(BaseAgent):
     """评估模拟与真实历史的偏差的系统级Agent"""
@@ -35,14 +40,24 @@ class HistoricalArbiterAgent(BaseAgent):
             historical_reference=historical_reference
         )
         
-        assessment_response = self.generate_structured_response(
-            prompt,
-            response_format={
-                'assessment': 'Overall assessment of historical accuracy',
-                'divergence_score': 'A score from 0 to 10 where 0 is completely accurate and 10 is completely divergent',
-                'notable_divergences': ['List of specific divergences from historical record']
+        try:
+            assessment_response = self.llm_interface.generate_structured_response(
+                prompt,
+                response_format={
+                    'assessment': 'Overall assessment of historical accuracy',
+                    'divergence_score': 'A score from 0 to 10 where 0 is completely accurate and 10 is completely divergent',
+                    'notable_divergences': ['List of specific divergences from historical record']
+                },
+                priority=PRIORITY_BACKGROUND
+            )
+        except StructuredOutputError as e:
+            logger.warning(f"historical assessment failed for turn {world_state.current_turn}: {e}")
+            return {
+                'turn': world_state.current_turn,
+                'assessment': 'Assessment unavailable',
+                'divergence_score': 0,
+                'notable_divergences': []
             }
-        )
         
         # 记录显著偏差点
         if assessment_response.get('divergence_score', 0) > 5:
@@ -74,10 +89,8 @@ class HistoricalArbiterAgent(BaseAgent):
                 'diplomatic_relations': state.get('diplomatic_relations', {})
             }
         
-        # 添加最近的重大事件
-        recent_events = [event for event in world_state.events 
-                        if world_state.current_turn - event.get('turn', 0) <= 5]
-        summary['recent_events'] = recent_events
+        # 添加最近的重大事件（按回合分桶读取，与累计事件数无关）
+        summary['recent_events'] = world_state.get_recent_events(5)
         
         return summary
     
@@ -1,5 +1,10 @@
 from agents.base_agent import BaseAgent
 from llm.prompt_templates import TURN_NARRATIVE_TEMPLATE, FULL_NARRATIVE_TEMPLATE
+from llm.rate_limiter import PRIORITY_BACKGROUND
+from llm.llm_interface import LLMError, DeadlineExceeded
+from utils.logger import get_logger
+
+logger = get_logger(__name__)
 
 class NarrativeConstructorAgent(BaseAgent):
     """将模拟结果转化为历史叙事的系统级Agent"""
@@ -18,7 +23,7 @@ class NarrativeConstructorAgent(BaseAgent):
             print(f"Warning: Invalid narrative style '{style}'. Using default 'historical'.")
     
     def generate_turn_narrative(self, turn_data):
-        """生成单回合叙事"""
+        """生成单回合叙事；LLM调用失败时返回占位文本，回合时间不足时抛出DeadlineExceeded"""
         if not turn_data:
             return "No data available for this turn."
         
@@ -34,8 +39,8 @@ class NarrativeConstructorAgent(BaseAgent):
             interaction_results=turn_data.get('interaction_results', {})
         )
         
-        # 生成叙事
-        narrative = self.generate_decision(prompt)
+        # 生成叙事（不阻塞下一回合，使用后台优先级）
+        narrative = self._generate_narrative(prompt, f"turn {turn}", priority=PRIORITY_BACKGROUND)
         
         # 存储叙事
         self.narratives[turn] = narrative
@@ -62,13 +67,23 @@ class NarrativeConstructorAgent(BaseAgent):
         )
         
         # 生成完整叙事
-        full_narrative = self.generate_decision(prompt, context=None)  # 不使用上下文，避免token限制
+        full_narrative = self._generate_narrative(prompt, "full history", context=None, priority=PRIORITY_BACKGROUND)  # 不使用上下文，避免token限制
         
         # 存储完整叙事
         self.narratives['full'] = full_narrative
         
         return full_narrative
     
+    def _generate_narrative(self, prompt, label, **kwargs):
+        """调用LLM生成叙事，提供商调用失败时返回占位文本，叙事缺失不影响模拟继续"""
+        try:
+            return self.generate_decision(prompt, **kwargs)
+        except DeadlineExceeded:
+            raise
+        except LLMError as e:
+            logger.warning(f"could not generate narrative for {label}: {e}")
+            return f"(Narrative unavailable for {label})"
+    
     def process(self, world_state, **kwargs):
         """处理当前回合的叙事生成"""
         turn_data = kwargs.get('turn_data', {})
@@ -1,38 +1,55 @@
+import bisect
+import copy
 from agents.base_agent import BaseAgent
+from utils.history_store import HistoryStore, ChainedHistoryView
+from utils.metric_store import MetricStore, METRIC_DEFAULTS
+from utils.online_stats import MetricStatistics
 
 class ObserverAgent(BaseAgent):
     """收集数据并生成分析报告的系统级Agent"""
     
-    def __init__(self, name, llm_interface=None):
+    # history不保存到恢复点：恢复点只记录历史存储中的位置（last_turn），之前的历史从存储中读取
+    transient_attributes = ('llm_interface', 'history_store', 'sinks', 'base_history', 'history')
+    
+    def __init__(self, name, llm_interface=None, history_store=None, max_turns=100,
+                 stats_window=10, stats_ewma_alpha=0.3, sinks=None):
         super().__init__(name, None, llm_interface)  # 系统级Agent没有文明ID
-        self.history = {}  # 按回合存储的历史数据
-        self.metrics = {}  # 按文明ID存储的指标数据
+        self.history = {}  # 按回合存储的历史数据（使用history_store时只保留最近一回合，不保存到恢复点）
+        self.history_store = history_store  # 磁盘历史存储，为None时全部历史保存在内存中
+        self.sinks = list(sinks or [])  # 额外的历史数据输出（需实现write_turn和close）
+        self.metrics = MetricStore(max_turns=max_turns)  # 文明 x 指标 x 回合 的列式指标数据
         self.tracked_civilizations = set()  # 跟踪的文明ID集合
+        self.last_turn = None  # 最后记录的回合
+        self.base_history = None  # 分叉时间线共享的父历史：(历史映射, 分叉回合)
+        self.statistics = {}  # 文明ID -> {指标名 -> 在线统计}
+        self.stats_window = stats_window  # 窗口极值的回合数
+        self.stats_ewma_alpha = stats_ewma_alpha  # EWMA中新样本的权重
+        
+        # 二级索引：按回合递增的回合列表，区间查询用二分查找，条目在查询时从历史中读取，
+        # 内存和恢复点中不保存事件和决策本身
+        self.events_by_civilization = {}  # 目标文明ID -> 有该文明事件的回合
+        self.world_events = []  # 有世界级事件（没有目标文明）的回合
+        self.decisions_by_civilization = {}  # 文明ID -> 有该文明决策的回合
+        self.degradations = ([], [])  # 回合时间不足导致的降级：(回合列表, 降级记录列表)
         
     def initialize(self, civilization_ids):
         """初始化观察者，设置要跟踪的文明"""
         self.tracked_civilizations = set(civilization_ids)
         
-        # 为每个文明初始化指标数据
+        # 为每个文明登记指标数据行
         for civ_id in civilization_ids:
-            self.metrics[civ_id] = {
-                'population': [],
-                'military_power': [],
-                'economic_power': [],
-                'technology_level': [],
-                'cultural_influence': [],
-                'happiness': [],
-                'diplomatic_relations': {}
-            }
+            self.metrics.add_civilization(civ_id)
     
     def record_turn(self, turn, world_state, civilizations, decisions, interaction_results, events, historical_assessment):
         """记录当前回合的数据"""
+        # 写时复制快照，历史记录不会被后续回合的修改影响
+        snapshot = world_state.snapshot()
         turn_data = {
-            'world_state': world_state.to_dict(),
+            'world_state': snapshot,
             'civilization_states': {},
             'decisions': decisions,
             'interaction_results': interaction_results,
-            'events': events,
+            'events': copy.deepcopy(events),  # 事件效果引擎之后还会更新事件的剩余回合数
             'historical_assessment': historical_assessment
         }
         
@@ -40,25 +57,108 @@ class ObserverAgent(BaseAgent):
         for civ_id, civilization in civilizations.items():
             if civ_id in self.tracked_civilizations:
                 civ_state = world_state.get_civilization_state(civ_id)
-                turn_data['civilization_states'][civ_id] = civ_state
+                turn_data['civilization_states'][civ_id] = snapshot.civilization_states.get(civ_id, {})
                 
                 # 更新指标数据
-                self._update_metrics(civ_id, civ_state)
+                self._update_metrics(civ_id, turn, civ_state)
+        
+        # 更新二级索引
+        self._index_turn(turn, decisions, turn_data['events'])
         
         # 存储回合数据
-        self.history[turn] = turn_data
+        if self.history_store is not None:
+            self.history_store.append_turn(turn, turn_data)
+            self.history = {turn: turn_data}
+        else:
+            self.history[turn] = turn_data
+        
+        for sink in self.sinks:
+            sink.write_turn(turn, turn_data)
+        self.last_turn = turn
+    
+    def record_degradation(self, turn, degradation):
+        """记录一次降级（跳过或超时的LLM调用、沿用的建议、启发式决策、推迟的叙事等）"""
+        self._index_add(self.degradations, turn, dict(degradation, turn=turn))
+    
+    def get_degradations(self, start_turn=None, end_turn=None):
+        """获取回合范围内的降级记录"""
+        turns = self.degradations[0]
+        if not turns:
+            return []
+        start_turn = turns[0] if start_turn is None else start_turn
+        end_turn = turns[-1] if end_turn is None else end_turn
+        return self._index_range(self.degradations, start_turn, end_turn)
+    
+    def set_state(self, state):
+        """从检查点恢复，并丢弃历史存储和输出中检查点之后记录的回合
+        
+        恢复点不含历史数据，检查点及之前的回合从history_store读取；没有history_store时这些回合的历史不可用。
+        """
+        super().set_state(state)
+        self.history = {}
+        if self.last_turn is not None:
+            self.truncate_history(self.last_turn)
+    
+    def truncate_history(self, turn):
+        """丢弃历史存储和输出中turn之后记录的回合"""
+        if self.history_store is not None:
+            self.history_store.truncate_after(turn)
+        for sink in self.sinks:
+            if hasattr(sink, 'truncate_after'):
+                sink.truncate_after(turn)
+    
+    def close(self):
+        """关闭历史存储和所有输出，确保数据写入磁盘"""
+        for sink in self.sinks:
+            sink.close()
+        if self.history_store is not None:
+            self.history_store.close()
+    
+    def share_history(self, base_history, fork_turn):
+        """分叉时间线：fork_turn及之前的历史直接读取父时间线，不复制"""
+        self.base_history = (base_history, fork_turn)
+        self.history = {}
     
     def get_turn_data(self, turn):
         """获取特定回合的数据"""
-        return self.history.get(turn, {})
+        if self.base_history is not None and turn <= self.base_history[1]:
+            return self.base_history[0].get(turn, {})
+        if turn in self.history or self.history_store is None:
+            return self.history.get(turn, {})
+        return self.history_store.get_turn(turn)
     
     def get_full_history(self):
-        """获取完整历史数据"""
-        return self.history
+        """获取完整历史数据（使用history_store时为按需读取的映射）"""
+        own = self.history_store.history_view() if self.history_store is not None else self.history
+        if self.base_history is not None:
+            return ChainedHistoryView(self.base_history[0], self.base_history[1], own)
+        return own
     
     def get_civilization_metrics(self, civ_id):
         """获取特定文明的指标数据"""
-        return self.metrics.get(civ_id, {})
+        return self.metrics.history(civ_id)
+    
+    def get_metric_statistics(self, civ_id, metric=None):
+        """获取文明指标的在线统计（均值、方差、EWMA、窗口极值、分位数、增长率、波动率及在各文明中的百分位）"""
+        statistics = self.statistics.get(civ_id, {})
+        names = [metric] if metric is not None else list(statistics)
+        
+        result = {}
+        for name in names:
+            if name not in statistics:
+                continue
+            summary = statistics[name].summary()
+            
+            # 在当前各文明中的百分位排名
+            latest = [s[name].last_value for s in self.statistics.values() if name in s]
+            summary['percentile_rank'] = sum(1 for value in latest if value <= summary['last']) / len(latest)
+            result[name] = summary
+        
+        return result.get(metric, {}) if metric is not None else result
+    
+    def get_metric_cross_section(self, metric, turn=None):
+        """获取某回合（默认最新回合）各文明的某项指标"""
+        return self.metrics.cross_section(metric, turn)
     
     def generate_report(self, start_turn, end_turn):
         """生成特定时期的分析报告"""
@@ -67,17 +167,18 @@ class ObserverAgent(BaseAgent):
             'civilizations': {}
         }
         
-        # 收集每个文明在此期间的数据
+        # 收集每个文明在此期间的数据，每个回合的历史只读取一次
+        turn_cache = {}
         for civ_id in self.tracked_civilizations:
             civ_data = {
                 'metrics': self._extract_metrics(civ_id, start_turn, end_turn),
-                'key_events': self._extract_key_events(civ_id, start_turn, end_turn),
-                'decisions': self._extract_decisions(civ_id, start_turn, end_turn)
+                'key_events': self._extract_key_events(civ_id, start_turn, end_turn, turn_cache),
+                'decisions': self._extract_decisions(civ_id, start_turn, end_turn, turn_cache)
             }
             report_data['civilizations'][civ_id] = civ_data
         
         # 添加世界级事件
-        report_data['world_events'] = self._extract_world_events(start_turn, end_turn)
+        report_data['world_events'] = self._extract_world_events(start_turn, end_turn, turn_cache)
         
         return report_data
     
@@ -86,89 +187,90 @@ class ObserverAgent(BaseAgent):
         # Observer主要是被动记录，不主动处理
         return None
     
-    def _update_metrics(self, civ_id, civ_state):
+    def _update_metrics(self, civ_id, turn, civ_state):
         """更新文明指标数据"""
-        metrics = self.metrics[civ_id]
-        
-        # 更新基本指标
-        metrics['population'].append(civ_state.get('population', 0))
-        metrics['military_power'].append(civ_state.get('military_power', 0))
-        metrics['economic_power'].append(civ_state.get('economic_power', 0))
-        metrics['technology_level'].append(civ_state.get('technology_level', 0))
-        metrics['cultural_influence'].append(civ_state.get('cultural_influence', 0))
-        metrics['happiness'].append(civ_state.get('happiness', 50))
+        self.metrics.record(civ_id, turn, civ_state)
         
-        # 更新外交关系
-        diplomatic_relations = civ_state.get('diplomatic_relations', {})
-        for other_civ, relation in diplomatic_relations.items():
-            if other_civ not in metrics['diplomatic_relations']:
-                metrics['diplomatic_relations'][other_civ] = []
-            metrics['diplomatic_relations'][other_civ].append(relation)
+        # 在线统计，每个指标O(1)更新，无需回看历史
+        statistics = self.statistics.setdefault(civ_id, {})
+        for metric_name, default in METRIC_DEFAULTS.items():
+            value = civ_state.get(metric_name, default)
+            if isinstance(value, (int, float)) and not isinstance(value, bool):
+                if metric_name not in statistics:
+                    statistics[metric_name] = MetricStatistics(self.stats_window, self.stats_ewma_alpha)
+                statistics[metric_name].update(value, turn)
     
     def _extract_metrics(self, civ_id, start_turn, end_turn):
-        """提取特定时期的指标数据"""
-        metrics = self.metrics[civ_id]
-        period_length = end_turn - start_turn + 1
-        
-        # 提取基本指标
-        extracted_metrics = {}
-        for metric_name, values in metrics.items():
-            if metric_name != 'diplomatic_relations':
-                if len(values) >= end_turn:
-                    extracted_metrics[metric_name] = values[start_turn-1:end_turn]
-        
-        # 提取外交关系
-        extracted_metrics['diplomatic_relations'] = {}
-        for other_civ, relations in metrics['diplomatic_relations'].items():
-            if len(relations) >= end_turn:
-                extracted_metrics['diplomatic_relations'][other_civ] = relations[start_turn-1:end_turn]
+        """提取特定时期的指标数据，缺失的回合为None"""
+        return self.metrics.extract(civ_id, start_turn, end_turn)
+    
+    def _index_turn(self, turn, decisions, events):
+        """将本回合有事件和决策的文明加入二级索引"""
+        for event in events:
+            if 'target_civilization' in event:
+                self._index_turn_number(self.events_by_civilization.setdefault(event['target_civilization'], []), turn)
+            else:
+                self._index_turn_number(self.world_events, turn)
         
-        return extracted_metrics
+        for civ_id in (decisions or {}):
+            self._index_turn_number(self.decisions_by_civilization.setdefault(civ_id, []), turn)
+    
+    def _index_turn_number(self, turns, turn):
+        """按顺序登记回合（同一回合只登记一次）"""
+        if not turns or turn > turns[-1]:
+            turns.append(turn)
+            return
+        position = bisect.bisect_left(turns, turn)
+        if turns[position] != turn:
+            turns.insert(position, turn)
+    
+    def _index_add(self, index, turn, item):
+        """按回合顺序插入索引条目（通常是追加到末尾）"""
+        turns, items = index
+        position = len(turns) if not turns or turn >= turns[-1] else bisect.bisect_right(turns, turn)
+        turns.insert(position, turn)
+        items.insert(position, item)
     
-    def _extract_key_events(self, civ_id, start_turn, end_turn):
+    def _index_range(self, index, start_turn, end_turn):
+        """返回索引中[start_turn, end_turn]回合范围内的条目"""
+        turns, items = index
+        return items[bisect.bisect_left(turns, start_turn):bisect.bisect_right(turns, end_turn)]
+    
+    def _indexed_turns(self, turns, start_turn, end_turn):
+        """回合索引中[start_turn, end_turn]范围内的回合"""
+        return turns[bisect.bisect_left(turns, start_turn):bisect.bisect_right(turns, end_turn)]
+    
+    def _read_turn(self, turn, turn_cache):
+        """读取回合数据（使用history_store时从磁盘读取），turn_cache用于一次报告中的重复读取"""
+        if turn_cache is None:
+            return self.get_turn_data(turn)
+        if turn not in turn_cache:
+            turn_cache[turn] = self.get_turn_data(turn)
+        return turn_cache[turn]
+    
+    def _extract_key_events(self, civ_id, start_turn, end_turn, turn_cache=None):
         """提取特定时期的关键事件"""
-        key_events = []
-        
-        for turn in range(start_turn, end_turn + 1):
-            if turn in self.history:
-                turn_data = self.history[turn]
-                
-                # 提取影响该文明的事件
-                for event in turn_data.get('events', []):
-                    if event.get('target_civilization') == civ_id:
-                        key_events.append(event)
-        
-        return key_events
+        return [
+            event
+            for turn in self._indexed_turns(self.events_by_civilization.get(civ_id, []), start_turn, end_turn)
+            for event in self._read_turn(turn, turn_cache).get('events', [])
+            if event.get('target_civilization') == civ_id
+        ]
     
-    def _extract_decisions(self, civ_id, start_turn, end_turn):
+    def _extract_decisions(self, civ_id, start_turn, end_turn, turn_cache=None):
         """提取特定时期的决策"""
         decisions = []
-        
-        for turn in range(start_turn, end_turn + 1):
-            if turn in self.history:
-                turn_data = self.history[turn]
-                
-                # 提取该文明的决策
-                if civ_id in turn_data.get('decisions', {}):
-                    decision = {
-                        'turn': turn,
-                        'content': turn_data['decisions'][civ_id]
-                    }
-                    decisions.append(decision)
-        
+        for turn in self._indexed_turns(self.decisions_by_civilization.get(civ_id, []), start_turn, end_turn):
+            turn_decisions = self._read_turn(turn, turn_cache).get('decisions') or {}
+            if civ_id in turn_decisions:
+                decisions.append({'turn': turn, 'content': turn_decisions[civ_id]})
         return decisions
     
-    def _extract_world_events(self, start_turn, end_turn):
-        """提取特定时期的世界级事件"""
-        world_events = []
-        
-        for turn in range(start_turn, end_turn + 1):
-            if turn in self.history:
-                turn_data = self.history[turn]
-                
-                # 提取世界级事件（没有特定目标文明的事件）
-                for event in turn_data.get('events', []):
-                    if 'target_civilization' not in event:
-                        world_events.append(event)
-        
-        return world_events 
\ No newline at end of file
+    def _extract_world_events(self, start_turn, end_turn, turn_cache=None):
+        """提取特定时期的世界级事件（没有特定目标文明的事件）"""
+        return [
+            event
+            for turn in self._indexed_turns(self.world_events, start_turn, end_turn)
+            for event in self._read_turn(turn, turn_cache).get('events', [])
+            if 'target_civilization' not in event
+        ]
@@ -1,7 +1,16 @@
 from agents.base_agent import BaseAgent
 from models.world_state import WorldState
+from models.event_log import EventLog
+from utils.checkpoint import atomic_write
+import hashlib
+import json
+import os
+import pickle
 import random
 import math
+from utils.logger import get_logger
+
+logger = get_logger(__name__)
 
 class WorldEngineAgent(BaseAgent):
     """控制自然环境和资源变化的系统级Agent"""
@@ -12,19 +21,42 @@ class WorldEngineAgent(BaseAgent):
         self.resource_types = ['food', 'wood', 'stone', 'iron', 'gold', 'oil', 'uranium']
         self.climate_zones = ['tropical', 'temperate', 'arid', 'continental', 'polar']
         self.current_climate = {}  # 每个区域的当前气候状态
+        self.environment_turn = 0  # 地块气候和资源最后更新到的回合
         
     def initialize_world(self, config):
         """初始化世界状态"""
         world_size = config.world_size
         
-        # 创建地形
-        terrain = self._generate_terrain(world_size)
-        
-        # 分配资源
-        resources = self._distribute_resources(terrain, config.resource_distribution)
+        cache_path = self._world_cache_path(config)
+        cached = self._load_world_cache(cache_path) if cache_path else None
+        if cached:
+            terrain, resources, climate = cached['terrain'], cached['resources'], cached['climate']
+            self.current_climate = cached['current_climate']
+            random.setstate(cached['random_state'])  # 与重新生成后的随机数状态一致
+        else:
+            # 创建地形
+            terrain = self._generate_terrain(world_size)
+            
+            # 分配资源
+            resources = self._distribute_resources(terrain, config.resource_distribution)
+            
+            # 设置初始气候
+            climate = self._initialize_climate(terrain)
+            
+            if cache_path:
+                atomic_write(cache_path, pickle.dumps({
+                    'terrain': terrain,
+                    'resources': resources,
+                    'climate': climate,
+                    'current_climate': self.current_climate,
+                    'random_state': random.getstate()
+                }, protocol=pickle.HIGHEST_PROTOCOL))
         
-        # 设置初始气候
-        climate = self._initialize_climate(terrain)
+        # 创建事件记录，超出保留窗口的旧事件追加写入磁盘
+        event_log = EventLog(
+            retention_turns=config.event_retention_turns,
+            spill_path=os.path.join(config.output_dir, 'events_archive.jsonl') if config.event_retention_turns else None
+        )
         
         # 创建世界状态
         world_state = WorldState(
@@ -32,21 +64,53 @@ class WorldEngineAgent(BaseAgent):
             terrain=terrain,
             resources=resources,
             climate=climate,
-            current_turn=0
+            current_turn=0,
+            event_log=event_log
         )
         
         return world_state
     
-    def update_environment(self, world_state):
-        """更新环境状态"""
+    def _world_cache_path(self, config):
+        """世界生成缓存文件路径；未配置缓存目录或未设置种子（结果不可复现）时返回None"""
+        cache_dir = getattr(config, 'world_cache_dir', None)
+        if not cache_dir or config.seed is None:
+            return None
+        key = json.dumps({
+            'world_size': config.world_size,
+            'resource_distribution': config.resource_distribution,
+            'climate_enabled': config.climate_enabled,
+            'seed': config.seed
+        }, sort_keys=True)
+        return os.path.join(cache_dir, f"world_{hashlib.sha256(key.encode('utf-8')).hexdigest()[:16]}.pkl")
+    
+    def _load_world_cache(self, path):
+        """读取世界生成缓存，文件不存在或损坏时返回None"""
+        if not os.path.exists(path):
+            return None
+        try:
+            with open(path, 'rb') as f:
+                return pickle.load(f)
+        except Exception as e:
+            logger.warning(f"读取世界生成缓存失败，重新生成: {e}")
+            return None
+    
+    def update_environment(self, world_state, interval=1):
+        """更新环境状态
+        
+        逐地块的气候和资源更新代价与地图大小成正比。interval大于1时（快进回合）每interval回合
+        才更新一次地块，一次应用之后累计的变化；interval为1时补上之前累计的回合。
+        """
         # 更新回合数
         world_state.current_turn += 1
         
-        # 更新气候
-        self._update_climate(world_state)
-        
-        # 更新自然资源
-        self._update_resources(world_state)
+        pending_turns = world_state.current_turn - self.environment_turn
+        if pending_turns >= interval:
+            # 更新气候
+            self._update_climate(world_state, pending_turns)
+            
+            # 更新自然资源
+            self._update_resources(world_state, pending_turns)
+            self.environment_turn = world_state.current_turn
         
         # 可能触发自然灾害
         self._generate_natural_disasters(world_state)
@@ -159,33 +223,35 @@ class WorldEngineAgent(BaseAgent):
         }
         return base_precip.get(climate_zone, 40)
     
-    def _update_climate(self, world_state):
-        """更新气候状态"""
+    def _update_climate(self, world_state, turns=1):
+        """更新气候状态，turns为一次应用的回合数：季节变化逐回合累加，随机波动按方差累加（乘以sqrt(turns)）"""
+        # 计算季节因素 (假设4个回合为一年)
+        season_factor = sum(math.sin(2 * math.pi * (turn % 4) / 4)
+                            for turn in range(world_state.current_turn - turns + 1, world_state.current_turn + 1))
+        noise_scale = math.sqrt(turns)
+        
         for coord, climate in world_state.climate.items():
             # 获取当前气候
             current = self.current_climate.get(coord, climate.copy())
             
-            # 计算季节因素 (假设4个回合为一年)
-            season_factor = math.sin(2 * math.pi * (world_state.current_turn % 4) / 4)
-            
             # 更新温度 (季节变化 + 随机波动)
-            temp_change = season_factor * 10 + random.uniform(-2, 2)
+            temp_change = season_factor * 10 + random.uniform(-2, 2) * noise_scale
             current['temperature'] += temp_change * 0.1  # 缓慢变化
             
             # 更新降水 (季节变化 + 随机波动)
-            precip_change = season_factor * 20 + random.uniform(-5, 5)
+            precip_change = season_factor * 20 + random.uniform(-5, 5) * noise_scale
             current['precipitation'] += precip_change * 0.1  # 缓慢变化
             
             # 更新风速和风向
-            current['wind_speed'] = max(0, current['wind_speed'] + random.uniform(-1, 1))
-            current['wind_direction'] = (current['wind_direction'] + random.uniform(-10, 10)) % 360
+            current['wind_speed'] = max(0, current['wind_speed'] + random.uniform(-1, 1) * noise_scale)
+            current['wind_direction'] = (current['wind_direction'] + random.uniform(-10, 10) * noise_scale) % 360
             
             # 保存更新后的气候
             self.current_climate[coord] = current
             world_state.climate[coord] = current.copy()
     
-    def _update_resources(self, world_state):
-        """更新自然资源"""
+    def _update_resources(self, world_state, turns=1):
+        """更新自然资源，turns为一次应用的回合数（按当前气候复利增长）"""
         for coord, resources in world_state.resources.items():
             terrain = world_state.terrain.get(coord, {})
             climate = world_state.climate.get(coord, {})
@@ -194,11 +260,11 @@ class WorldEngineAgent(BaseAgent):
             if 'food' in resources:
                 # 食物生长受气候和地形影响
                 growth_factor = self._calculate_growth_factor(terrain, climate)
-                resources['food'] = min(100, resources['food'] * (1 + growth_factor * 0.1))
+                resources['food'] = min(100, resources['food'] * (1 + growth_factor * 0.1) ** turns)
             
             if 'wood' in resources and terrain.get('type') == 'forest':
                 # 木材再生
-                resources['wood'] = min(100, resources['wood'] * 1.02)
+                resources['wood'] = min(100, resources['wood'] * 1.02 ** turns)
     
     def _calculate_growth_factor(self, terrain, climate):
         """计算生长因子"""
@@ -5,10 +5,42 @@ class LLMConfig:
         self.client_type = kwargs.get('client_type', 'openai')  # 默认使用OpenAI
         self.api_key = kwargs.get('api_key', '')  # API密钥
         self.model = kwargs.get('model', 'gpt-4')  # 默认模型
+        self.fast_model = kwargs.get('fast_model', {
+            'openai': 'gpt-3.5-turbo',
+            'anthropic': 'claude-3-haiku-20240307'
+        }.get(self.client_type, self.model))  # 简单任务优先使用的小模型
+        # 按任务类型路由的模型级联：前一个模型解析/校验失败时升级到下一个
+        self.task_models = kwargs.get('task_models', {
+            'extraction': [self.fast_model, self.model],  # 从领导决策中提取JSON命令
+            'scoring': [self.fast_model, self.model]  # 返回单个数值评分
+        })
+        
+        # 结构化输出：尽量使用提供商原生的JSON模式/工具调用
+        self.native_structured_output = kwargs.get('native_structured_output', True)
+        self.json_mode_models = kwargs.get('json_mode_models', [
+            'gpt-4o', 'gpt-4-turbo', 'gpt-4-1106', 'gpt-4-0125', 'gpt-3.5-turbo'
+        ])  # 支持JSON模式的OpenAI模型前缀
         self.temperature = kwargs.get('temperature', 0.7)  # 温度参数
         self.max_tokens = kwargs.get('max_tokens', 1000)  # 最大token数
         self.system_prompt = kwargs.get('system_prompt', 
             """你是一个智能Agent，负责在多Agent文明模拟系统中做出决策。
             请基于提供的信息和上下文，做出符合你角色的决策。
             你的回答应该简洁明了，直接针对问题给出具体的建议或决策。"""
-        ) 
\ No newline at end of file
+        )
+        
+        # 限流与重试配置（同一提供商账号、同样配额的LLMInterface实例共享）
+        self.requests_per_minute = kwargs.get('requests_per_minute', 60)  # 每分钟请求数上限
+        self.tokens_per_minute = kwargs.get('tokens_per_minute', 90000)  # 每分钟token数上限
+        self.max_retries = kwargs.get('max_retries', 5)  # 429/5xx时的最大重试次数
+        self.retry_base_delay = kwargs.get('retry_base_delay', 1.0)  # 指数退避基础等待秒数
+        self.retry_max_delay = kwargs.get('retry_max_delay', 60.0)  # 单次退避最大等待秒数
+        
+        # 自适应并发配置
+        self.initial_concurrency = kwargs.get('initial_concurrency', 4)
+        self.min_concurrency = kwargs.get('min_concurrency', 1)
+        self.max_concurrency = kwargs.get('max_concurrency', 16)
+        self.target_latency = kwargs.get('target_latency', 30.0)  # 超过该延迟（秒）即降低并发
+        self.priority_aging_interval = kwargs.get('priority_aging_interval', 10.0)  # 排队每满该秒数提升一级优先级
+        
+        # 响应缓存（SQLite），多次运行/多进程间共享相同请求的响应
+        self.response_cache_path = kwargs.get('response_cache_path', None) 
\ No newline at end of file
@@ -13,4 +13,36 @@ class SimulationConfig:
         self.civilizations = kwargs.get('civilizations', [])
         self.seed = kwargs.get('seed', None)
         self.output_dir = kwargs.get('output_dir', 'output')
-        self.verbose = kwargs.get('verbose', False) 
\ No newline at end of file
+        self.verbose = kwargs.get('verbose', False)
+        self.save_interval = kwargs.get('save_interval', 10)  # 每隔多少回合保存一次检查点
+        self.checkpoint_compression = kwargs.get('checkpoint_compression', 'zlib')  # 检查点压缩方式：zlib或lzma
+        self.checkpoint_full_interval = kwargs.get('checkpoint_full_interval', 10)  # 每隔多少个检查点写一次完整检查点，其余只写增量
+        self.checkpoint_keep_resume = kwargs.get('checkpoint_keep_resume', 2)  # 保留的完整恢复点个数，分叉到更早回合时需调大
+        self.structured_decisions = kwargs.get('structured_decisions', False)  # 领导直接输出结构化命令，省去各部门的命令提取调用
+        self.event_batch_mode = kwargs.get('event_batch_mode', False)  # 每回合的随机事件合并为少量LLM请求生成
+        self.event_batch_size = kwargs.get('event_batch_size', 10)  # 每个批量请求最多包含的事件数
+        self.event_library_path = kwargs.get('event_library_path', None)  # 预生成事件库路径（不含扩展名）
+        self.event_retention_turns = kwargs.get('event_retention_turns', 100)  # 内存中保留的事件回合数，更早的写入输出目录，None表示全部保留 
+        self.history_dir = kwargs.get('history_dir', None)  # 历史数据磁盘存储目录，None表示使用输出目录下的history
+        self.history_keyframe_interval = kwargs.get('history_keyframe_interval', 20)  # 历史存储中完整文明状态关键帧的间隔回合数
+        self.history_db_path = kwargs.get('history_db_path', None)  # 历史数据SQLite数据库路径，None表示不写入数据库
+        self.tile_export_dir = kwargs.get('tile_export_dir', None)  # 地块时间序列导出目录，None表示不导出
+        self.tile_export_chunk_turns = kwargs.get('tile_export_chunk_turns', 16)  # 地块导出文件每个分块包含的回合数
+        self.world_cache_dir = kwargs.get('world_cache_dir', None)  # 世界生成缓存目录，相同尺寸/资源分布/种子的世界直接读取，None表示不缓存
+        self.fast_forward_turns = kwargs.get('fast_forward_turns', 0)  # 开始时用启发式策略（不调用LLM）快进的回合数，之后由LLM接手
+        self.fast_forward_environment_interval = kwargs.get('fast_forward_environment_interval', 10)  # 快进时每隔多少回合更新一次地块气候和资源（一次应用累计的变化），地块导出也只在这些回合进行
+        self.surrogate_path = kwargs.get('surrogate_path', None)  # 领导决策代理模型路径（不含扩展名，见models.surrogate），None表示不使用
+        self.surrogate_confidence = kwargs.get('surrogate_confidence', 0.8)  # 代理模型置信度达到该值时直接采用其决策，否则调用LLM
+        self.turn_time_budget = kwargs.get('turn_time_budget', None)  # 每回合的时间预算（秒），None表示不限时
+        self.turn_normal_reserve = kwargs.get('turn_normal_reserve', 0.25)  # 剩余时间低于该比例时不再发起顾问建议等普通调用
+        self.turn_background_reserve = kwargs.get('turn_background_reserve', 0.5)  # 剩余时间低于该比例时不再发起叙事、评估、事件内容等后台调用
+        self.advice_reuse = kwargs.get('advice_reuse', False)  # 顾问的提示词输入没有明显变化时沿用上次的建议，不调用LLM
+        self.advice_refresh_interval = kwargs.get('advice_refresh_interval', 5)  # 沿用建议时每隔多少回合强制重新生成
+        self.advice_tolerances = kwargs.get('advice_tolerances', {
+            'population': '1%',
+            'military_power': '2%',
+            'economic_power': '2%',
+            'cultural_influence': '2%',
+            'happiness': 1
+        })  # 字段 -> 容差（数值为绝对容差，'2%'为相对容差），未列出的字段必须完全相同
+        self.llm_workers = kwargs.get('llm_workers', 4)  # 各文明决策、各顾问建议并发调用LLM的线程数，1表示依次调用
\ No newline at end of file
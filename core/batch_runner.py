@@ -0,0 +1,216 @@
+import copy
+import hashlib
+import json
+import logging
+import os
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from config.llm_config import LLMConfig
+
+# 汇总中记录的文明最终指标
+SUMMARY_METRICS = ['population', 'military_power', 'economic_power', 'technology_level',
+                   'cultural_influence', 'happiness']
+
+class BatchRunner:
+    """在进程池中按多个种子和配置变体批量运行同一场景
+
+    每次运行由参数（种子和变体覆盖的配置项）的规范哈希标识，输出写入output_dir/runs/<run_id>。
+    所有工作进程共享世界生成缓存（output_dir/world_cache）和LLM响应缓存（output_dir/llm_cache.db），
+    每次运行结束后摘要指标立即追加到output_dir/results.jsonl。重新运行同一批次时跳过已成功的运行，
+    中断的运行从其最近的恢复点继续。early_stop为可选的提前停止条件（见Simulation.run），
+    并行运行时必须可以被pickle。
+    llm_config中的每分钟请求数和token数是整个批次的总配额：每个工作进程有自己的限流器，
+    因此并行运行时按进程数平分给各进程。
+    """
+
+    def __init__(self, base_config, output_dir, seeds, variants=None, processes=None, llm_config=None,
+                 early_stop=None):
+        self.base_config = base_config
+        self.output_dir = output_dir
+        self.seeds = list(seeds)
+        self.variants = variants or {'base': {}}  # 变体名 -> 覆盖的配置项
+        self.processes = processes
+        self.llm_config = llm_config or LLMConfig()
+        self.early_stop = early_stop
+        self.results_path = os.path.join(output_dir, 'results.jsonl')
+
+        if not os.path.exists(output_dir):
+            os.makedirs(output_dir)
+        if not self.base_config.world_cache_dir:
+            self.base_config = copy.copy(self.base_config)
+            self.base_config.world_cache_dir = os.path.join(output_dir, 'world_cache')
+        if not self.llm_config.response_cache_path:
+            self.llm_config = copy.copy(self.llm_config)
+            self.llm_config.response_cache_path = os.path.join(output_dir, 'llm_cache.db')
+
+    def runs(self):
+        """全部运行的 [(run_id, 变体名, 参数)]，相同参数只保留一次"""
+        runs = []
+        seen = set()
+        for variant, overrides in self.variants.items():
+            for seed in self.seeds:
+                params = dict(overrides, seed=seed)
+                run_id = canonical_run_id(params)
+                if run_id not in seen:
+                    seen.add(run_id)
+                    runs.append((run_id, variant, params))
+        return runs
+
+    def pending_runs(self):
+        """尚未成功完成的运行"""
+        completed = {result['run_id'] for result in load_results(self.results_path) if result.get('status') == 'ok'}
+        return [run for run in self.runs() if run[0] not in completed]
+
+    def run(self):
+        """运行所有未完成的运行，返回本次得到的摘要列表"""
+        pending = self.pending_runs()
+        print(f"批量运行: 共 {len(self.runs())} 个，待运行 {len(pending)} 个")
+
+        results = []
+        if not self.processes or self.processes <= 1:
+            for run_id, variant, params in pending:
+                results.append(self._record(_run_single(*self._task(run_id, variant, params))))
+            return results
+
+        with ProcessPoolExecutor(max_workers=self.processes) as executor:
+            futures = [executor.submit(_run_single, *self._task(run_id, variant, params))
+                       for run_id, variant, params in pending]
+            for future in as_completed(futures):
+                results.append(self._record(future.result()))
+        return results
+
+    def worker_llm_config(self):
+        """单个工作进程使用的LLM配置：总配额按进程数平分"""
+        if not self.processes or self.processes <= 1:
+            return self.llm_config
+        config = copy.copy(self.llm_config)
+        config.requests_per_minute = max(1, self.llm_config.requests_per_minute // self.processes)
+        config.tokens_per_minute = max(1, self.llm_config.tokens_per_minute // self.processes)
+        return config
+
+    def _task(self, run_id, variant, params):
+        return (self.base_config, self.worker_llm_config(), run_id, variant, params,
+                os.path.join(self.output_dir, 'runs', run_id), self.early_stop)
+
+    def _record(self, result):
+        """把一次运行的摘要追加到结果文件"""
+        with open(self.results_path, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(result, ensure_ascii=False, default=str) + '\n')
+            f.flush()
+            os.fsync(f.fileno())
+        print(f"运行 {result['run_id']} ({result['variant']}, seed={result['params']['seed']}): {result['status']}")
+        return result
+
+
+def canonical_run_id(params):
+    """由运行参数计算稳定的运行标识（键顺序无关）"""
+    payload = json.dumps(params, ensure_ascii=False, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()[:16]
+
+
+def load_results(path):
+    """读取结果文件中的摘要，跳过崩溃时写了一半的行"""
+    results = []
+    if not os.path.exists(path):
+        return results
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            try:
+                results.append(json.loads(line))
+            except ValueError:
+                continue
+    return results
+
+
+def _run_single(base_config, llm_config, run_id, variant, params, run_dir, early_stop=None):
+    """在工作进程中运行一次模拟并返回摘要"""
+    from core.simulation import Simulation
+    from llm.llm_interface import LLMInterface
+
+    started = time.time()
+    result = {'run_id': run_id, 'variant': variant, 'params': params}
+    simulation = None
+    log_handler = None
+    try:
+        config = _run_config(base_config, params, run_dir)
+        log_handler = _redirect_run_log(run_dir)
+        simulation = Simulation(config, LLMInterface(llm_config))
+        simulation.run(resume=os.path.exists(simulation.checkpoint_dir), should_stop=early_stop)
+        result.update(_summarize(simulation))
+        result['status'] = 'ok'
+    except Exception as e:
+        result['status'] = 'error'
+        result['error'] = f"{type(e).__name__}: {e}"
+        result['traceback'] = traceback.format_exc()
+        if simulation is not None:
+            simulation.observer.close()
+            simulation.checkpoint_writer.close()
+    finally:
+        if log_handler is not None:
+            _restore_run_log(log_handler)
+    result['duration'] = time.time() - started
+    return result
+
+
+def _redirect_run_log(run_dir):
+    """工作进程中的模块日志（降级、解析失败等警告）只写入运行目录的simulation.log，不输出到控制台"""
+    logger = logging.getLogger('civilization_sim')
+    handler = logging.FileHandler(os.path.join(run_dir, 'simulation.log'), encoding='utf-8')
+    handler.setFormatter(logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s'))
+    handler.previous_handlers = logger.handlers
+    logger.handlers = [handler]
+    return handler
+
+
+def _restore_run_log(handler):
+    """恢复工作进程原有的日志处理器"""
+    logging.getLogger('civilization_sim').handlers = handler.previous_handlers
+    handler.close()
+
+
+def _run_config(base_config, params, run_dir):
+    """复制基础配置，应用运行参数并把输出路径指向运行目录
+
+    参数名可以用点号指定字典类配置项中的键，例如 'world_size.width'。
+    """
+    config = copy.deepcopy(base_config)
+    for key, value in params.items():
+        field, _, item = key.partition('.')
+        if item:
+            getattr(config, field)[item] = value
+        else:
+            setattr(config, field, value)
+    config.output_dir = run_dir
+    if config.history_dir:
+        config.history_dir = os.path.join(run_dir, 'history')
+    if config.history_db_path:
+        config.history_db_path = os.path.join(run_dir, 'history.db')
+    if config.tile_export_dir:
+        config.tile_export_dir = os.path.join(run_dir, 'tiles')
+    if not os.path.exists(run_dir):
+        os.makedirs(run_dir)
+    return config
+
+
+def _summarize(simulation):
+    """一次运行的摘要指标：各文明最终指标、平衡干预次数、最大力量比和胜者"""
+    civilization_states = simulation.world_state.civilization_states
+    balance_history = simulation.balancer.balance_history
+    power_ratios = [entry.get('before', entry.get('analysis', {})).get('max_power_ratio', 1.0)
+                    for entry in balance_history]
+    final_power = simulation.balancer._analyze_civilization_power(simulation.world_state)
+
+    return {
+        'turns': simulation.current_turn,
+        'stopped_early': simulation.stopped_early,
+        'final_metrics': {
+            civ_id: {metric: state.get(metric) for metric in SUMMARY_METRICS}
+            for civ_id, state in civilization_states.items()
+        },
+        'balancer_interventions': sum(1 for entry in balance_history if entry['measures_applied']),
+        'max_power_ratio': max(power_ratios) if power_ratios else None,
+        'final_power_scores': final_power['power_scores'],
+        'winner': final_power.get('strongest')
+    }
@@ -0,0 +1,104 @@
+import heapq
+import itertools
+
+# 事件effects中的数值项 -> 文明状态字段
+EFFECT_FIELDS = {
+    'political': 'happiness',
+    'economic': 'economic_power',
+    'military': 'military_power',
+    'cultural': 'cultural_influence',
+    'population': 'population'
+}
+
+# 按相对比例变化的字段（每回合变化率），其余字段为每回合绝对增量
+RELATIVE_FIELDS = {'population'}
+
+# 有取值范围的字段
+FIELD_BOUNDS = {'happiness': (0, 100)}
+
+class EventEffectEngine:
+    """事件效果引擎：按到期回合维护活跃效果的小顶堆
+
+    每回合对活跃效果应用一次数值修正（O(活跃效果数)），到期效果从堆顶弹出（每个O(log n)），
+    无需扫描完整的事件记录。事件的剩余回合数通过WorldState.update_event写回，使快照能识别变化。
+    """
+
+    def __init__(self):
+        self.active_effects = {}  # 效果ID -> 活跃效果
+        self._expiry_heap = []  # (到期回合, 效果ID)
+        self._effect_ids = itertools.count()
+
+    def schedule(self, event, current_turn):
+        """登记事件效果；事件从当前回合起生效duration个回合"""
+        modifiers = self._numeric_modifiers(event)
+        target = event.get('target_civilization')
+        if not modifiers or target is None:
+            return None
+
+        duration = max(1, int(event.get('duration', 1)))
+        effect_id = next(self._effect_ids)
+        self.active_effects[effect_id] = {
+            'event': event,
+            'target': target,
+            'modifiers': modifiers,
+            'expiry_turn': current_turn + duration
+        }
+        heapq.heappush(self._expiry_heap, (current_turn + duration, effect_id))
+        return effect_id
+
+    def apply_turn(self, world_state):
+        """退役到期效果并应用所有活跃效果，返回本回合到期的事件"""
+        turn = world_state.current_turn
+
+        expired_events = []
+        while self._expiry_heap and self._expiry_heap[0][0] <= turn:
+            _, effect_id = heapq.heappop(self._expiry_heap)
+            effect = self.active_effects.pop(effect_id)
+            world_state.update_event(effect['event'], turns_remaining=0)
+            expired_events.append(effect['event'])
+
+        for effect in self.active_effects.values():
+            self._apply_effect(world_state, effect)
+            world_state.update_event(effect['event'], turns_remaining=effect['expiry_turn'] - turn - 1)
+
+        return expired_events
+
+    def _apply_effect(self, world_state, effect):
+        """将单个效果的数值修正应用到目标文明状态"""
+        civ_state = world_state.get_civilization_state(effect['target'])
+        if not civ_state:
+            return
+
+        state_update = {}
+        for field, delta in effect['modifiers'].items():
+            current = civ_state.get(field, 0)
+            if field in RELATIVE_FIELDS:
+                value = type(current)(current * (1 + delta))
+            else:
+                value = current + delta
+
+            if field in FIELD_BOUNDS:
+                low, high = FIELD_BOUNDS[field]
+                value = max(low, min(high, value))
+            state_update[field] = value
+
+        world_state.update_civilization_state(effect['target'], state_update)
+
+    def _numeric_modifiers(self, event):
+        """提取事件的数值修正：显式的modifiers优先，其次是effects中的数值项"""
+        modifiers = {}
+
+        for category, value in event.get('effects', {}).items():
+            if category in EFFECT_FIELDS and isinstance(value, (int, float)) and not isinstance(value, bool):
+                modifiers[EFFECT_FIELDS[category]] = value
+
+        for field, value in (event.get('modifiers') or {}).items():
+            if isinstance(value, (int, float)) and not isinstance(value, bool):
+                modifiers[field] = value
+
+        return modifiers
+
+    def get_active_effects(self, civilization_id=None):
+        """获取活跃效果，可按目标文明过滤"""
+        return [effect for effect in self.active_effects.values()
+                if civilization_id is None or effect['target'] == civilization_id]
@@ -1,3 +1,5 @@
+import os
+import random
 from models.civilization import Civilization
 from agents.system_agents.world_engine import WorldEngineAgent
 from agents.system_agents.historical_arbiter import HistoricalArbiterAgent
@@ -5,27 +7,80 @@ from agents.system_agents.balancer import BalancerAgent
 from agents.system_agents.event_generator import EventGeneratorAgent
 from agents.system_agents.observer import ObserverAgent
 from agents.system_agents.narrative_constructor import NarrativeConstructorAgent
+from utils.event_library import EventLibrary
+from core.event_effects import EventEffectEngine
+from utils.history_store import HistoryStore
+from utils.sqlite_sink import SQLiteHistorySink
+from utils.tile_export import TileSeriesExporter
+from utils.concurrency import map_concurrently
+from models.surrogate import DecisionSurrogate
+from llm.llm_interface import DeadlineExceeded
+from llm.deadline import TurnDeadline, turn_deadline, note_degradation
+from utils.checkpoint import CheckpointWriter, capture_simulation_state, restore_simulation_state, load_resume_point
 
 class Simulation:
     """模拟主循环控制器"""
     
-    def __init__(self, config):
+    def __init__(self, config, llm_interface=None):
         self.config = config
+        self.llm_interface = llm_interface  # 所有Agent共享的LLM接口，None时各Agent使用默认接口
         self.current_turn = 0
         self.max_turns = config.max_turns
         self.civilizations = {}
         self.world_state = None
+        self.stopped_early = False  # 是否因提前停止条件结束
         
         # 初始化系统级Agent
-        self.world_engine = WorldEngineAgent("World Engine")
-        self.historical_arbiter = HistoricalArbiterAgent("Historical Arbiter")
-        self.balancer = BalancerAgent("Balancer")
-        self.event_generator = EventGeneratorAgent("Event Generator")
-        self.observer = ObserverAgent("Observer")
-        self.narrative_constructor = NarrativeConstructorAgent("Narrative Constructor")
+        self.world_engine = WorldEngineAgent("World Engine", llm_interface)
+        self.historical_arbiter = HistoricalArbiterAgent("Historical Arbiter", llm_interface)
+        self.balancer = BalancerAgent("Balancer", llm_interface)
+        self.event_generator = EventGeneratorAgent(
+            "Event Generator",
+            llm_interface=llm_interface,
+            batch_mode=config.event_batch_mode,
+            batch_size=config.event_batch_size,
+            event_library=EventLibrary(config.event_library_path) if config.event_library_path else None,
+            seed=config.seed
+        )
+        self.observer = ObserverAgent(
+            "Observer",
+            llm_interface=llm_interface,
+            max_turns=config.max_turns,
+            # 历史始终写入磁盘存储，恢复点只记录存储中的位置
+            history_store=HistoryStore(
+                config.history_dir or os.path.join(config.output_dir, 'history'),
+                keyframe_interval=config.history_keyframe_interval
+            ),
+            sinks=[SQLiteHistorySink(config.history_db_path)] if config.history_db_path else None
+        )
+        self.narrative_constructor = NarrativeConstructorAgent("Narrative Constructor", llm_interface)
+        
+        # 事件效果引擎
+        self.effect_engine = EventEffectEngine()
+        
+        # 领导决策代理模型，所有文明共享
+        self.surrogate = DecisionSurrogate.load(config.surrogate_path) if config.surrogate_path else None
+        
+        # 地块时间序列导出，在initialize中创建
+        self.tile_exporter = None
+        
+        # 因回合时间不足推迟生成叙事的回合，模拟结束时补生成
+        self.deferred_narratives = []
+        
+        # 后台写入的恢复点
+        self.checkpoint_dir = os.path.join(config.output_dir, 'checkpoints')
+        self.checkpoint_writer = CheckpointWriter(
+            self.checkpoint_dir,
+            compression=config.checkpoint_compression,
+            full_interval=config.checkpoint_full_interval,
+            keep_resume=config.checkpoint_keep_resume
+        )
         
     def initialize(self):
         """初始化模拟"""
+        if self.config.seed is not None:
+            random.seed(self.config.seed)
+        
         # 创建初始世界状态
         self.world_state = self.world_engine.initialize_world(self.config)
         
@@ -34,45 +89,154 @@ class Simulation:
             civ = Civilization(
                 id=civ_config.id,
                 name=civ_config.name,
-                initial_state=civ_config.initial_state
+                initial_state=civ_config.initial_state,
+                structured_decisions=self.config.structured_decisions,
+                llm_interface=self.llm_interface,
+                surrogate=self.surrogate,
+                surrogate_threshold=self.config.surrogate_confidence,
+                advice_reuse={
+                    'refresh_interval': self.config.advice_refresh_interval,
+                    'tolerances': self.config.advice_tolerances
+                } if self.config.advice_reuse else None,
+                advice_workers=self.config.llm_workers
             )
             self.civilizations[civ.id] = civ
+        
+        # 文明初始状态写入世界状态（从恢复点继续时由恢复点中的世界状态替换）
+        for civ_id, civ in self.civilizations.items():
+            initial_state = {
+                'name': civ.name,
+                'population': civ.population_agent.population,
+                'resources': {},
+                'military_power': 100,
+                'economic_power': 100,
+                'technology_level': 1,
+                'cultural_influence': 50,
+                'happiness': 50,
+                'diplomatic_relations': {other_id: 0 for other_id in self.civilizations if other_id != civ_id}
+            }
+            initial_state.update(civ.state)
+            self.world_state.update_civilization_state(civ_id, initial_state)
             
         # 初始化观察者
         self.observer.initialize(self.civilizations.keys())
         
-    def run(self):
-        """运行完整模拟"""
+        if self.config.tile_export_dir:
+            self.tile_exporter = TileSeriesExporter(
+                self.config.tile_export_dir,
+                self.world_state,
+                chunk_turns=self.config.tile_export_chunk_turns
+            )
+        
+    def run(self, resume=False, should_stop=None):
+        """运行完整模拟，resume为True时从最近的恢复点继续
+        
+        should_stop为可选的提前停止条件 should_stop(simulation)，每回合结束后检查，返回True时不再继续。
+        """
         self.initialize()
+        resumed = resume and self.resume()
+        if resume and not resumed:
+            print(f"{self.checkpoint_dir} 中没有恢复点，从头开始模拟")
+        if not resumed:
+            # 从头开始时丢弃输出目录中之前运行留下的历史
+            self.observer.truncate_history(0)
         
+        self.stopped_early = False
+        if self.current_turn < self.config.fast_forward_turns:
+            self.fast_forward(self.config.fast_forward_turns)
         while self.current_turn < self.max_turns:
             self.run_turn()
+            if should_stop is not None and should_stop(self):
+                print(f"回合 {self.current_turn} 满足提前停止条件，结束模拟")
+                self.stopped_early = True
+                break
+        
+        # 最后一回合不在保存间隔上时也保存恢复点，之后可以用更大的max_turns继续
+        if self.current_turn % self.config.save_interval != 0:
+            self.save_checkpoint()
+        
+        # 补生成推迟的回合叙事（不受回合时间预算限制）
+        for turn in self.deferred_narratives:
+            print(f"Deferred narrative for turn {turn}")
+            print(self.narrative_constructor.generate_turn_narrative(self.observer.get_turn_data(turn)))
+        self.deferred_narratives = []
             
         # 生成最终叙事和报告
         final_narrative = self.narrative_constructor.generate_full_narrative(
             self.observer.get_full_history()
         )
+        self.observer.close()
+        self.checkpoint_writer.close()
+        if self.tile_exporter:
+            self.tile_exporter.close()
         
         return final_narrative
     
-    def run_turn(self):
-        """运行单个回合"""
+    def fast_forward(self, until_turn):
+        """快进到until_turn回合：各文明使用确定性的启发式策略，不调用LLM，不生成回合叙事
+        
+        地块的气候和资源每fast_forward_environment_interval回合更新一次（一次应用累计的变化），
+        地块导出也只包含这些回合，之后第一个LLM回合补上剩余的回合。逐地块更新仍与地图大小成正比，
+        大地图上它决定了快进速度的上限（100x100约每秒一两百回合）。
+        之后可以继续调用run_turn，由LLM驱动接手。
+        """
+        until_turn = min(until_turn, self.max_turns)
+        print(f"Fast-forwarding from turn {self.current_turn} to turn {until_turn}")
+        while self.current_turn < until_turn:
+            self.run_turn(heuristic=True)
+    
+    def run_turn(self, heuristic=False):
+        """运行单个回合，heuristic为True时为快进回合（见fast_forward）
+        
+        设置了turn_time_budget时回合在时间预算内运行：临近截止时跳过叙事、评估、事件内容等后台调用，
+        迟到的顾问建议沿用上一次的建议或启发式建议，所有降级记录到观察者。
+        """
+        deadline = None
+        if self.config.turn_time_budget and not heuristic:
+            deadline = TurnDeadline(
+                self.config.turn_time_budget,
+                normal_reserve=self.config.turn_normal_reserve,
+                background_reserve=self.config.turn_background_reserve
+            )
+        with turn_deadline(deadline):
+            self._play_turn(heuristic)
+        
+        if deadline is not None:
+            for degradation in deadline.degradations:
+                self.observer.record_degradation(self.current_turn, degradation)
+            if deadline.degradations:
+                print(f"Turn {self.current_turn}: {len(deadline.degradations)} degradation(s) to stay within the time budget")
+        
+        if self.current_turn % self.config.save_interval == 0:
+            self.save_checkpoint()
+    
+    def _play_turn(self, heuristic):
+        """回合的各个阶段"""
         self.current_turn += 1
-        print(f"Starting turn {self.current_turn}")
+        if not heuristic:
+            print(f"Starting turn {self.current_turn}")
         
         # 1. 世界级Agent更新环境
-        self.world_state = self.world_engine.update_environment(self.world_state)
+        # 快进回合每隔fast_forward_environment_interval回合才更新一次地块
+        self.world_state = self.world_engine.update_environment(
+            self.world_state,
+            self.config.fast_forward_environment_interval if heuristic else 1
+        )
         
         # 2. 生成随机事件
-        events = self.event_generator.generate_events(self.world_state, self.civilizations)
+        events = self.event_generator.generate_events(self.world_state, self.civilizations, offline=heuristic)
         for event in events:
             self.apply_event(event)
+        self.effect_engine.apply_turn(self.world_state)
         
-        # 3. 各文明内部决策
-        civilization_decisions = {}
-        for civ_id, civ in self.civilizations.items():
-            decisions = civ.make_decisions(self.world_state)
-            civilization_decisions[civ_id] = decisions
+        # 3. 各文明内部决策（并发进行，快进回合不调用LLM，依次进行）
+        civ_ids = list(self.civilizations)
+        decisions = map_concurrently(
+            lambda civ_id: self.civilizations[civ_id].make_decisions(self.world_state, heuristic=heuristic),
+            civ_ids,
+            1 if heuristic else self.config.llm_workers
+        )
+        civilization_decisions = dict(zip(civ_ids, decisions))
         
         # 4. 文明间交互
         interaction_results = self.process_civilization_interactions(civilization_decisions)
@@ -82,7 +246,7 @@ class Simulation:
         
         # 6. 系统级Agent评估并调整
         self.world_state = self.balancer.balance_world(self.world_state)
-        historical_assessment = self.historical_arbiter.assess(self.world_state)
+        historical_assessment = None if heuristic else self.historical_arbiter.assess(self.world_state)
         
         # 7. 更新文明状态
         for civ_id, civ in self.civilizations.items():
@@ -98,19 +262,70 @@ class Simulation:
             events,
             historical_assessment
         )
+        if self.tile_exporter and self.world_engine.environment_turn == self.current_turn:
+            # 快进中没有更新地块的回合不导出
+            self.tile_exporter.append(self.current_turn, self.world_state)
         
-        # 生成当前回合叙事
-        turn_narrative = self.narrative_constructor.generate_turn_narrative(
-            self.observer.get_turn_data(self.current_turn)
+        # 生成当前回合叙事（快进回合不生成，回合时间不足时推迟到模拟结束）
+        if not heuristic:
+            try:
+                turn_narrative = self.narrative_constructor.generate_turn_narrative(
+                    self.observer.get_turn_data(self.current_turn)
+                )
+            except DeadlineExceeded:
+                turn_narrative = "(narrative deferred)"
+                self.deferred_narratives.append(self.current_turn)
+                note_degradation('narrative', 'deferred', {'turn': self.current_turn})
+            
+            print(f"Turn {self.current_turn} completed")
+            print(turn_narrative)
+    
+    def system_agents(self):
+        """系统级Agent，键与恢复点中的名称对应"""
+        return {
+            'world_engine': self.world_engine,
+            'historical_arbiter': self.historical_arbiter,
+            'balancer': self.balancer,
+            'event_generator': self.event_generator,
+            'observer': self.observer,
+            'narrative_constructor': self.narrative_constructor
+        }
+    
+    def save_checkpoint(self):
+        """提交当前回合的世界状态检查点（完整或增量）和完整恢复点，由后台线程写入"""
+        self.checkpoint_writer.submit(self.current_turn, self.world_state.snapshot())
+        self.checkpoint_writer.submit_state(
+            self.current_turn,
+            capture_simulation_state(
+                self.current_turn,
+                self.world_state,
+                self.civilizations,
+                self.system_agents(),
+                self.effect_engine
+            )
         )
+    
+    def resume(self, turn=None):
+        """从turn（默认最新）回合的恢复点还原模拟状态，需先调用initialize，返回是否成功"""
+        state = load_resume_point(self.checkpoint_dir, turn)
+        if state is None:
+            return False
         
-        print(f"Turn {self.current_turn} completed")
-        print(turn_narrative)
+        self.world_state, self.effect_engine = restore_simulation_state(state, self.civilizations, self.system_agents())
+        self.current_turn = state['turn']
+        if self.config.tile_export_dir:
+            self.tile_exporter = TileSeriesExporter(
+                self.config.tile_export_dir,
+                self.world_state,
+                chunk_turns=self.config.tile_export_chunk_turns,
+                resume_turn=self.current_turn
+            )
+        return True
         
     def apply_event(self, event):
         """应用随机事件到世界和文明"""
-        # 实现事件应用逻辑
-        pass
+        # 登记到效果引擎，由其在持续期内逐回合应用数值效果
+        self.effect_engine.schedule(event, self.world_state.current_turn)
         
     def process_civilization_interactions(self, decisions):
         """处理文明间的交互"""
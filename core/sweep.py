@@ -0,0 +1,178 @@
+import itertools
+import json
+import os
+import random
+
+import numpy as np
+
+from core.batch_runner import BatchRunner, SUMMARY_METRICS, canonical_run_id, load_results
+
+class ParameterSweep:
+    """对SimulationConfig配置项做网格或拉丁超立方扫描
+
+    grid为 配置项 -> 取值列表，取全部组合；ranges为拉丁超立方采样的范围，配置项 -> (下限, 上限)
+    表示连续取值（上下限都是整数时取整），配置项 -> 取值列表表示离散取值，共采样samples组。
+    配置项可以用点号指定字典类配置中的键（如 'world_size.width'）。两者可同时给出，结果取并集。
+    与基础配置相同的取值会被去掉后再计算哈希，因此实际相同的配置只运行一次。
+    每组配置按seeds中的每个种子运行一次，调度、缓存共享和断点续跑由BatchRunner完成。
+    """
+
+    def __init__(self, base_config, output_dir, grid=None, ranges=None, samples=10, seeds=(0,),
+                 processes=None, early_stop=None, llm_config=None, sample_seed=0):
+        self.base_config = base_config
+        self.output_dir = output_dir
+        self.grid = grid or {}
+        self.ranges = ranges or {}
+        self.samples = samples
+        self.sample_seed = sample_seed  # 拉丁超立方采样使用的随机种子，不影响模拟本身
+        self.runner = BatchRunner(
+            base_config,
+            output_dir,
+            seeds=seeds,
+            variants=self.variants(),
+            processes=processes,
+            llm_config=llm_config,
+            early_stop=early_stop
+        )
+
+    def configurations(self):
+        """去重后的配置覆盖项列表"""
+        configurations = []
+        seen = set()
+        for overrides in self._grid_points() + self._latin_hypercube_points():
+            overrides = self._normalize(overrides)
+            key = canonical_run_id(overrides)
+            if key not in seen:
+                seen.add(key)
+                configurations.append(overrides)
+        return configurations
+
+    def variants(self):
+        """变体名 -> 配置覆盖项，变体名由配置哈希得到"""
+        return {f"config_{canonical_run_id(overrides)[:8]}": overrides for overrides in self.configurations()}
+
+    def run(self):
+        """运行所有未完成的运行，写入并返回结果表"""
+        self.runner.run()
+        table = self.results_table()
+        save_results_table(os.path.join(self.output_dir, 'results.npz'), table)
+        return table
+
+    def results_table(self):
+        """本次扫描的结果表（列名 -> NumPy数组），每个运行取最后一条记录"""
+        run_ids = {run_id for run_id, _, _ in self.runner.runs()}
+        latest = {}
+        for result in load_results(self.runner.results_path):
+            if result['run_id'] in run_ids:
+                latest[result['run_id']] = result
+        parameters = sorted(set(self.grid) | set(self.ranges))
+        defaults = {parameter: self._base_value(parameter) for parameter in parameters}
+        return build_results_table(list(latest.values()), parameters, defaults)
+
+    def _grid_points(self):
+        if not self.grid:
+            return []
+        fields = sorted(self.grid)
+        return [dict(zip(fields, values)) for values in itertools.product(*(self.grid[f] for f in fields))]
+
+    def _latin_hypercube_points(self):
+        """每个维度分成samples个等概率区间，各区间恰好取一次，区间顺序在维度间随机打乱"""
+        if not self.ranges:
+            return []
+        rng = random.Random(self.sample_seed)
+        points = [{} for _ in range(self.samples)]
+        for field in sorted(self.ranges):
+            spec = self.ranges[field]
+            strata = list(range(self.samples))
+            rng.shuffle(strata)
+            for point, stratum in zip(points, strata):
+                position = (stratum + rng.random()) / self.samples
+                if isinstance(spec, list):
+                    point[field] = spec[min(int(position * len(spec)), len(spec) - 1)]
+                else:
+                    low, high = spec
+                    value = low + position * (high - low)
+                    point[field] = int(round(value)) if isinstance(low, int) and isinstance(high, int) else value
+        return points
+
+    def _normalize(self, overrides):
+        """去掉与基础配置相同的取值"""
+        return {key: value for key, value in overrides.items() if self._base_value(key) != value}
+
+    def _base_value(self, key):
+        field, _, item = key.partition('.')
+        value = getattr(self.base_config, field, None)
+        if item:
+            return value.get(item) if isinstance(value, dict) else None
+        return value
+
+
+class DivergenceStop:
+    """提前停止条件：文明间力量比超过max_power_ratio，或某个文明人口降到min_population以下
+
+    前min_turn回合不检查。作为Simulation.run/BatchRunner的should_stop使用，可以被pickle。
+    """
+
+    def __init__(self, max_power_ratio=5.0, min_population=0, min_turn=10):
+        self.max_power_ratio = max_power_ratio
+        self.min_population = min_population
+        self.min_turn = min_turn
+
+    def __call__(self, simulation):
+        if simulation.current_turn < self.min_turn:
+            return False
+        civilization_states = simulation.world_state.civilization_states
+        if any(state.get('population', self.min_population + 1) <= self.min_population
+               for state in civilization_states.values()):
+            return True
+        analysis = simulation.balancer._analyze_civilization_power(simulation.world_state)
+        return analysis['max_power_ratio'] > self.max_power_ratio
+
+
+def build_results_table(results, parameters, defaults=None):
+    """把运行摘要展开为列式结果表
+
+    数值列为float64（缺失为nan），其余列为字符串；非标量参数值以JSON字符串保存。
+    运行参数中没有的配置项取defaults中的基础配置值。
+    各文明最终指标展开为 '<文明ID>.<指标>' 列。
+    """
+    civ_ids = sorted({civ_id for result in results for civ_id in result.get('final_metrics', {})})
+    columns = {
+        'run_id': [r['run_id'] for r in results],
+        'variant': [r['variant'] for r in results],
+        'status': [r['status'] for r in results],
+        'seed': [r['params'].get('seed') for r in results],
+        'duration': [r.get('duration') for r in results],
+        'turns': [r.get('turns') for r in results],
+        'stopped_early': [r.get('stopped_early') for r in results],
+        'balancer_interventions': [r.get('balancer_interventions') for r in results],
+        'max_power_ratio': [r.get('max_power_ratio') for r in results],
+        'winner': [r.get('winner') for r in results]
+    }
+    defaults = defaults or {}
+    for parameter in parameters:
+        columns[f"param.{parameter}"] = [r['params'].get(parameter, defaults.get(parameter)) for r in results]
+    for civ_id in civ_ids:
+        for metric in SUMMARY_METRICS:
+            columns[f"{civ_id}.{metric}"] = [r.get('final_metrics', {}).get(civ_id, {}).get(metric) for r in results]
+
+    return {name: _column_array(values) for name, values in columns.items()}
+
+
+def save_results_table(path, table):
+    """保存结果表为.npz（每列一个数组）"""
+    np.savez_compressed(path, **table)
+
+
+def load_results_table(path):
+    """读取save_results_table保存的结果表"""
+    with np.load(path) as data:
+        return {name: data[name] for name in data.files}
+
+
+def _column_array(values):
+    present = [v for v in values if v is not None]
+    if all(isinstance(v, (int, float)) for v in present):
+        return np.array([np.nan if v is None else float(v) for v in values], dtype=np.float64)
+    return np.array(['' if v is None else v if isinstance(v, str) else json.dumps(v, ensure_ascii=False)
+                     for v in values], dtype=str)
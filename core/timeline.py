@@ -0,0 +1,184 @@
+import copy
+import os
+import pickle
+import random
+from concurrent.futures import ProcessPoolExecutor
+
+from utils.checkpoint import capture_simulation_state, restore_simulation_state, load_resume_point
+
+class TimelineBranch:
+    """从某个回合分叉出的独立时间线
+
+    分支保存分叉时刻的序列化状态，第一次运行时才创建自己的Simulation。在同一进程中运行时，
+    分叉回合及之前的历史直接读取父时间线（不复制）；分支之后的历史、检查点和导出写入自己的输出目录。
+    每个分支维护独立的随机数状态，同一进程内交替运行多个分支不会互相影响。
+    分支沿用父时间线的LLM接口；在其他进程中运行时按父接口的LLMConfig重新创建。
+    """
+
+    def __init__(self, name, config, state_bytes, fork_turn, intervention=None, seed=None, parent=None,
+                 llm_interface=None, llm_config=None):
+        self.name = name
+        self.config = config  # 分支自己的配置（输出路径已指向分支目录）
+        self.state_bytes = state_bytes  # 分叉时刻的完整状态（capture_simulation_state的pickle）
+        self.fork_turn = fork_turn
+        self.intervention = intervention  # 可选的干预函数 intervention(simulation)，在分叉后立即调用
+        self.seed = seed  # 不为None时分叉后重新设置随机种子
+        self.parent = parent  # 父Simulation，仅用于同进程共享历史
+        self.llm_interface = llm_interface  # 父时间线的LLM接口，仅在同进程中使用
+        self.llm_config = llm_config  # 父LLM接口的配置，用于在其他进程中重新创建接口
+        self.simulation = None
+        self._random_state = None
+
+    def build(self):
+        """创建并还原分支的Simulation"""
+        from core.simulation import Simulation
+        from llm.llm_interface import LLMInterface
+
+        if self.simulation is not None:
+            return self.simulation
+
+        llm_interface = self.llm_interface
+        if llm_interface is None and self.llm_config is not None:
+            llm_interface = LLMInterface(self.llm_config)
+
+        outer_random_state = random.getstate()
+        simulation = Simulation(self.config, llm_interface)
+        simulation.initialize()
+
+        state = pickle.loads(self.state_bytes)
+        simulation.world_state, simulation.effect_engine = restore_simulation_state(
+            state, simulation.civilizations, simulation.system_agents(), truncate_spill=False
+        )
+        simulation.current_turn = state['turn']
+        simulation.world_state.events.fork_spill(os.path.join(self.config.output_dir, 'events_archive.jsonl'))
+
+        if self.parent is not None:
+            simulation.observer.share_history(self.parent.observer.get_full_history(), self.fork_turn)
+        if self.seed is not None:
+            random.seed(self.seed)
+        if self.intervention is not None:
+            self.intervention(simulation)
+
+        self._random_state = random.getstate()
+        random.setstate(outer_random_state)
+        self.simulation = simulation
+        return simulation
+
+    def run(self, until_turn=None):
+        """运行分支到until_turn（默认配置的max_turns）"""
+        simulation = self.build()
+        until_turn = until_turn or simulation.max_turns
+
+        outer_random_state = random.getstate()
+        random.setstate(self._random_state)
+        try:
+            while simulation.current_turn < until_turn:
+                simulation.run_turn()
+        finally:
+            self._random_state = random.getstate()
+            random.setstate(outer_random_state)
+        return self.summary()
+
+    def close(self):
+        if self.simulation is not None:
+            self.simulation.observer.close()
+            self.simulation.checkpoint_writer.close()
+            if self.simulation.tile_exporter:
+                self.simulation.tile_exporter.close()
+
+    def summary(self):
+        """分支当前结果的摘要"""
+        simulation = self.simulation
+        return {
+            'name': self.name,
+            'fork_turn': self.fork_turn,
+            'turn': simulation.current_turn,
+            'output_dir': self.config.output_dir,
+            'civilization_states': copy.deepcopy(simulation.world_state.civilization_states)
+        }
+
+    def __getstate__(self):
+        """发送到其他进程时不携带父Simulation、已创建的Simulation和LLM接口（只保留其配置）"""
+        state = self.__dict__.copy()
+        state['parent'] = None
+        state['llm_interface'] = None
+        state['simulation'] = None
+        state['_random_state'] = None
+        return state
+
+
+def fork_simulation(simulation, turn=None, branches=2, interventions=None, seeds=None, names=None):
+    """在turn回合（默认当前回合）把模拟分叉为多个分支
+
+    当前回合直接从内存中的状态分叉；更早的回合需要有对应的恢复点
+    （save_interval和checkpoint_keep_resume决定哪些回合可以分叉）。
+    interventions/seeds/names为按分支给出的列表，返回TimelineBranch列表。
+    """
+    if turn is None or turn == simulation.current_turn:
+        turn = simulation.current_turn
+        state = capture_simulation_state(
+            turn,
+            simulation.world_state,
+            simulation.civilizations,
+            simulation.system_agents(),
+            simulation.effect_engine
+        )
+    else:
+        state = load_resume_point(simulation.checkpoint_dir, turn)
+        if state is None:
+            raise ValueError(f"回合 {turn} 没有恢复点，无法分叉")
+    state_bytes = pickle.dumps(state, protocol=pickle.HIGHEST_PROTOCOL)
+
+    timeline = []
+    for i in range(branches):
+        name = names[i] if names else f"turn_{turn}_branch_{i}"
+        timeline.append(TimelineBranch(
+            name=name,
+            config=_branch_config(simulation.config, name),
+            state_bytes=state_bytes,
+            fork_turn=turn,
+            intervention=interventions[i] if interventions else None,
+            seed=seeds[i] if seeds else None,
+            parent=simulation,
+            llm_interface=simulation.llm_interface,
+            llm_config=simulation.llm_interface.config if simulation.llm_interface is not None else None
+        ))
+    return timeline
+
+
+def run_branches(branches, until_turn=None, processes=None):
+    """运行所有分支并返回摘要列表；processes大于1时在进程池中并行运行
+
+    并行运行时干预函数必须可以被pickle（模块级函数），分叉前的历史不在子进程中共享，
+    可从父时间线的输出读取。
+    """
+    if not processes or processes <= 1:
+        summaries = []
+        for branch in branches:
+            summaries.append(branch.run(until_turn))
+            branch.close()
+        return summaries
+
+    with ProcessPoolExecutor(max_workers=processes) as executor:
+        return list(executor.map(_run_branch_in_process, branches, [until_turn] * len(branches)))
+
+
+def _run_branch_in_process(branch, until_turn):
+    summary = branch.run(until_turn)
+    branch.close()
+    return summary
+
+
+def _branch_config(config, name):
+    """复制配置并把所有输出路径指向分支目录"""
+    branch_config = copy.copy(config)
+    branch_config.output_dir = os.path.join(config.output_dir, 'branches', name)
+    if config.history_dir:
+        branch_config.history_dir = os.path.join(branch_config.output_dir, 'history')
+    if config.history_db_path:
+        branch_config.history_db_path = os.path.join(branch_config.output_dir, 'history.db')
+    if config.tile_export_dir:
+        branch_config.tile_export_dir = os.path.join(branch_config.output_dir, 'tiles')
+    if not os.path.exists(branch_config.output_dir):
+        os.makedirs(branch_config.output_dir)
+    return branch_config
@@ -0,0 +1,78 @@
+import contextvars
+import time
+from contextlib import contextmanager
+
+from llm.rate_limiter import PRIORITY_CRITICAL, PRIORITY_NORMAL, PRIORITY_BACKGROUND
+
+# 当前回合的时间预算，由Simulation.run_turn设置，LLMInterface据此跳过调用或设置超时
+_current_deadline = contextvars.ContextVar('turn_deadline', default=None)
+
+class TurnDeadline:
+    """单个回合的时间预算
+
+    各优先级的调用在截止时间前保留不同的余量：后台调用（叙事、评估、事件内容）在剩余时间少于
+    background_reserve比例时不再发起，普通调用（顾问建议）在少于normal_reserve比例时不再发起，
+    关键调用（领导决策、命令提取）始终发起，但超时不超过剩余时间（至少min_critical_timeout秒）。
+    本回合发生的所有降级都记录在degradations中。
+    """
+
+    def __init__(self, budget, normal_reserve=0.25, background_reserve=0.5, min_critical_timeout=5.0):
+        self.budget = budget  # 回合时间预算（秒）
+        self.started = time.monotonic()
+        self.deadline = self.started + budget
+        self.min_critical_timeout = min_critical_timeout
+        self.reserves = {
+            PRIORITY_CRITICAL: 0.0,
+            PRIORITY_NORMAL: normal_reserve * budget,
+            PRIORITY_BACKGROUND: background_reserve * budget
+        }
+        self.degradations = []
+
+    def remaining(self):
+        """距截止时间的秒数（可能为负）"""
+        return self.deadline - time.monotonic()
+
+    def time_left(self, priority):
+        """该优先级的调用还可使用的秒数"""
+        return self.remaining() - self.reserves.get(priority, self.reserves[PRIORITY_NORMAL])
+
+    def allows(self, priority):
+        """是否还可以发起该优先级的调用"""
+        return priority == PRIORITY_CRITICAL or self.time_left(priority) > 0
+
+    def timeout(self, priority):
+        """该优先级的调用应使用的请求超时（秒）"""
+        if priority == PRIORITY_CRITICAL:
+            return max(self.remaining(), self.min_critical_timeout)
+        return max(self.time_left(priority), 0.0)
+
+    def record(self, component, action, detail=None):
+        """记录一次降级"""
+        self.degradations.append({
+            'component': component,
+            'action': action,
+            'detail': detail,
+            'elapsed': time.monotonic() - self.started
+        })
+
+
+def current_deadline():
+    """当前回合的时间预算，没有设置时返回None"""
+    return _current_deadline.get()
+
+
+@contextmanager
+def turn_deadline(deadline):
+    """在with块内设置当前回合的时间预算（deadline为None表示不限时）"""
+    token = _current_deadline.set(deadline)
+    try:
+        yield deadline
+    finally:
+        _current_deadline.reset(token)
+
+
+def note_degradation(component, action, detail=None):
+    """在当前回合的时间预算中记录一次降级，没有设置预算时忽略"""
+    deadline = current_deadline()
+    if deadline is not None:
+        deadline.record(component, action, detail)
@@ -1,6 +1,31 @@
 import os
 import json
+import time
 from config.llm_config import LLMConfig
+from llm.rate_limiter import PRIORITY_NORMAL, RetryPolicy, get_provider_limiter
+from llm.deadline import current_deadline, note_degradation
+from llm.structured_output import extract_first_json, to_json_schema, validate_response
+from llm.response_cache import ResponseCache
+from utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+class LLMError(Exception):
+    """LLM调用失败（重试耗尽或不可重试的错误）"""
+    
+    def __init__(self, message, status_code=None, retryable=False):
+        super().__init__(message)
+        self.status_code = status_code
+        self.retryable = retryable
+
+class StructuredOutputError(LLMError):
+    """所有候选模型的响应都无法解析或无法通过response_format校验"""
+
+class DeadlineExceeded(StructuredOutputError):
+    """回合时间预算不足，调用被跳过或超时（见llm.deadline）
+    
+    继承StructuredOutputError，结构化调用处已有的失败处理（本回合跳过命令、事件、评估）同样适用。
+    """
 
 class LLMInterface:
     """大语言模型接口"""
@@ -8,6 +33,13 @@ class LLMInterface:
     def __init__(self, config=None):
         self.config = config or LLMConfig()
         self.setup_llm_client()
+        self.rate_limiter = get_provider_limiter(self.client_type, self.config)
+        self.retry_policy = RetryPolicy(
+            self.config.max_retries,
+            self.config.retry_base_delay,
+            self.config.retry_max_delay
+        )
+        self.response_cache = ResponseCache(self.config.response_cache_path) if self.config.response_cache_path else None
         
     def setup_llm_client(self):
         """设置LLM客户端"""
@@ -27,65 +59,228 @@ class LLMInterface:
         # 可以添加更多LLM提供商
         
     def generate_response(self, prompt, context=None, **kwargs):
-        """生成LLM响应"""
+        """生成LLM响应
+        
+        请求经过提供商级的限流与并发控制，429/5xx错误按带抖动的指数退避重试；
+        重试耗尽或遇到不可重试的错误时抛出LLMError，而不是把错误文本当作内容返回。
+        并发饱和时按kwargs中的priority排队（见llm.rate_limiter中的PRIORITY_*）。
+        设置了回合时间预算时（见llm.deadline），预算不足的调用被跳过、请求超时取剩余时间，
+        此时抛出DeadlineExceeded并记录降级。
+        """
         full_prompt = self._build_full_prompt(prompt, context)
+        model = kwargs.get("model", self.config.model)
+        temperature = kwargs.get("temperature", self.config.temperature)
+        max_tokens = kwargs.get("max_tokens", self.config.max_tokens)
+        estimated_tokens = self._estimate_tokens(full_prompt) + max_tokens
+        priority = kwargs.get("priority", PRIORITY_NORMAL)
+        json_schema = kwargs.get("json_schema")
         
-        try:
-            if self.client_type == "openai":
-                response = self.client.ChatCompletion.create(
-                    model=kwargs.get("model", self.config.model),
-                    messages=[{"role": "system", "content": self.config.system_prompt},
-                              {"role": "user", "content": full_prompt}],
-                    temperature=kwargs.get("temperature", self.config.temperature),
-                    max_tokens=kwargs.get("max_tokens", self.config.max_tokens)
-                )
-                return response.choices[0].message.content
+        # 相同请求直接返回缓存的响应
+        cache_key = None
+        if self.response_cache is not None:
+            cache_key = ResponseCache.make_key(
+                self.client_type, model, temperature, max_tokens,
+                self.config.system_prompt, full_prompt, json_schema
+            )
+            cached = self.response_cache.get(cache_key)
+            if cached is not None:
+                return cached
+        
+        deadline = current_deadline()
+        for attempt in range(self.retry_policy.max_retries + 1):
+            # 预算不足时不再发起；关键调用在截止后不再重试
+            if deadline is not None and (not deadline.allows(priority) or
+                                         (attempt > 0 and deadline.remaining() <= 0)):
+                note_degradation('llm', 'skipped', {'priority': priority, 'model': model, 'attempt': attempt})
+                raise DeadlineExceeded(f"Turn deadline reached, skipped priority {priority} request")
+            
+            # 排队等待配额和并发槽位也计入回合时间，等待后按剩余时间重新判断并计算超时
+            if not self.rate_limiter.acquire(estimated_tokens, priority,
+                                             timeout=deadline.timeout(priority) if deadline is not None else None):
+                note_degradation('llm', 'queue_timed_out', {'priority': priority, 'model': model, 'attempt': attempt})
+                raise DeadlineExceeded(f"Turn deadline reached while queued, skipped priority {priority} request")
+            if deadline is not None and not deadline.allows(priority):
+                self.rate_limiter.cancel(estimated_tokens)
+                note_degradation('llm', 'skipped', {'priority': priority, 'model': model, 'attempt': attempt})
+                raise DeadlineExceeded(f"Turn deadline reached while queued, skipped priority {priority} request")
+            timeout = deadline.timeout(priority) if deadline is not None else None
+            start = time.monotonic()
+            try:
+                text, used_tokens = self._call_provider(full_prompt, model, temperature, max_tokens, json_schema,
+                                                        timeout=timeout)
+            except Exception as e:
+                status_code, retryable, retry_after = self._classify_error(e)
+                self.rate_limiter.release(time.monotonic() - start, overloaded=retryable)
+                
+                if deadline is not None and deadline.time_left(priority) <= 0:
+                    note_degradation('llm', 'timed_out', {'priority': priority, 'model': model, 'error': str(e)})
+                    raise DeadlineExceeded(f"Turn deadline reached during priority {priority} request: {e}") from e
                 
-            elif self.client_type == "anthropic":
-                response = self.client.messages.create(
-                    model=kwargs.get("model", self.config.model),
-                    system=self.config.system_prompt,
-                    messages=[{"role": "user", "content": full_prompt}],
-                    temperature=kwargs.get("temperature", self.config.temperature),
-                    max_tokens=kwargs.get("max_tokens", self.config.max_tokens)
-                )
-                return response.content[0].text
+                if not retryable or attempt >= self.retry_policy.max_retries:
+                    raise LLMError(
+                        f"LLM request failed after {attempt + 1} attempt(s): {e}",
+                        status_code=status_code,
+                        retryable=retryable
+                    ) from e
                 
-        except Exception as e:
-            print(f"Error generating LLM response: {e}")
-            return f"Error: {str(e)}"
+                delay = self.retry_policy.delay(attempt, retry_after)
+                if deadline is not None and delay >= deadline.remaining():
+                    note_degradation('llm', 'retry_abandoned', {'priority': priority, 'model': model, 'error': str(e)})
+                    raise DeadlineExceeded(f"Turn deadline reached before retrying: {e}") from e
+                logger.warning(f"LLM request failed ({status_code or type(e).__name__}), retrying in {delay:.1f}s")
+                time.sleep(delay)
+                continue
+            
+            self.rate_limiter.release(
+                time.monotonic() - start,
+                estimated_tokens=estimated_tokens,
+                actual_tokens=used_tokens
+            )
+            if cache_key is not None and text is not None:
+                self.response_cache.put(cache_key, text)
+            return text
     
-    def generate_structured_response(self, prompt, context=None, response_format=None, **kwargs):
-        """生成结构化的LLM响应（JSON格式）"""
+    def _call_provider(self, full_prompt, model, temperature, max_tokens, json_schema=None, timeout=None):
+        """调用具体的LLM提供商，返回(文本, 实际使用的token数)
+        
+        提供json_schema时尽量使用提供商原生的结构化输出：OpenAI的JSON模式、Anthropic的强制工具调用。
+        timeout为请求超时秒数，None表示使用客户端默认值。
+        """
+        if self.client_type == "openai":
+            extra_args = {}
+            if timeout is not None:
+                extra_args["request_timeout"] = timeout
+            if json_schema is not None and self._supports_json_mode(model):
+                extra_args["response_format"] = {"type": "json_object"}
+            response = self.client.ChatCompletion.create(
+                model=model,
+                messages=[{"role": "system", "content": self.config.system_prompt},
+                          {"role": "user", "content": full_prompt}],
+                temperature=temperature,
+                max_tokens=max_tokens,
+                **extra_args
+            )
+            usage = response.get("usage", {}) if hasattr(response, "get") else {}
+            return response.choices[0].message.content, usage.get("total_tokens")
+            
+        elif self.client_type == "anthropic":
+            extra_args = {}
+            if timeout is not None:
+                extra_args["timeout"] = timeout
+            if json_schema is not None and self.config.native_structured_output:
+                extra_args["tools"] = [{
+                    "name": "structured_response",
+                    "description": "Return the response in the required structure",
+                    "input_schema": json_schema
+                }]
+                extra_args["tool_choice"] = {"type": "tool", "name": "structured_response"}
+            response = self.client.messages.create(
+                model=model,
+                system=self.config.system_prompt,
+                messages=[{"role": "user", "content": full_prompt}],
+                temperature=temperature,
+                max_tokens=max_tokens,
+                **extra_args
+            )
+            usage = getattr(response, "usage", None)
+            used_tokens = usage.input_tokens + usage.output_tokens if usage else None
+            for block in response.content:
+                if getattr(block, "type", None) == "tool_use":
+                    return json.dumps(block.input, ensure_ascii=False), used_tokens
+            return response.content[0].text, used_tokens
+        
+        raise LLMError(f"Unsupported LLM client type: {self.client_type}")
+    
+    def _classify_error(self, error):
+        """判断错误是否可重试，返回(状态码, 是否可重试, 服务端建议的等待秒数)"""
+        if isinstance(error, LLMError):
+            return error.status_code, error.retryable, None
+        
+        response = getattr(error, "response", None)
+        status_code = (getattr(error, "status_code", None)
+                       or getattr(error, "http_status", None)
+                       or getattr(response, "status_code", None))
+        
+        retry_after = None
+        headers = getattr(response, "headers", None) or getattr(error, "headers", None)
+        if headers:
+            try:
+                retry_after = float(headers.get("retry-after"))
+            except (TypeError, ValueError):
+                retry_after = None
+        
+        if status_code is not None:
+            retryable = status_code == 429 or 500 <= status_code < 600
+        else:
+            # 没有状态码的网络/超时类错误同样值得重试
+            retryable = type(error).__name__ in (
+                "RateLimitError", "APIConnectionError", "APITimeoutError",
+                "Timeout", "TimeoutError", "ServiceUnavailableError", "ConnectionError"
+            )
+        return status_code, retryable, retry_after
+    
+    def _supports_json_mode(self, model):
+        """判断OpenAI模型是否支持JSON模式"""
+        if not self.config.native_structured_output or not model:
+            return False
+        return any(model.startswith(prefix) for prefix in self.config.json_mode_models)
+    
+    def _estimate_tokens(self, text):
+        """粗略估计文本的token数（中英文混合按每3个字符1个token计）"""
+        return len(text) // 3 + 1
+    
+    def get_task_models(self, task=None):
+        """获取任务对应的模型级联列表（从便宜到昂贵）"""
+        if task is None:
+            return [self.config.model]
+        return self.config.task_models.get(task) or [self.config.model]
+    
+    def generate_structured_response(self, prompt, context=None, response_format=None,
+                                     task=None, validator=None, min_confidence=None, **kwargs):
+        """生成结构化的LLM响应（JSON格式）
+        
+        响应先在本地提取第一个合法JSON对象、修复（尾随逗号、截断、类型错误）并按response_format校验，
+        只有本地修复失败时才付出新的请求。按task路由到模型级联：先用便宜快速的模型，只有在解析失败、
+        校验失败、validator返回False或返回的confidence低于min_confidence时才升级到下一个模型。
+        所有模型都失败时抛出StructuredOutputError。
+        """
         if response_format is None:
             response_format = {}
             
         full_prompt = self._build_full_prompt(prompt, context)
         full_prompt += f"\n\nRespond with a JSON object in the following format: {json.dumps(response_format, indent=2)}"
         
-        try:
-            response_text = self.generate_response(full_prompt, None, **kwargs)
-            # 提取JSON部分
+        models = [kwargs.pop("model")] if "model" in kwargs else self.get_task_models(task)
+        kwargs["json_schema"] = to_json_schema(response_format)
+        last_error = None
+        
+        for index, model in enumerate(models):
+            is_last_model = index == len(models) - 1
             try:
-                # 尝试直接解析
-                return json.loads(response_text)
-            except:
-                # 尝试从文本中提取JSON部分
-                import re
-                json_match = re.search(r'```json\n(.*?)\n```', response_text, re.DOTALL)
-                if json_match:
-                    return json.loads(json_match.group(1))
+                response_text = self.generate_response(full_prompt, None, model=model, **kwargs)
+                data, truncated = extract_first_json(response_text)
+                result = validate_response(data, response_format, truncated)
+                
+                if validator is not None and not validator(result):
+                    raise ValueError(f"Response from {model} failed validation")
                 
-                # 最后尝试找到任何看起来像JSON的部分
-                json_match = re.search(r'(\{.*\})', response_text, re.DOTALL)
-                if json_match:
-                    return json.loads(json_match.group(1))
-                    
-                raise ValueError("Could not parse JSON from response")
+                # 低置信度时升级模型；最后一个模型的结果无论如何都返回
+                confidence = result.get("confidence") if isinstance(result, dict) else None
+                if (min_confidence is not None and not is_last_model
+                        and isinstance(confidence, (int, float)) and confidence < min_confidence):
+                    raise ValueError(f"Low confidence {confidence} from {model}")
                 
-        except Exception as e:
-            print(f"Error generating structured LLM response: {e}")
-            return {"error": str(e)}
+                return result
+                
+            except DeadlineExceeded:
+                # 时间预算不足时不升级到更大的模型
+                raise
+            except Exception as e:
+                last_error = e
+                if not is_last_model:
+                    logger.info(f"Structured response from {model} rejected ({e}), escalating to {models[index + 1]}")
+        
+        raise StructuredOutputError(f"Could not obtain a valid structured response: {last_error}") from last_error
     
     def _build_full_prompt(self, prompt, context):
         """构建完整提示，包括上下文"""
@@ -38,6 +38,18 @@ LEADER_DECISION_TEMPLATE = """
 请确保你的决策符合你的领导风格和文明当前状况。
 """
 
+# 结构化领导决策说明（附加在领导决策模板之后）
+LEADER_STRUCTURED_DECISION_INSTRUCTIONS = """
+请将决策直接整理为结构化命令，供各部门直接执行:
+- summary: 本回合决策摘要
+- military_orders: 军事命令，type取值 train/attack/defend/research
+- economic_orders: 经济命令，type取值 build/trade/tax/allocate
+- cultural_orders: 文化命令，type取值 research/art/religion/education
+- diplomatic_orders: 外交命令，包含目标文明、谈判主题和立场
+
+没有相应命令的部门返回空列表。
+"""
+
 # 外交建议模板
 DIPLOMATIC_ADVICE_TEMPLATE = """
 作为{civilization_state['name']}的外交官{diplomat_name}，你的外交风格是{diplomatic_style}。
@@ -125,6 +137,25 @@ EVENT_GENERATION_TEMPLATE = """
 请以JSON格式回复。
 """
 
+# 批量事件生成模板
+EVENT_BATCH_GENERATION_TEMPLATE = """
+你需要为第{current_turn}回合一次性生成以下{event_count}个事件。
+
+相关文明状态:
+{civilization_states}
+
+待生成事件列表（index、文明、规模、类型）:
+{event_requests}
+
+请为每个事件生成合理且有影响力的内容，包括:
+1. 事件标题
+2. 详细描述
+3. 对政治、经济、军事、文化和人口的影响
+4. 事件持续的回合数
+
+每个事件必须带上对应的index，请以JSON格式回复。
+"""
+
 # 回合叙事模板
 TURN_NARRATIVE_TEMPLATE = """
 作为历史叙事者，你需要以{narrative_style}风格描述第{turn}回合发生的事件。
@@ -0,0 +1,225 @@
+import heapq
+import itertools
+import random
+import threading
+import time
+
+# LLM调用优先级：数值越小越优先
+PRIORITY_CRITICAL = 0  # 阻塞下一回合的调用（领导决策、命令提取）
+PRIORITY_NORMAL = 1  # 默认优先级（顾问建议等）
+PRIORITY_BACKGROUND = 2  # 不阻塞回合推进的调用（叙事、历史评估、报告）
+
+class TokenBucket:
+    """令牌桶限流器，按每分钟配额匀速补充令牌"""
+
+    def __init__(self, capacity_per_minute):
+        self.capacity = float(capacity_per_minute)
+        self.refill_rate = self.capacity / 60.0  # 每秒补充的令牌数
+        self.tokens = self.capacity
+        self.last_refill = time.monotonic()
+        self.lock = threading.Lock()
+
+    def _refill(self):
+        """按经过的时间补充令牌"""
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.last_refill) * self.refill_rate)
+        self.last_refill = now
+
+    def reserve(self, amount):
+        """预留令牌，返回需要等待的秒数（0表示可立即执行）"""
+        with self.lock:
+            self._refill()
+            # 单次请求不能超过桶容量，否则永远无法满足
+            self.tokens -= min(float(amount), self.capacity)
+            if self.tokens >= 0:
+                return 0.0
+            # 允许令牌为负（排队预留），等待时间即为补足欠额所需时间
+            return -self.tokens / self.refill_rate
+
+    def cancel(self, amount):
+        """退还未使用的预留（预留后放弃请求时调用）"""
+        self.adjust(-min(float(amount), self.capacity))
+
+    def adjust(self, delta):
+        """根据实际用量修正预留量，正数表示多扣，负数表示退还"""
+        with self.lock:
+            self._refill()
+            self.tokens = min(self.capacity, self.tokens - delta)
+
+
+class AIMDConcurrencyLimiter:
+    """基于AIMD（加性增、乘性减）的自适应并发控制器"""
+
+    def __init__(self, initial_limit, min_limit, max_limit, target_latency,
+                 decrease_factor=0.5, error_rate_threshold=0.1, aging_interval=10.0):
+        self.limit = float(initial_limit)
+        self.min_limit = float(min_limit)
+        self.max_limit = float(max_limit)
+        self.target_latency = target_latency  # 超过此延迟视为过载信号
+        self.decrease_factor = decrease_factor
+        self.error_rate_threshold = error_rate_threshold
+        self.error_rate = 0.0  # 错误率的指数滑动平均
+        self.in_flight = 0
+        self.last_decrease = 0.0
+        self.condition = threading.Condition()
+        
+        # 等待队列：按 入队时间 + 优先级 * aging_interval 排序。
+        # 等价于每等待aging_interval秒提升一级优先级，低优先级调用不会被无限饿死
+        self.aging_interval = aging_interval
+        self._waiters = []
+        self._sequence = itertools.count()
+
+    def acquire(self, priority=PRIORITY_NORMAL, timeout=None):
+        """获取一个并发槽位；并发饱和时按优先级排队等待
+        
+        timeout为最长等待秒数（None表示不限），超时时退出队列并返回False，获取成功返回True。
+        """
+        with self.condition:
+            if not self._waiters and self.in_flight < max(1, int(self.limit)):
+                self.in_flight += 1
+                return True
+            
+            now = time.monotonic()
+            give_up = None if timeout is None else now + timeout
+            entry = (now + priority * self.aging_interval, next(self._sequence))
+            heapq.heappush(self._waiters, entry)
+            while self._waiters[0] is not entry or self.in_flight >= max(1, int(self.limit)):
+                if give_up is None:
+                    self.condition.wait()
+                    continue
+                left = give_up - time.monotonic()
+                if left <= 0:
+                    self._waiters.remove(entry)
+                    heapq.heapify(self._waiters)
+                    # 队首可能变化，唤醒其他等待者重新检查
+                    self.condition.notify_all()
+                    return False
+                self.condition.wait(left)
+            heapq.heappop(self._waiters)
+            self.in_flight += 1
+            # 并发上限可能一次放出多个槽位，唤醒下一个队首继续检查
+            self.condition.notify_all()
+            return True
+    
+    def cancel(self):
+        """归还未使用的槽位（获取后放弃请求），不参与并发上限调整"""
+        with self.condition:
+            self.in_flight -= 1
+            self.condition.notify_all()
+
+    def release(self, latency, overloaded=False):
+        """释放槽位，并根据延迟与错误调整并发上限"""
+        with self.condition:
+            self.in_flight -= 1
+            self.error_rate = self.error_rate * 0.9 + (0.1 if overloaded else 0.0)
+
+            now = time.monotonic()
+            congested = overloaded or latency > self.target_latency or self.error_rate > self.error_rate_threshold
+            if congested:
+                # 只响应上次降速之后发出的请求，避免一次突发把并发降到底
+                if now - latency > self.last_decrease:
+                    self.limit = max(self.min_limit, self.limit * self.decrease_factor)
+                    self.last_decrease = now
+            else:
+                # 加性增：每个完整窗口大约增加1
+                self.limit = min(self.max_limit, self.limit + 1.0 / self.limit)
+
+            self.condition.notify_all()
+
+
+class RetryPolicy:
+    """带抖动的指数退避重试策略"""
+
+    def __init__(self, max_retries, base_delay, max_delay):
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        # 使用独立随机源，避免重试抖动干扰模拟的全局随机序列
+        self._random = random.Random()
+
+    def delay(self, attempt, retry_after=None):
+        """计算第attempt次重试前的等待时间（full jitter）"""
+        backoff = min(self.max_delay, self.base_delay * (2 ** attempt))
+        delay = self._random.uniform(0, backoff)
+        if retry_after:
+            # 服务端明确给出等待时间时以其为下限
+            delay = max(delay, min(float(retry_after), self.max_delay))
+        return delay
+
+
+class ProviderRateLimiter:
+    """单个LLM提供商的请求调度器：请求数/令牌数限流 + 自适应并发"""
+
+    def __init__(self, config):
+        self.request_bucket = TokenBucket(config.requests_per_minute)
+        self.token_bucket = TokenBucket(config.tokens_per_minute)
+        self.concurrency = AIMDConcurrencyLimiter(
+            initial_limit=config.initial_concurrency,
+            min_limit=config.min_concurrency,
+            max_limit=config.max_concurrency,
+            target_latency=config.target_latency,
+            aging_interval=config.priority_aging_interval
+        )
+
+    def acquire(self, estimated_tokens, priority=PRIORITY_NORMAL, timeout=None):
+        """等待配额和并发槽位
+        
+        timeout为最长等待秒数（None表示不限）：配额等待超过timeout时立即退还预留，排队超时时退出队列，
+        两种情况都返回False；获取成功返回True。
+        """
+        started = time.monotonic()
+        wait = max(self.request_bucket.reserve(1), self.token_bucket.reserve(estimated_tokens))
+        if timeout is not None and wait > timeout:
+            self._cancel_reservation(estimated_tokens)
+            return False
+        if wait > 0:
+            time.sleep(wait)
+        
+        remaining = None if timeout is None else timeout - (time.monotonic() - started)
+        if not self.concurrency.acquire(priority, timeout=remaining):
+            self._cancel_reservation(estimated_tokens)
+            return False
+        return True
+    
+    def cancel(self, estimated_tokens):
+        """放弃已获取但未发出的请求：归还并发槽位并退还配额"""
+        self.concurrency.cancel()
+        self._cancel_reservation(estimated_tokens)
+    
+    def _cancel_reservation(self, estimated_tokens):
+        self.request_bucket.cancel(1)
+        self.token_bucket.cancel(estimated_tokens)
+
+    def release(self, latency, overloaded=False, estimated_tokens=None, actual_tokens=None):
+        """释放并发槽位，并用实际token用量修正令牌桶"""
+        if estimated_tokens is not None and actual_tokens is not None:
+            self.token_bucket.adjust(actual_tokens - estimated_tokens)
+        self.concurrency.release(latency, overloaded)
+
+
+# 共享的限流器：同一提供商账号、同样配额的LLMInterface实例共用同一份配额
+_provider_limiters = {}
+_provider_limiters_lock = threading.Lock()
+
+def _limiter_key(provider, config):
+    """限流器的共享键：提供商、账号（API密钥和接口地址）以及配额和并发配置"""
+    return (
+        provider,
+        config.api_key,
+        getattr(config, 'base_url', None),
+        config.requests_per_minute,
+        config.tokens_per_minute,
+        config.initial_concurrency,
+        config.min_concurrency,
+        config.max_concurrency,
+        config.target_latency,
+        config.priority_aging_interval
+    )
+
+def get_provider_limiter(provider, config):
+    """获取（必要时创建）共享限流器，配额或账号不同的配置各自使用独立的限流器"""
+    key = _limiter_key(provider, config)
+    with _provider_limiters_lock:
+        if key not in _provider_limiters:
+            _provider_limiters[key] = ProviderRateLimiter(config)
+        return _provider_limiters[key]
@@ -0,0 +1,332 @@
+import json
+import re
+
+class SchemaValidationError(ValueError):
+    """结构化响应不符合response_format"""
+
+    def __init__(self, errors):
+        super().__init__("; ".join(errors))
+        self.errors = errors
+
+
+# ---------------------------------------------------------------------------
+# response_format -> JSON Schema
+#
+# 项目中的response_format是"示例形状"的描述：字典表示对象，单元素列表表示数组，
+# 字符串叶子是类型提示（"number"、"string or null"）或自然语言说明。
+# ---------------------------------------------------------------------------
+
+def parse_type_hint(hint):
+    """解析字符串叶子的类型提示，返回(类型, 是否可为null)；无法识别的说明文字视为任意类型"""
+    text = hint.lower()
+    nullable = re.search(r'\b(null|none|optional)\b', text) is not None
+
+    if re.search(r'\b(integer|int)\b', text):
+        return 'integer', nullable
+    if re.search(r'\b(number|float|score|amount)\b', text):
+        return 'number', nullable
+    if re.search(r'\b(boolean|bool)\b', text):
+        return 'boolean', nullable
+    if re.fullmatch(r'\s*string(\s+or\s+null)?\s*', text):
+        return 'string', nullable
+    return None, nullable
+
+def to_json_schema(response_format):
+    """将示例形状的response_format转换为JSON Schema，用于提供商原生的JSON/工具调用模式"""
+    if isinstance(response_format, dict):
+        return {
+            'type': 'object',
+            'properties': {key: to_json_schema(value) for key, value in response_format.items()},
+            'required': list(response_format.keys())
+        }
+
+    if isinstance(response_format, list):
+        item_schema = to_json_schema(response_format[0]) if response_format else {}
+        return {'type': 'array', 'items': item_schema}
+
+    if isinstance(response_format, str):
+        type_name, nullable = parse_type_hint(response_format)
+        schema = {'description': response_format}
+        if type_name:
+            schema['type'] = [type_name, 'null'] if nullable else type_name
+        return schema
+
+    return {}
+
+
+# ---------------------------------------------------------------------------
+# 增量JSON解析
+# ---------------------------------------------------------------------------
+
+class IncrementalJSONParser:
+    """增量扫描文本流，提取第一个完整且合法的JSON对象
+
+    只跟踪括号深度和字符串状态，不依赖代码块标记，因此能处理前后夹杂说明文字、
+    多个JSON对象以及被截断的响应。
+    """
+
+    def __init__(self, start_chars='{'):
+        self.start_chars = start_chars
+        self.result = None
+        self.found = False
+        self._buffer = []
+        self._stack = []
+        self._in_string = False
+        self._escape = False
+
+    def feed(self, chunk):
+        """输入一段文本，找到第一个合法对象后返回True"""
+        for char in chunk:
+            if self.found:
+                return True
+
+            if not self._stack:
+                # 顶层：只在遇到对象起始符时开始收集
+                if char in self.start_chars:
+                    self._buffer = [char]
+                    self._stack = ['}' if char == '{' else ']']
+                continue
+
+            self._buffer.append(char)
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif char == '\\':
+                    self._escape = True
+                elif char == '"':
+                    self._in_string = False
+            elif char == '"':
+                self._in_string = True
+            elif char in '{[':
+                self._stack.append('}' if char == '{' else ']')
+            elif char in '}]':
+                self._stack.pop()
+                if not self._stack:
+                    self._try_complete(''.join(self._buffer))
+
+        return self.found
+
+    def _try_complete(self, candidate):
+        """尝试解析一个括号已闭合的候选片段，失败则继续扫描后续文本"""
+        for text in (candidate, repair_json(candidate)):
+            try:
+                self.result = json.loads(text)
+                self.found = True
+                return
+            except ValueError:
+                continue
+        self._buffer = []
+
+    def partial(self):
+        """返回尚未闭合的片段（响应被截断时用于修复）"""
+        return ''.join(self._buffer) if self._stack else None
+
+
+def extract_first_json(text):
+    """从响应文本中提取第一个合法的JSON对象，必要时修复截断的结尾
+
+    返回(数据, 是否由截断修复得到)。
+    """
+    parser = IncrementalJSONParser()
+    if parser.feed(text):
+        return parser.result, False
+
+    partial = parser.partial()
+    if partial:
+        try:
+            return json.loads(repair_json(partial)), True
+        except ValueError:
+            pass
+
+    raise ValueError("Could not parse JSON from response")
+
+
+# ---------------------------------------------------------------------------
+# 本地修复
+# ---------------------------------------------------------------------------
+
+_PYTHON_LITERALS = {'True': 'true', 'False': 'false', 'None': 'null'}
+
+def repair_json(text):
+    """在本地修复常见的JSON错误：尾随逗号、Python字面量、注释以及截断"""
+    output = []
+    stack = []
+    in_string = False
+    escape = False
+    i = 0
+
+    while i < len(text):
+        char = text[i]
+
+        if in_string:
+            output.append(char)
+            if escape:
+                escape = False
+            elif char == '\\':
+                escape = True
+            elif char == '"':
+                in_string = False
+            elif char == '\n':
+                # 字符串中的裸换行
+                output[-1] = '\\n'
+            i += 1
+            continue
+
+        if char == '"':
+            in_string = True
+            output.append(char)
+        elif char in '{[':
+            stack.append('}' if char == '{' else ']')
+            output.append(char)
+        elif char in '}]':
+            _strip_trailing_comma(output)
+            if stack:
+                stack.pop()
+            output.append(char)
+        elif text.startswith('//', i):
+            # 行注释
+            while i < len(text) and text[i] != '\n':
+                i += 1
+            continue
+        elif re.match(r'[A-Za-z_]', char):
+            word = re.match(r'[A-Za-z_]+', text[i:]).group(0)
+            output.append(_PYTHON_LITERALS.get(word, word))
+            i += len(word)
+            continue
+        else:
+            output.append(char)
+        i += 1
+
+    if not in_string and not stack:
+        return ''.join(output)
+
+    # 截断修复：闭合字符串，去掉悬空的逗号/键，再按栈逆序闭合括号
+    if in_string:
+        if escape:
+            output.pop()
+        output.append('"')
+    repaired = ''.join(output).rstrip()
+
+    if repaired.endswith(':'):
+        repaired += ' null'
+    repaired = repaired.rstrip().rstrip(',')
+    if stack and stack[-1] == '}':
+        # 对象中只剩下一个没有值的键
+        repaired = re.sub(r'([{,])\s*"(?:[^"\\]|\\.)*"\s*$', r'\1', repaired).rstrip().rstrip(',')
+
+    return repaired + ''.join(reversed(stack))
+
+def _strip_trailing_comma(output):
+    """去掉闭合括号前的尾随逗号"""
+    index = len(output) - 1
+    while index >= 0 and output[index].isspace():
+        index -= 1
+    if index >= 0 and output[index] == ',':
+        del output[index]
+
+
+# ---------------------------------------------------------------------------
+# 校验与类型修正
+# ---------------------------------------------------------------------------
+
+_NUMBER_PATTERN = re.compile(r'^\s*[-+]?\d+(\.\d+)?\s*$')
+
+def validate_response(data, response_format, truncated=False):
+    """按response_format校验并修正类型，返回修正后的数据；无法修正时抛出SchemaValidationError
+
+    truncated为True时，数组中因截断而不完整的最后一项会被丢弃而不是报错。
+    """
+    errors = []
+    value = _coerce(data, response_format, '$', errors, truncated)
+    if errors:
+        raise SchemaValidationError(errors)
+    return value
+
+def _coerce(value, schema, path, errors, truncated=False):
+    """递归修正单个值"""
+    if isinstance(schema, dict):
+        if not isinstance(value, dict):
+            errors.append(f"{path}: expected object, got {type(value).__name__}")
+            return value
+
+        result = dict(value)
+        for key, sub_schema in schema.items():
+            if key in value:
+                result[key] = _coerce(value[key], sub_schema, f"{path}.{key}", errors, truncated)
+            elif isinstance(sub_schema, list):
+                result[key] = []
+            elif isinstance(sub_schema, str) and parse_type_hint(sub_schema)[1]:
+                result[key] = None
+            else:
+                errors.append(f"{path}.{key}: missing")
+        return result
+
+    if isinstance(schema, list):
+        if value is None:
+            return []
+        if isinstance(value, dict):
+            # 单个对象误作为数组返回
+            value = [value]
+        if not isinstance(value, list):
+            errors.append(f"{path}: expected array, got {type(value).__name__}")
+            return value
+        if not schema:
+            return value
+
+        items = []
+        for index, item in enumerate(value):
+            item_errors = []
+            coerced = _coerce(item, schema[0], f"{path}[{index}]", item_errors, truncated)
+            if item_errors and truncated and index == len(value) - 1:
+                continue
+            errors.extend(item_errors)
+            items.append(coerced)
+        return items
+
+    if isinstance(schema, str):
+        return _coerce_leaf(value, schema, path, errors)
+
+    return value
+
+def _coerce_leaf(value, hint, path, errors):
+    """按类型提示修正叶子值"""
+    type_name, nullable = parse_type_hint(hint)
+    if type_name is None:
+        return value
+
+    if value is None:
+        if not nullable:
+            errors.append(f"{path}: null is not allowed")
+        return value
+
+    if type_name in ('number', 'integer'):
+        if isinstance(value, bool):
+            errors.append(f"{path}: expected {type_name}, got boolean")
+            return value
+        if isinstance(value, str):
+            if not _NUMBER_PATTERN.match(value):
+                errors.append(f"{path}: expected {type_name}, got {value!r}")
+                return value
+            value = float(value)
+        if not isinstance(value, (int, float)):
+            errors.append(f"{path}: expected {type_name}, got {type(value).__name__}")
+            return value
+        if type_name == 'integer' or float(value).is_integer():
+            return int(value)
+        return value
+
+    if type_name == 'boolean':
+        if isinstance(value, str) and value.lower() in ('true', 'false'):
+            return value.lower() == 'true'
+        if not isinstance(value, bool):
+            errors.append(f"{path}: expected boolean, got {type(value).__name__}")
+        return value
+
+    if type_name == 'string':
+        if isinstance(value, (int, float)):
+            return str(value)
+        if isinstance(value, (dict, list)):
+            return json.dumps(value, ensure_ascii=False)
+        return value
+
+    return value
@@ -4,11 +4,13 @@ from agents.civilization_agents.military_agent import MilitaryAgent
 from agents.civilization_agents.economic_agent import EconomicAgent
 from agents.civilization_agents.cultural_agent import CulturalAgent
 from agents.civilization_agents.population_agent import PopulationAgent
+from utils.advice_gate import AdviceGate
 
 class Civilization:
     """文明模型，包含所有文明级Agent"""
     
-    def __init__(self, id, name, initial_state):
+    def __init__(self, id, name, initial_state, structured_decisions=False, llm_interface=None,
+                 surrogate=None, surrogate_threshold=0.8, advice_reuse=None, advice_workers=1):
         self.id = id
         self.name = name
         self.state = initial_state
@@ -17,37 +19,47 @@ class Civilization:
         self.leader = LeaderAgent(
             name=initial_state.get("leader_name", f"{name} Leader"),
             civilization_id=id,
-            leadership_style=initial_state.get("leadership_style", "balanced")
+            leadership_style=initial_state.get("leadership_style", "balanced"),
+            structured_decision=structured_decisions,
+            llm_interface=llm_interface,
+            surrogate=surrogate,
+            surrogate_threshold=surrogate_threshold,
+            advice_workers=advice_workers
         )
         
         self.diplomatic_agent = DiplomaticAgent(
             name=initial_state.get("diplomat_name", f"{name} Diplomat"),
             civilization_id=id,
-            diplomatic_style=initial_state.get("diplomatic_style", "balanced")
+            diplomatic_style=initial_state.get("diplomatic_style", "balanced"),
+            llm_interface=llm_interface
         )
         
         self.military_agent = MilitaryAgent(
             name=initial_state.get("military_leader_name", f"{name} General"),
             civilization_id=id,
-            military_style=initial_state.get("military_style", "balanced")
+            military_style=initial_state.get("military_style", "balanced"),
+            llm_interface=llm_interface
         )
         
         self.economic_agent = EconomicAgent(
             name=initial_state.get("economic_leader_name", f"{name} Treasurer"),
             civilization_id=id,
-            economic_style=initial_state.get("economic_style", "balanced")
+            economic_style=initial_state.get("economic_style", "balanced"),
+            llm_interface=llm_interface
         )
         
         self.cultural_agent = CulturalAgent(
             name=initial_state.get("cultural_leader_name", f"{name} Cultural Minister"),
             civilization_id=id,
-            cultural_style=initial_state.get("cultural_style", "balanced")
+            cultural_style=initial_state.get("cultural_style", "balanced"),
+            llm_interface=llm_interface
         )
         
         self.population_agent = PopulationAgent(
             name=f"{name} Population",
             civilization_id=id,
-            initial_population=initial_state.get("population", 1000000)
+            initial_population=initial_state.get("population", 1000000),
+            llm_interface=llm_interface
         )
         
         # 注册顾问到领导Agent
@@ -57,10 +69,18 @@ class Civilization:
         self.leader.register_advisor("cultural", self.cultural_agent)
         self.leader.register_advisor("population", self.population_agent)
         
-    def make_decisions(self, world_state):
-        """文明内部决策过程"""
+        # 顾问建议复用：advice_reuse为AdviceGate的参数（refresh_interval, tolerances），None表示不复用
+        if advice_reuse is not None:
+            for advisor in self.leader.advisors.values():
+                advisor.advice_gate = AdviceGate(**advice_reuse)
+        
+    def make_decisions(self, world_state, heuristic=False):
+        """文明内部决策过程，heuristic为True时使用不调用LLM的确定性策略（快进模式）"""
         # 领导Agent做出决策
-        leader_decision = self.leader.process(world_state)
+        if heuristic:
+            leader_decision = self.leader.heuristic_decision(world_state)
+        else:
+            leader_decision = self.leader.process(world_state)
         
         # 基于领导决策，各专业Agent执行具体行动
         diplomatic_actions = self.diplomatic_agent.process(world_state, leader_decision=leader_decision)
@@ -0,0 +1,27 @@
+"""
+领导决策结构
+启发式决策和代理模型决策都通过build_decision生成，与LEADER_DECISION_FORMAT结构一致
+"""
+
+# 决策中各部门命令列表的字段
+ORDER_KEYS = ('military_orders', 'economic_orders', 'cultural_orders', 'diplomatic_orders')
+
+# 不经LLM产生的决策来源，代理模型训练时不作为样本
+SOURCE_HEURISTIC = 'heuristic'
+SOURCE_SURROGATE = 'surrogate'
+NON_LLM_SOURCES = (SOURCE_HEURISTIC, SOURCE_SURROGATE)
+
+def summarize_orders(decision):
+    """由各部门命令生成决策摘要，例如 'defend:b; trade:c'，没有命令时为 'hold'"""
+    return '; '.join(
+        f"{order['type']}:{order['target']}" if order.get('target') is not None else order['type']
+        for key in ORDER_KEYS
+        for order in decision.get(key, [])
+    ) or 'hold'
+
+def build_decision(orders, source):
+    """由 命令字段 -> 命令列表 生成结构化决策，并标记来源source"""
+    decision = {key: list(orders.get(key, [])) for key in ORDER_KEYS}
+    decision['summary'] = summarize_orders(decision)
+    decision['source'] = source
+    return decision
@@ -0,0 +1,165 @@
+import bisect
+import json
+import os
+
+class EventLog:
+    """按回合分桶的事件记录
+
+    内存中只保留最近retention_turns个回合的事件桶，更早的桶整体追加写入spill_path（JSON Lines），
+    "最近K回合"的查询只访问K个桶，与累计事件总数无关。
+    每个桶有一个版本号，追加事件或通过update_event修改事件时递增，快照据此判断桶是否需要重新复制。
+    """
+
+    def __init__(self, retention_turns=None, spill_path=None):
+        self.retention_turns = retention_turns  # None表示全部保留在内存中
+        self.spill_path = spill_path  # 为None时过期的事件桶直接丢弃
+        self._buckets = {}  # 回合 -> 事件列表
+        self._turns = []  # 按回合递增排序的已保留回合
+        self._versions = {}  # 回合 -> 桶版本号
+        self._retained_count = 0
+        self.spilled_count = 0  # 已移出内存的事件数
+
+    def __getstate__(self):
+        """序列化时记录磁盘文件的当前长度，供恢复或分叉时使用"""
+        state = self.__dict__.copy()
+        state['checkpoint_spill_size'] = (os.path.getsize(self.spill_path)
+                                          if self.spill_path and os.path.exists(self.spill_path) else 0)
+        return state
+
+    def restore_spill(self):
+        """从检查点恢复时截掉检查点之后写入磁盘的事件桶，避免重复"""
+        size = getattr(self, 'checkpoint_spill_size', None)
+        if size is not None and self.spill_path and os.path.exists(self.spill_path):
+            if os.path.getsize(self.spill_path) > size:
+                with open(self.spill_path, 'r+b') as f:
+                    f.truncate(size)
+
+    def fork_spill(self, spill_path):
+        """分叉到新的磁盘文件：复制检查点时刻已写入的部分，之后只写新文件"""
+        size = getattr(self, 'checkpoint_spill_size', 0)
+        directory = os.path.dirname(spill_path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory)
+
+        with open(spill_path, 'wb') as target:
+            if self.spill_path and os.path.exists(self.spill_path) and size:
+                with open(self.spill_path, 'rb') as source:
+                    target.write(source.read(size))
+        self.spill_path = spill_path
+
+    def append(self, event):
+        """添加事件到其回合对应的桶"""
+        turn = event.get('turn', 0)
+        bucket = self._buckets.get(turn)
+        if bucket is None:
+            bucket = []
+            self._buckets[turn] = bucket
+            if not self._turns or turn > self._turns[-1]:
+                self._turns.append(turn)
+            else:
+                bisect.insort(self._turns, turn)
+            self._evict(self._turns[-1])
+
+            if turn not in self._buckets:
+                # 迟到的旧回合事件已在保留窗口之外，直接写入磁盘
+                self.spilled_count += 1
+                if self.spill_path:
+                    self._spill([{'turn': turn, 'events': [event]}])
+                return
+
+        bucket.append(event)
+        self._retained_count += 1
+        self._versions[turn] = self._versions.get(turn, 0) + 1
+
+    def update_event(self, event, **fields):
+        """修改已记录的事件并递增其所在桶的版本号（已移出内存的事件只修改对象本身）"""
+        if all(event.get(key) == value for key, value in fields.items()):
+            return
+        event.update(fields)
+        turn = event.get('turn', 0)
+        if turn in self._buckets:
+            self._versions[turn] = self._versions.get(turn, 0) + 1
+
+    def version(self, turn):
+        """某回合事件桶的版本号，没有该桶时为0"""
+        return self._versions.get(turn, 0)
+
+    def get_turn(self, turn):
+        """获取某回合的事件（只读）"""
+        return self._buckets.get(turn, [])
+
+    def recent(self, turns, current_turn):
+        """获取与current_turn相差不超过turns个回合的事件"""
+        events = []
+        for turn in range(current_turn - turns, current_turn + 1):
+            events.extend(self._buckets.get(turn, []))
+        return events
+
+    def buckets(self):
+        """按回合顺序返回内存中的(回合, 事件列表)"""
+        return [(turn, self._buckets[turn]) for turn in self._turns]
+
+    def to_list(self):
+        """内存中保留的事件，按回合顺序"""
+        return [event for turn in self._turns for event in self._buckets[turn]]
+
+    def total_count(self):
+        """累计事件数，包括已移出内存的事件"""
+        return self._retained_count + self.spilled_count
+
+    def __iter__(self):
+        for turn in self._turns:
+            yield from self._buckets[turn]
+
+    def __len__(self):
+        return self._retained_count
+
+    def _evict(self, latest_turn):
+        """将超出保留窗口的旧回合桶移出内存"""
+        if self.retention_turns is None:
+            return
+
+        cutoff = latest_turn - self.retention_turns
+        expired = 0
+        while expired < len(self._turns) and self._turns[expired] <= cutoff:
+            expired += 1
+        if not expired:
+            return
+
+        expired_turns, self._turns = self._turns[:expired], self._turns[expired:]
+        records = []
+        for turn in expired_turns:
+            bucket = self._buckets.pop(turn)
+            self._versions.pop(turn, None)
+            self._retained_count -= len(bucket)
+            self.spilled_count += len(bucket)
+            records.append({'turn': turn, 'events': bucket})
+
+        if self.spill_path:
+            self._spill(records)
+
+    def _spill(self, records):
+        """以追加方式写入旧事件桶"""
+        directory = os.path.dirname(self.spill_path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory)
+
+        with open(self.spill_path, 'a', encoding='utf-8') as f:
+            for record in records:
+                f.write(json.dumps(record, ensure_ascii=False, default=str) + '\n')
+
+    def read_spilled(self, start_turn=None, end_turn=None):
+        """读取已写入磁盘的事件桶，返回该范围内的事件"""
+        if not self.spill_path or not os.path.exists(self.spill_path):
+            return []
+
+        events = []
+        with open(self.spill_path, 'r', encoding='utf-8') as f:
+            for line in f:
+                record = json.loads(line)
+                if start_turn is not None and record['turn'] < start_turn:
+                    continue
+                if end_turn is not None and record['turn'] > end_turn:
+                    continue
+                events.extend(record['events'])
+        return events
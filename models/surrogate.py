@@ -0,0 +1,266 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+领导决策代理模型
+从已记录的运行历史中学习 文明状态特征 -> 各部门主要命令 的分布（NumPy多项逻辑回归），
+领导可以先查询代理模型，只有置信度不足时才调用LLM
+"""
+
+import os
+import sys
+import json
+import argparse
+
+import numpy as np
+
+from models.decision import build_decision, NON_LLM_SOURCES, SOURCE_SURROGATE
+
+# 代理模型预测的部门及对应的命令字段
+DEPARTMENTS = {
+    'military': 'military_orders',
+    'economic': 'economic_orders',
+    'cultural': 'cultural_orders',
+    'diplomatic': 'diplomatic_orders'
+}
+
+# 没有命令时的标签
+NO_ORDER = 'none'
+
+# 相对目标：训练时把指向其他文明的目标换成相对位置，预测时再换回具体文明
+STRONGEST_TARGET = '@strongest'
+WEAKEST_TARGET = '@weakest'
+
+FEATURE_NAMES = [
+    'log_population', 'military_power', 'economic_power', 'technology_level',
+    'cultural_influence', 'happiness', 'military_ratio', 'power_ratio',
+    'mean_relation', 'min_relation', 'other_count'
+]
+
+def _power(state):
+    """与平衡者一致的综合力量分数"""
+    return (state.get('military_power', 0) * 0.4 + state.get('economic_power', 0) * 0.3 +
+            state.get('technology_level', 0) * 0.2 + state.get('population', 0) / 10000 * 0.1)
+
+def featurize(civ_id, civilization_states):
+    """把文明状态（及与其他文明的相对关系）转换为特征向量"""
+    state = civilization_states.get(civ_id, {})
+    others = {other_id: s for other_id, s in civilization_states.items() if other_id != civ_id}
+    relations = [value for other_id, value in (state.get('diplomatic_relations') or {}).items()
+                 if other_id in others and isinstance(value, (int, float))]
+    max_other_military = max((s.get('military_power', 0) for s in others.values()), default=0)
+    max_other_power = max((_power(s) for s in others.values()), default=0)
+
+    return np.array([
+        np.log1p(max(state.get('population', 0), 0)),
+        state.get('military_power', 0),
+        state.get('economic_power', 0),
+        state.get('technology_level', 0),
+        state.get('cultural_influence', 0),
+        state.get('happiness', 50),
+        state.get('military_power', 0) / max(max_other_military, 1),
+        _power(state) / max(max_other_power, 1),
+        float(np.mean(relations)) if relations else 0.0,
+        min(relations) if relations else 0.0,
+        len(others)
+    ], dtype=np.float64)
+
+def encode_order(order, civ_id, civilization_states):
+    """把命令编码为标签 '<类型>|<目标>'，指向最强/最弱文明的目标换成相对目标"""
+    if not order:
+        return NO_ORDER
+    target = order.get('target')
+    others = {other_id: _power(s) for other_id, s in civilization_states.items() if other_id != civ_id}
+    if target is not None and target in others:
+        if target == max(others, key=others.get):
+            target = STRONGEST_TARGET
+        elif target == min(others, key=others.get):
+            target = WEAKEST_TARGET
+    return f"{str(order.get('type', '')).lower()}|{'' if target is None else target}"
+
+def decode_order(label, civ_id, civilization_states):
+    """把标签还原为命令，没有命令时返回None"""
+    if label == NO_ORDER:
+        return None
+    order_type, _, target = label.partition('|')
+    others = {other_id: _power(s) for other_id, s in civilization_states.items() if other_id != civ_id}
+    if target == STRONGEST_TARGET:
+        target = max(others, key=others.get) if others else None
+    elif target == WEAKEST_TARGET:
+        target = min(others, key=others.get) if others else None
+    order = {'type': order_type, 'target': target or None, 'resources': 20, 'priority': 1}
+    return order
+
+def _primary_order(orders):
+    """优先级数值最小（最优先）的命令"""
+    orders = [order for order in orders or [] if isinstance(order, dict)]
+    if not orders:
+        return None
+    return min(orders, key=lambda order: order.get('priority') if isinstance(order.get('priority'), (int, float)) else 99)
+
+def extract_samples(history):
+    """从历史（回合 -> 回合数据）中提取训练样本 [(文明ID, 决策前的文明状态, {部门: 主要命令})]
+
+    决策前的状态取上一回合记录的文明状态；启发式快进和代理模型本身产生的决策不作为样本。
+    """
+    samples = []
+    previous_states = None
+    for turn in sorted(history):
+        turn_data = history[turn]
+        states = turn_data.get('civilization_states', {})
+        if previous_states:
+            for civ_id, decision in (turn_data.get('decisions') or {}).items():
+                if civ_id not in previous_states or not isinstance(decision, dict):
+                    continue
+                leader = decision.get('leader')
+                if isinstance(leader, dict) and leader.get('source') in NON_LLM_SOURCES:
+                    continue
+                orders = {}
+                for department in DEPARTMENTS:
+                    # 各部门执行的动作中保留了原始命令（结构化决策和自由文本决策都适用）
+                    actions = decision.get(department) or []
+                    orders[department] = _primary_order(
+                        [action.get('details') for action in actions if isinstance(action, dict)]
+                    )
+                samples.append((civ_id, previous_states, orders))
+        previous_states = states
+    return samples
+
+
+class SoftmaxRegression:
+    """多项逻辑回归，批量梯度下降加L2正则"""
+
+    def __init__(self, classes, learning_rate=0.5, l2=1e-3, epochs=500):
+        self.classes = list(classes)
+        self.learning_rate = learning_rate
+        self.l2 = l2
+        self.epochs = epochs
+        self.weights = None  # (特征数 + 1, 类别数)，最后一行为偏置
+
+    def fit(self, features, labels):
+        index = {label: i for i, label in enumerate(self.classes)}
+        targets = np.zeros((len(labels), len(self.classes)))
+        targets[np.arange(len(labels)), [index[label] for label in labels]] = 1.0
+        inputs = np.hstack([features, np.ones((len(features), 1))])
+
+        self.weights = np.zeros((inputs.shape[1], len(self.classes)))
+        for _ in range(self.epochs):
+            gradient = inputs.T @ (self._softmax(inputs @ self.weights) - targets) / len(inputs)
+            gradient[:-1] += self.l2 * self.weights[:-1]
+            self.weights -= self.learning_rate * gradient
+        return self
+
+    def predict_proba(self, features):
+        features = np.atleast_2d(features)
+        return self._softmax(np.hstack([features, np.ones((len(features), 1))]) @ self.weights)
+
+    @staticmethod
+    def _softmax(logits):
+        logits = logits - logits.max(axis=1, keepdims=True)
+        exp = np.exp(logits)
+        return exp / exp.sum(axis=1, keepdims=True)
+
+
+class DecisionSurrogate:
+    """领导决策代理模型：每个部门一个多项逻辑回归，预测该部门最优先的命令"""
+
+    def __init__(self):
+        self.mean = None
+        self.scale = None
+        self.models = {}  # 部门 -> SoftmaxRegression
+        self.sample_count = 0
+
+    def fit(self, samples, **kwargs):
+        """用extract_samples得到的样本训练，kwargs传给SoftmaxRegression"""
+        if not samples:
+            raise ValueError("没有可用的训练样本")
+        features = np.array([featurize(civ_id, states) for civ_id, states, _ in samples])
+        self.mean = features.mean(axis=0)
+        self.scale = features.std(axis=0)
+        self.scale[self.scale == 0] = 1.0
+        normalized = (features - self.mean) / self.scale
+
+        for department in DEPARTMENTS:
+            labels = [encode_order(orders.get(department), civ_id, states) for civ_id, states, orders in samples]
+            self.models[department] = SoftmaxRegression(sorted(set(labels)), **kwargs).fit(normalized, labels)
+        self.sample_count = len(samples)
+        return self
+
+    def predict(self, civ_id, civilization_states):
+        """预测结构化决策，返回(决策, 置信度)；置信度为各部门最大类别概率中的最小值"""
+        features = (featurize(civ_id, civilization_states) - self.mean) / self.scale
+        orders = {}
+        confidence = 1.0
+        for department, key in DEPARTMENTS.items():
+            model = self.models[department]
+            probabilities = model.predict_proba(features)[0]
+            best = int(np.argmax(probabilities))
+            confidence = min(confidence, float(probabilities[best]))
+            order = decode_order(model.classes[best], civ_id, civilization_states)
+            orders[key] = [order] if order else []
+        return build_decision(orders, SOURCE_SURROGATE), confidence
+
+    def save(self, path):
+        """保存为.npz（权重数组）和同名.json（类别和超参数）"""
+        arrays = {'mean': self.mean, 'scale': self.scale}
+        meta = {'sample_count': self.sample_count, 'feature_names': FEATURE_NAMES, 'departments': {}}
+        for department, model in self.models.items():
+            arrays[f"weights_{department}"] = model.weights
+            meta['departments'][department] = model.classes
+        np.savez(path + '.npz', **arrays)
+        with open(path + '.json', 'w', encoding='utf-8') as f:
+            json.dump(meta, f, ensure_ascii=False, indent=2)
+
+    @classmethod
+    def load(cls, path):
+        with open(path + '.json', 'r', encoding='utf-8') as f:
+            meta = json.load(f)
+        if meta.get('feature_names') != FEATURE_NAMES:
+            raise ValueError(f"代理模型 {path} 的特征与当前版本不一致，需要重新训练")
+
+        surrogate = cls()
+        surrogate.sample_count = meta['sample_count']
+        with np.load(path + '.npz') as arrays:
+            surrogate.mean = arrays['mean']
+            surrogate.scale = arrays['scale']
+            for department, classes in meta['departments'].items():
+                model = SoftmaxRegression(classes)
+                model.weights = arrays[f"weights_{department}"]
+                surrogate.models[department] = model
+        return surrogate
+
+
+def load_history(source):
+    """读取一次运行的历史：HistoryStore目录，或已有的 回合 -> 回合数据 映射"""
+    if isinstance(source, str):
+        from utils.history_store import HistoryStore
+        return HistoryStore(source).history_view()
+    return source
+
+def train_surrogate(sources, output_path=None, **kwargs):
+    """从多次运行的历史训练代理模型，给出output_path时保存"""
+    samples = []
+    for source in sources:
+        samples.extend(extract_samples(load_history(source)))
+    surrogate = DecisionSurrogate().fit(samples, **kwargs)
+    if output_path:
+        surrogate.save(output_path)
+    return surrogate
+
+def main():
+    """命令行入口：python -m models.surrogate --history <历史目录>... --output <路径>"""
+    parser = argparse.ArgumentParser(description='从记录的运行历史训练领导决策代理模型')
+    parser.add_argument('--history', type=str, nargs='+', required=True, help='HistoryStore历史目录（可多个）')
+    parser.add_argument('--output', type=str, required=True, help='代理模型路径（不含扩展名）')
+    parser.add_argument('--epochs', type=int, default=500, help='训练轮数')
+    args = parser.parse_args()
+
+    directory = os.path.dirname(args.output)
+    if directory and not os.path.exists(directory):
+        os.makedirs(directory)
+    surrogate = train_surrogate(args.history, args.output, epochs=args.epochs)
+    print(f"代理模型已保存到 {args.output}（{surrogate.sample_count} 个样本）")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
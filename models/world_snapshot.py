@@ -0,0 +1,61 @@
+from collections.abc import Mapping
+
+class WorldSnapshot(Mapping):
+    """某一回合世界状态的只读快照
+
+    与前一个快照结构共享：未变化的文明状态和事件桶直接复用前一快照中的副本，只追加的灾害列表
+    按引用共享，只有本回合修改过的文明状态和事件桶是新的副本。
+    以Mapping形式提供与WorldState.to_dict()相同的键，快照内容应视为只读。
+    """
+
+    _KEYS = ('size', 'current_turn', 'civilization_states', 'events', 'disasters')
+
+    def __init__(self, size, current_turn, civilization_states, event_buckets, disasters, disaster_count,
+                 event_versions=None):
+        self.size = size
+        self.current_turn = current_turn
+        self.civilization_states = civilization_states  # 文明ID -> 状态副本（可能与其他快照共享）
+        self.event_buckets = event_buckets  # ((回合, 事件副本元组), ...)
+        self.event_versions = event_versions or {}  # 回合 -> 快照时刻的桶版本号
+        self._disasters = disasters  # 世界状态中只追加的灾害列表
+        self._disaster_count = disaster_count  # 快照时刻的灾害数量
+
+    @property
+    def events(self):
+        """快照时刻内存中保留的事件"""
+        return [event for _, bucket in self.event_buckets for event in bucket]
+
+    @property
+    def disasters(self):
+        """快照时刻的灾害列表"""
+        return self._disasters[:self._disaster_count]
+
+    def disasters_for_turn(self, turn):
+        """快照时刻属于指定回合的灾害（从尾部向前查找，不复制整个列表）"""
+        disasters = []
+        for index in range(self._disaster_count - 1, -1, -1):
+            disaster = self._disasters[index]
+            if disaster.get('turn') == turn:
+                disasters.append(disaster)
+            elif disaster.get('turn', turn) < turn:
+                break
+        disasters.reverse()
+        return disasters
+
+    def __getitem__(self, key):
+        if key not in self._KEYS:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def __iter__(self):
+        return iter(self._KEYS)
+
+    def __len__(self):
+        return len(self._KEYS)
+
+    def __repr__(self):
+        return f"WorldSnapshot(turn={self.current_turn}, civilizations={len(self.civilization_states)})"
+
+    def to_dict(self):
+        """转换为与WorldState.to_dict()相同结构的字典"""
+        return {key: self[key] for key in self._KEYS}
@@ -1,16 +1,33 @@
+import copy
+from models.event_log import EventLog
+from models.world_snapshot import WorldSnapshot
+
 class WorldState:
     """世界状态模型，包含地形、资源、气候和文明状态"""
     
-    def __init__(self, size, terrain, resources, climate, current_turn=0):
+    def __init__(self, size, terrain, resources, climate, current_turn=0, event_log=None):
         self.size = size  # 世界大小
         self.terrain = terrain  # 地形数据
         self.resources = resources  # 资源分布
         self.climate = climate  # 气候状态
         self.current_turn = current_turn  # 当前回合
         self.civilization_states = {}  # 各文明状态
-        self.events = []  # 事件记录
+        self.events = event_log if event_log is not None else EventLog()  # 按回合分桶的事件记录
         self.disasters = []  # 自然灾害
         
+        # 写时复制快照：记录自上次快照以来修改过的文明
+        self._dirty_civilizations = set()
+        self._last_snapshot = None
+        self._snapshot_sources = {}  # 文明ID -> 上次快照时的实时状态对象
+        
+    def __getstate__(self):
+        """序列化时不保存快照缓存，恢复后的第一个快照会完整复制文明状态"""
+        state = self.__dict__.copy()
+        state['_dirty_civilizations'] = set()
+        state['_last_snapshot'] = None
+        state['_snapshot_sources'] = {}
+        return state
+    
     def get_civilization_state(self, civilization_id):
         """获取特定文明的状态"""
         return self.civilization_states.get(civilization_id, {})
@@ -25,12 +42,69 @@ class WorldState:
             self.civilization_states[civilization_id] = {}
         
         self.civilization_states[civilization_id].update(state_update)
+        self._dirty_civilizations.add(civilization_id)
+    
+    def mark_civilization_dirty(self, civilization_id):
+        """标记文明状态已被原地修改（未经update_civilization_state的修改需要调用）"""
+        self._dirty_civilizations.add(civilization_id)
+    
+    def snapshot(self):
+        """生成当前世界状态的只读快照
+        
+        只深拷贝自上次快照以来修改过的文明状态，其余文明状态、已结束回合的事件桶和灾害列表
+        与上一个快照共享，因此代价与变化量成正比。
+        """
+        previous_states = self._last_snapshot.civilization_states if self._last_snapshot else {}
+        
+        civilization_states = {}
+        for civ_id, state in self.civilization_states.items():
+            unchanged = (civ_id in previous_states
+                         and civ_id not in self._dirty_civilizations
+                         and self._snapshot_sources.get(civ_id) is state)
+            civilization_states[civ_id] = previous_states[civ_id] if unchanged else copy.deepcopy(state)
+        
+        # 事件桶复制后冻结为元组；版本号未变化的桶直接复用上一个快照中的元组
+        previous_buckets = dict(self._last_snapshot.event_buckets) if self._last_snapshot else {}
+        previous_versions = self._last_snapshot.event_versions if self._last_snapshot else {}
+        event_buckets = []
+        event_versions = {}
+        for turn, bucket in self.events.buckets():
+            version = self.events.version(turn)
+            frozen = previous_buckets.get(turn)
+            if frozen is None or previous_versions.get(turn) != version:
+                frozen = tuple(copy.deepcopy(event) for event in bucket)
+            event_buckets.append((turn, frozen))
+            event_versions[turn] = version
+        event_buckets = tuple(event_buckets)
+        
+        snapshot = WorldSnapshot(
+            size=self.size,
+            current_turn=self.current_turn,
+            civilization_states=civilization_states,
+            event_buckets=event_buckets,
+            event_versions=event_versions,
+            disasters=self.disasters,
+            disaster_count=len(self.disasters)
+        )
+        
+        self._last_snapshot = snapshot
+        self._snapshot_sources = dict(self.civilization_states)
+        self._dirty_civilizations.clear()
+        return snapshot
     
     def add_event(self, event):
         """添加事件"""
         event['turn'] = self.current_turn
         self.events.append(event)
     
+    def update_event(self, event, **fields):
+        """修改已记录的事件（直接修改事件字典不会反映到之后的快照中）"""
+        self.events.update_event(event, **fields)
+    
+    def get_recent_events(self, turns):
+        """获取最近turns个回合内的事件"""
+        return self.events.recent(turns, self.current_turn)
+    
     def get_region_resources(self, region_coords):
         """获取特定区域的资源"""
         region_resources = {}
@@ -99,6 +173,6 @@ class WorldState:
             'size': self.size,
             'current_turn': self.current_turn,
             'civilization_states': self.civilization_states,
-            'events': self.events,
+            'events': self.events.to_list(),  # 只包含内存保留窗口内的事件
             'disasters': self.disasters
         } 
\ No newline at end of file
@@ -0,0 +1,67 @@
+from utils.advice_gate import AdviceGate
+
+
+def inputs(population=1000, happiness=50.0, threats=('b',)):
+    return {'civilization_state': {'population': population, 'happiness': happiness, 'name': 'A'},
+            'threats': list(threats)}
+
+
+def test_first_lookup_misses_and_identical_inputs_reuse():
+    gate = AdviceGate()
+    assert gate.lookup(1, inputs()) is None
+    gate.store(1, inputs(), 'advice')
+    assert gate.lookup(2, inputs()) == 'advice'
+    assert (gate.refreshed, gate.reused) == (1, 1)
+
+
+def test_untolerated_fields_must_match_exactly():
+    gate = AdviceGate()
+    gate.store(1, inputs(), 'advice')
+    assert gate.lookup(2, inputs(population=1001)) is None
+    assert gate.lookup(2, inputs(threats=('c',))) is None
+    assert gate.lookup(2, inputs(threats=('b', 'c'))) is None
+
+
+def test_absolute_tolerance_by_leaf_key():
+    gate = AdviceGate(tolerances={'happiness': 2})
+    gate.store(1, inputs(), 'advice')
+    assert gate.lookup(2, inputs(happiness=52.0)) == 'advice'
+    assert gate.lookup(2, inputs(happiness=47.5)) is None
+
+
+def test_relative_tolerance_by_full_path():
+    gate = AdviceGate(tolerances={'civilization_state.population': '5%'})
+    gate.store(1, inputs(), 'advice')
+    assert gate.lookup(2, inputs(population=1050)) == 'advice'
+    assert gate.lookup(2, inputs(population=940)) is None
+
+
+def test_small_changes_are_compared_with_the_stored_inputs():
+    # 每回合的小变化都在容差内，但累积超过容差后必须刷新
+    gate = AdviceGate(tolerances={'happiness': 2})
+    gate.store(1, inputs(happiness=50.0), 'advice')
+    assert gate.lookup(2, inputs(happiness=51.5)) == 'advice'
+    assert gate.lookup(3, inputs(happiness=53.0)) is None
+
+
+def test_refresh_interval_forces_regeneration():
+    gate = AdviceGate(refresh_interval=3)
+    gate.store(1, inputs(), 'advice')
+    assert gate.lookup(3, inputs()) == 'advice'
+    assert gate.lookup(4, inputs()) is None
+    assert AdviceGate(refresh_interval=0).lookup(1, inputs()) is None
+
+
+def test_booleans_are_not_treated_as_numbers():
+    gate = AdviceGate(tolerances={'at_war': 1})
+    gate.store(1, {'at_war': False}, 'advice')
+    assert gate.lookup(2, {'at_war': True}) is None
+
+
+def test_stored_inputs_are_independent_of_later_mutation():
+    gate = AdviceGate()
+    live = inputs()
+    gate.store(1, live, 'advice')
+    live['civilization_state']['population'] = 5
+    assert gate.lookup(2, live) is None
+    assert gate.lookup(2, inputs()) == 'advice'
@@ -0,0 +1,53 @@
+import logging
+
+from config.llm_config import LLMConfig
+from config.simulation_config import SimulationConfig
+from core.batch_runner import BatchRunner, _redirect_run_log, _restore_run_log, _run_config, canonical_run_id, load_results
+
+
+def test_worker_llm_config_splits_quota_across_processes(tmp_path):
+    llm_config = LLMConfig(requests_per_minute=100, tokens_per_minute=90000)
+    runner = BatchRunner(SimulationConfig(), str(tmp_path), seeds=[0, 1], processes=4, llm_config=llm_config)
+
+    worker = runner.worker_llm_config()
+    assert worker.requests_per_minute == 25
+    assert worker.tokens_per_minute == 22500
+    assert runner.llm_config.requests_per_minute == 100
+
+
+def test_serial_runs_use_the_full_quota(tmp_path):
+    runner = BatchRunner(SimulationConfig(), str(tmp_path), seeds=[0], llm_config=LLMConfig(requests_per_minute=100))
+    assert runner.worker_llm_config().requests_per_minute == 100
+
+
+def test_run_ids_ignore_key_order_and_duplicates(tmp_path):
+    assert canonical_run_id({'seed': 1, 'max_turns': 5}) == canonical_run_id({'max_turns': 5, 'seed': 1})
+    runner = BatchRunner(SimulationConfig(), str(tmp_path), seeds=[0, 0, 1],
+                         variants={'base': {}, 'same': {}, 'short': {'max_turns': 5}})
+    assert len(runner.runs()) == 4
+
+
+def test_load_results_skips_partial_line(tmp_path):
+    path = tmp_path / 'results.jsonl'
+    path.write_text('{"run_id": "a", "status": "ok"}\n{"run_id": "b", "sta', encoding='utf-8')
+    assert [result['run_id'] for result in load_results(str(path))] == ['a']
+
+
+def test_run_config_applies_dotted_overrides(tmp_path):
+    base = SimulationConfig(world_size={'width': 10, 'height': 10})
+    config = _run_config(base, {'world_size.width': 20, 'seed': 3}, str(tmp_path / 'run'))
+    assert config.world_size == {'width': 20, 'height': 10}
+    assert config.seed == 3
+    assert base.world_size['width'] == 10
+    assert config.output_dir == str(tmp_path / 'run')
+
+
+def test_worker_warnings_are_written_to_the_run_log(tmp_path):
+    root = logging.getLogger('civilization_sim')
+    previous = list(root.handlers)
+    handler = _redirect_run_log(str(tmp_path))
+    logging.getLogger('civilization_sim.agents.test').warning('advisor fell back')
+    _restore_run_log(handler)
+
+    assert 'advisor fell back' in (tmp_path / 'simulation.log').read_text(encoding='utf-8')
+    assert root.handlers == previous
@@ -0,0 +1,108 @@
+import json
+import zlib
+
+import pytest
+
+from core.event_effects import EventEffectEngine
+from models.world_state import WorldState
+from utils.checkpoint import CheckpointWriter, list_checkpoints, load_checkpoint
+
+
+def make_world():
+    world_state = WorldState({'width': 2, 'height': 2}, {}, {}, {}, current_turn=1)
+    world_state.update_civilization_state('a', {'population': 1000, 'economic_power': 10})
+    world_state.update_civilization_state('b', {'population': 2000, 'economic_power': 20})
+    return world_state
+
+
+@pytest.fixture
+def writer(tmp_path):
+    writer = CheckpointWriter(str(tmp_path / 'checkpoints'), full_interval=10)
+    yield writer
+    writer.close()
+
+
+def write(writer, world_state):
+    writer.submit(world_state.current_turn, world_state.snapshot())
+    writer.flush()
+    assert writer.last_error is None
+
+
+@pytest.mark.parametrize('compression', ['zlib', 'lzma'])
+def test_full_checkpoint_round_trip(tmp_path, compression):
+    writer = CheckpointWriter(str(tmp_path), compression=compression)
+    world_state = make_world()
+    world_state.add_event({'title': 'founding'})
+    writer.submit(1, world_state.snapshot(), extra={'note': 'first'})
+    writer.close()
+
+    state = load_checkpoint(str(tmp_path))
+    assert state['current_turn'] == 1
+    assert state['civilization_states'] == world_state.civilization_states
+    assert state['events'] == [{'title': 'founding', 'turn': 1}]
+    assert state['extra'] == {'note': 'first'}
+
+
+def test_delta_restores_event_updated_in_place(writer):
+    world_state = make_world()
+    engine = EventEffectEngine()
+    event = {'title': 'boom', 'target_civilization': 'a', 'effects': {'economic': 1}, 'duration': 3,
+             'turns_remaining': 3}
+    world_state.add_event(event)
+    engine.schedule(event, 1)
+    write(writer, world_state)
+
+    # 事件桶的数量不变，只有剩余回合数被原地更新
+    world_state.current_turn = 2
+    engine.apply_turn(world_state)
+    write(writer, world_state)
+
+    assert [kind for _, kind, _ in list_checkpoints(writer.directory)] == ['full', 'delta']
+    state = load_checkpoint(writer.directory)
+    assert state['current_turn'] == 2
+    assert state['events'][0]['turns_remaining'] == 1
+    assert state['civilization_states']['a']['economic_power'] == 11
+    assert state['civilization_states']['b'] == world_state.civilization_states['b']
+
+
+def test_delta_writes_only_changed_buckets(writer):
+    world_state = make_world()
+    world_state.add_event({'title': 'founding'})
+    write(writer, world_state)
+    world_state.current_turn = 2
+    world_state.add_event({'title': 'second'})
+    write(writer, world_state)
+
+    _, kind, path = list_checkpoints(writer.directory)[-1]
+    with open(path, 'rb') as f:
+        record = json.loads(zlib.decompress(f.read()))
+    assert kind == 'delta'
+    assert [turn for turn, _ in record['event_buckets']] == [2]
+    assert record['retained_turns'] == [1, 2]
+
+
+def test_delta_chain_and_earlier_turn(writer):
+    world_state = make_world()
+    write(writer, world_state)
+    for turn in (2, 3):
+        world_state.current_turn = turn
+        world_state.add_event({'title': f'event {turn}'})
+        world_state.update_civilization_state('a', {'population': 1000 + turn})
+        write(writer, world_state)
+
+    latest = load_checkpoint(writer.directory)
+    assert [e['title'] for e in latest['events']] == ['event 2', 'event 3']
+    assert latest['civilization_states']['a']['population'] == 1003
+
+    earlier = load_checkpoint(writer.directory, turn=2)
+    assert [e['title'] for e in earlier['events']] == ['event 2']
+    assert earlier['civilization_states']['a']['population'] == 1002
+
+
+def test_write_errors_are_logged(writer, caplog, capsys):
+    with caplog.at_level('ERROR', logger='civilization_sim'):
+        writer.submit(1, object())
+        writer.flush()
+    assert writer.last_error is not None
+    assert any(record.name == 'civilization_sim.utils.checkpoint' for record in caplog.records)
+    assert capsys.readouterr().out == ''
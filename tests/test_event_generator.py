@@ -0,0 +1,55 @@
+import pickle
+from types import SimpleNamespace
+
+import pytest
+
+from agents.system_agents.event_generator import EventGeneratorAgent
+from llm.llm_interface import LLMInterface
+from models.world_state import WorldState
+
+
+class Library:
+    """覆盖所有组合的事件库"""
+
+    def has(self, event_type, event_scale):
+        return True
+
+    def sample(self, event_type, event_scale, civilization):
+        return {'title': f'{event_scale} {event_type}', 'duration': 1}
+
+
+@pytest.fixture(autouse=True)
+def offline_llm(monkeypatch):
+    monkeypatch.setattr(LLMInterface, 'setup_llm_client', lambda self: setattr(self, 'client_type', 'offline'))
+
+
+def generator(seed):
+    generator = EventGeneratorAgent('Events', batch_mode=True, event_library=Library(), seed=seed)
+    # 提高触发概率，保证每回合都有事件
+    generator.event_probabilities = {'minor': 0.5, 'major': 0.3, 'crisis': 0.2}
+    return generator
+
+
+def play(generator, turns):
+    civilizations = {civ_id: SimpleNamespace(id=civ_id, name=civ_id.upper()) for civ_id in 'abcd'}
+    world_state = WorldState({'width': 1, 'height': 1}, {}, {}, {})
+    return [[(event['target_civilization'], event['scale'], event['subtype'])
+             for event in generator.generate_events(world_state, civilizations, offline=True)]
+            for _ in range(turns)]
+
+
+def test_batched_draws_are_reproducible_from_the_seed():
+    assert play(generator(7), 5) == play(generator(7), 5)
+    assert play(generator(7), 5) != play(generator(8), 5)
+    assert any(play(generator(7), 5))
+
+
+def test_batched_draws_continue_after_restoring_agent_state():
+    reference = play(generator(7), 6)
+
+    original = generator(7)
+    play(original, 3)
+    state = pickle.loads(pickle.dumps(original.get_state()))
+    restored = generator(None)
+    restored.set_state(state)
+    assert play(restored, 3) == reference[3:]
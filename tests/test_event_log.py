@@ -0,0 +1,108 @@
+import pickle
+
+from models.event_log import EventLog
+
+
+def event(turn, name):
+    return {'turn': turn, 'name': name}
+
+
+def names(events):
+    return [e['name'] for e in events]
+
+
+def test_recent_only_reads_the_requested_window():
+    log = EventLog()
+    for turn in range(1, 6):
+        log.append(event(turn, f'e{turn}'))
+    assert names(log.recent(1, 5)) == ['e4', 'e5']
+    assert names(log.get_turn(3)) == ['e3']
+    assert log.get_turn(9) == []
+
+
+def test_late_events_are_kept_in_turn_order():
+    log = EventLog()
+    log.append(event(3, 'late'))
+    log.append(event(1, 'early'))
+    log.append(event(3, 'later'))
+    assert [turn for turn, _ in log.buckets()] == [1, 3]
+    assert names(log) == ['early', 'late', 'later']
+
+
+def test_retention_spills_old_buckets_to_disk(tmp_path):
+    log = EventLog(retention_turns=2, spill_path=str(tmp_path / 'events.jsonl'))
+    for turn in range(1, 6):
+        log.append(event(turn, f'a{turn}'))
+        log.append(event(turn, f'b{turn}'))
+
+    assert [turn for turn, _ in log.buckets()] == [4, 5]
+    assert len(log) == 4
+    assert log.total_count() == 10
+    assert names(log.read_spilled()) == ['a1', 'b1', 'a2', 'b2', 'a3', 'b3']
+    assert names(log.read_spilled(start_turn=2, end_turn=2)) == ['a2', 'b2']
+
+
+def test_event_for_an_evicted_turn_goes_straight_to_disk(tmp_path):
+    log = EventLog(retention_turns=1, spill_path=str(tmp_path / 'events.jsonl'))
+    for turn in range(1, 4):
+        log.append(event(turn, f'e{turn}'))
+    log.append(event(1, 'straggler'))
+
+    assert names(log) == ['e3']
+    assert names(log.read_spilled(end_turn=1)) == ['e1', 'straggler']
+    assert log.total_count() == 4
+
+
+def test_without_spill_path_old_buckets_are_dropped():
+    log = EventLog(retention_turns=1)
+    for turn in range(1, 4):
+        log.append(event(turn, f'e{turn}'))
+    assert names(log) == ['e3']
+    assert log.spilled_count == 2
+    assert log.read_spilled() == []
+
+
+def test_versions_change_on_append_and_real_updates():
+    log = EventLog()
+    first = event(1, 'e1')
+    log.append(first)
+    version = log.version(1)
+
+    log.update_event(first, name='e1')
+    assert log.version(1) == version
+    log.update_event(first, turns_remaining=2)
+    assert log.version(1) == version + 1
+    log.append(event(1, 'e2'))
+    assert log.version(1) == version + 2
+    assert log.version(7) == 0
+
+
+def test_restore_spill_truncates_buckets_written_after_the_checkpoint(tmp_path):
+    log = EventLog(retention_turns=1, spill_path=str(tmp_path / 'events.jsonl'))
+    for turn in range(1, 4):
+        log.append(event(turn, f'e{turn}'))
+    checkpoint = pickle.dumps(log)
+    for turn in range(4, 6):
+        log.append(event(turn, f'e{turn}'))
+
+    restored = pickle.loads(checkpoint)
+    restored.restore_spill()
+    assert names(restored.read_spilled()) == ['e1', 'e2']
+    restored.append(event(4, 'e4'))
+    assert names(restored.read_spilled()) == ['e1', 'e2', 'e3']
+
+
+def test_fork_spill_copies_only_the_checkpointed_part(tmp_path):
+    log = EventLog(retention_turns=1, spill_path=str(tmp_path / 'events.jsonl'))
+    for turn in range(1, 4):
+        log.append(event(turn, f'e{turn}'))
+    branch = pickle.loads(pickle.dumps(log))
+    log.append(event(4, 'e4'))
+
+    branch.fork_spill(str(tmp_path / 'branch' / 'events.jsonl'))
+    assert names(branch.read_spilled()) == ['e1', 'e2']
+    branch.append(event(4, 'other'))
+    assert names(branch.read_spilled()) == ['e1', 'e2', 'e3']
+    assert names(branch) == ['other']
+    assert names(log.read_spilled()) == ['e1', 'e2', 'e3']
+    assert names(log) == ['e4']
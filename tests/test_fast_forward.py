@@ -0,0 +1,67 @@
+import pytest
+
+from config.simulation_config import SimulationConfig
+from core.simulation import Simulation
+from llm.llm_interface import LLMInterface
+from utils.tile_export import TileSeriesReader
+
+
+class CivilizationConfig:
+    def __init__(self, id, name):
+        self.id = id
+        self.name = name
+        self.initial_state = {'population': 1000}
+
+
+@pytest.fixture(autouse=True)
+def no_llm(monkeypatch):
+    """任何LLM调用（包括被回合截止跳过的调用）都使测试失败"""
+    def fail(self, *args, **kwargs):
+        pytest.fail('LLM call during fast-forward')
+
+    monkeypatch.setattr(LLMInterface, 'setup_llm_client', lambda self: setattr(self, 'client_type', 'offline'))
+    monkeypatch.setattr(LLMInterface, 'generate_response', fail)
+    monkeypatch.setattr(LLMInterface, 'generate_structured_response', fail)
+    monkeypatch.setattr(LLMInterface, '_call_provider', fail)
+
+
+def make_simulation(tmp_path, **kwargs):
+    config = SimulationConfig(
+        max_turns=30,
+        world_size={'width': 5, 'height': 5},
+        civilizations=[CivilizationConfig('a', 'A'), CivilizationConfig('b', 'B'), CivilizationConfig('c', 'C')],
+        seed=3,
+        output_dir=str(tmp_path / 'output'),
+        save_interval=10,
+        **kwargs
+    )
+    simulation = Simulation(config, LLMInterface())
+    simulation.initialize()
+    return simulation
+
+
+def test_fast_forward_makes_no_llm_calls(tmp_path):
+    simulation = make_simulation(tmp_path, turn_time_budget=5.0)
+    simulation.fast_forward(25)
+
+    assert simulation.current_turn == 25
+    assert list(simulation.observer.get_full_history()) == list(range(1, 26))
+    for civ_id in ('a', 'b', 'c'):
+        assert simulation.observer.get_turn_data(25)['decisions'][civ_id]['leader']['source'] == 'heuristic'
+
+
+def test_fast_forward_updates_tiles_every_interval(tmp_path):
+    simulation = make_simulation(tmp_path, fast_forward_environment_interval=4,
+                                 tile_export_dir=str(tmp_path / 'tiles'))
+    climate = {coord: dict(values) for coord, values in simulation.world_state.climate.items()}
+
+    simulation.fast_forward(3)
+    assert simulation.world_engine.environment_turn == 0
+    assert simulation.world_state.climate == climate
+
+    simulation.fast_forward(10)
+    assert simulation.world_engine.environment_turn == 8
+    assert simulation.world_state.climate != climate
+
+    simulation.tile_exporter.close()
+    assert TileSeriesReader(str(tmp_path / 'tiles')).turns == [4, 8]
@@ -0,0 +1,101 @@
+import os
+import random
+
+from utils.history_store import HistoryStore
+
+
+def make_turns(count, seed=0):
+    """逐回合变化的文明状态，包含文明和字段的增减"""
+    rng = random.Random(seed)
+    states = {'a': {'population': 1000, 'happiness': 50}, 'b': {'population': 800, 'happiness': 40}}
+    turns = {}
+    for turn in range(1, count + 1):
+        states = {civ_id: dict(state) for civ_id, state in states.items()}
+        for state in states.values():
+            state['population'] += rng.randint(-50, 50)
+        if turn == 4:
+            states['c'] = {'population': 100}
+        if turn == 7:
+            states['a']['capital'] = 'Rome'
+        if turn == 9:
+            del states['a']['capital']
+        if turn == 11:
+            del states['b']
+        turns[turn] = {
+            'civilization_states': states,
+            'world_state': {'size': {'width': 2, 'height': 2}, 'current_turn': turn,
+                            'events': [{'turn': turn, 'name': f'e{turn}'}, {'turn': turn - 1, 'name': 'old'}]},
+            'decisions': {'a': {'leader': {'summary': f'turn {turn}'}}}
+        }
+    return turns
+
+
+def write(store, turns):
+    for turn, turn_data in turns.items():
+        store.append_turn(turn, turn_data)
+
+
+def test_states_are_reconstructed_from_keyframes_and_deltas(tmp_path):
+    turns = make_turns(14)
+    store = HistoryStore(str(tmp_path), keyframe_interval=5)
+    write(store, turns)
+
+    # 随机访问（需要从关键帧回放）和顺序访问（使用读取缓存）结果一致
+    for turn in [13, 2, 9, 5, 6, 14, 1]:
+        assert store.get_turn(turn)['civilization_states'] == turns[turn]['civilization_states']
+    for turn in store.turns():
+        data = store.get_turn(turn)
+        assert data['civilization_states'] == turns[turn]['civilization_states']
+        assert data['world_state']['civilization_states'] == turns[turn]['civilization_states']
+        assert data['decisions'] == turns[turn]['decisions']
+        assert [e['name'] for e in data['world_state']['events']] == [f'e{turn}']
+
+
+def test_reopening_recovers_index_and_drops_partial_record(tmp_path):
+    turns = make_turns(8)
+    store = HistoryStore(str(tmp_path), keyframe_interval=3)
+    write(store, turns)
+    store.close()
+
+    segment = os.path.join(str(tmp_path), 'segment_000000.log')
+    size = os.path.getsize(segment)
+    with open(segment, 'ab') as f:
+        f.write(b'\x00\x00\x01\x00partial')
+
+    reopened = HistoryStore(str(tmp_path), keyframe_interval=3)
+    assert os.path.getsize(segment) == size
+    assert reopened.turns() == list(range(1, 9))
+    more = make_turns(10)
+    reopened.append_turn(9, more[9])
+    assert reopened.get_turn(9)['civilization_states'] == more[9]['civilization_states']
+    assert reopened.get_turn(4)['civilization_states'] == turns[4]['civilization_states']
+
+
+def test_truncate_after_then_continue(tmp_path):
+    turns = make_turns(12)
+    store = HistoryStore(str(tmp_path), keyframe_interval=4, segment_max_bytes=1)
+    write(store, turns)
+    assert len([name for name in os.listdir(str(tmp_path)) if name.startswith('segment_')]) > 1
+
+    store.truncate_after(6)
+    assert store.last_turn() == 6
+    replacement = make_turns(12, seed=1)
+    for turn in range(7, 10):
+        store.append_turn(turn, replacement[turn])
+
+    for turn in range(1, 7):
+        assert store.get_turn(turn)['civilization_states'] == turns[turn]['civilization_states']
+    # 截断后写入的回合是相对保留的回合6的差量，先读其他回合使其从关键帧回放
+    store.get_turn(2)
+    for turn in range(7, 10):
+        assert store.get_turn(turn)['civilization_states'] == replacement[turn]['civilization_states']
+
+
+def test_history_view_is_a_read_only_mapping(tmp_path):
+    turns = make_turns(3)
+    store = HistoryStore(str(tmp_path))
+    write(store, turns)
+    view = store.history_view()
+    assert list(view) == [1, 2, 3] and len(view) == 3
+    assert 2 in view and 5 not in view
+    assert view[3]['civilization_states'] == turns[3]['civilization_states']
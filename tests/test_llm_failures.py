@@ -0,0 +1,109 @@
+import pytest
+
+import agents.civilization_agents.leader_agent as leader_module
+from agents.civilization_agents.leader_agent import LeaderAgent
+from agents.base_agent import BaseAgent
+from agents.civilization_agents.population_agent import PopulationAgent
+from agents.system_agents.narrative_constructor import NarrativeConstructorAgent
+from llm.llm_interface import LLMError, LLMInterface
+from models.world_state import WorldState
+
+
+class Advisor(BaseAgent):
+    """只调用一次LLM的顾问"""
+
+    def provide_advice(self, world_state):
+        return self.generate_decision(f"advise on turn {world_state.current_turn}")
+
+    def heuristic_advice(self, world_state):
+        return {'orders': []}
+
+    def process(self, world_state, **kwargs):
+        return None
+
+
+class Provider:
+    """可切换为故障状态的离线提供商"""
+
+    def __init__(self):
+        self.down = False
+        self.calls = 0
+
+    def __call__(self, interface, full_prompt, model, temperature, max_tokens, json_schema=None, timeout=None):
+        self.calls += 1
+        if self.down:
+            raise LLMError("provider unavailable", status_code=400)
+        return 'advice text', 10
+
+
+@pytest.fixture
+def provider(monkeypatch):
+    provider = Provider()
+    monkeypatch.setattr(LLMInterface, 'setup_llm_client', lambda self: setattr(self, 'client_type', 'offline'))
+    monkeypatch.setattr(LLMInterface, '_call_provider',
+                        lambda self, *args, **kwargs: provider(self, *args, **kwargs))
+    return provider
+
+
+@pytest.fixture
+def world_state():
+    world_state = WorldState({'width': 2, 'height': 2}, {}, {}, {}, current_turn=1)
+    world_state.update_civilization_state('a', {'name': 'A', 'population': 1000, 'military_power': 100,
+                                                'economic_power': 100, 'happiness': 50})
+    world_state.update_civilization_state('b', {'name': 'B', 'population': 800, 'military_power': 80,
+                                                'economic_power': 90, 'happiness': 50})
+    return world_state
+
+
+@pytest.fixture
+def leader(provider):
+    interface = LLMInterface()
+    leader = LeaderAgent('Leader', 'a', 'balanced', llm_interface=interface)
+    leader.register_advisor('military', Advisor('General', 'a', llm_interface=interface))
+    leader.register_advisor('population', PopulationAgent('People', 'a', 1000, llm_interface=interface))
+    return leader
+
+
+def test_generate_response_raises_after_failure(provider):
+    provider.down = True
+    with pytest.raises(LLMError):
+        LLMInterface().generate_response('prompt')
+
+
+def test_failed_advice_falls_back_to_heuristic_advice(provider, leader, world_state):
+    provider.down = True
+    advice = leader.collect_advice(world_state)
+    assert advice['military'] == leader.advisors['military'].heuristic_advice(world_state)
+    assert advice['population'] == leader.advisors['population'].heuristic_advice(world_state)
+
+
+def test_failed_advice_reuses_previous_advice(provider, leader, world_state):
+    first = leader.collect_advice(world_state)
+    assert first == {'military': 'advice text', 'population': 'advice text'}
+
+    provider.down = True
+    world_state.current_turn = 2
+    assert leader.collect_advice(world_state) == first
+
+
+def test_failed_leader_decision_uses_heuristic_decision(provider, leader, world_state, monkeypatch):
+    monkeypatch.setattr(leader_module, 'LEADER_DECISION_TEMPLATE', '{leader_name}')
+    provider.down = True
+    decision = leader.process(world_state)
+    assert decision['source'] == 'heuristic'
+
+
+def test_failed_narrative_returns_placeholder(provider):
+    provider.down = True
+    narrator = NarrativeConstructorAgent('Narrator', LLMInterface())
+    narrative = narrator.generate_turn_narrative({'world_state': {'current_turn': 3}})
+    assert narrative == '(Narrative unavailable for turn 3)'
+
+
+def test_fallback_warnings_go_to_logger_not_stdout(provider, leader, world_state, caplog, capsys):
+    provider.down = True
+    with caplog.at_level('WARNING', logger='civilization_sim'):
+        leader.collect_advice(world_state)
+    assert any('could not provide advice' in record.getMessage() for record in caplog.records)
+    assert all(record.name.startswith('civilization_sim.') for record in caplog.records)
+    assert 'could not provide advice' not in capsys.readouterr().out
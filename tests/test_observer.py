@@ -0,0 +1,96 @@
+import pickle
+
+import pytest
+
+from agents.system_agents.observer import ObserverAgent
+from llm.llm_interface import LLMInterface
+from models.world_state import WorldState
+from utils.history_store import HistoryStore
+
+
+@pytest.fixture(autouse=True)
+def offline_llm(monkeypatch):
+    monkeypatch.setattr(LLMInterface, 'setup_llm_client', lambda self: setattr(self, 'client_type', 'offline'))
+
+
+def play(observer, turns, start=1):
+    world_state = WorldState({'width': 2, 'height': 2}, {}, {}, {})
+    for turn in range(start, start + turns):
+        world_state.current_turn = turn
+        for civ_id in ('a', 'b'):
+            world_state.update_civilization_state(civ_id, {'population': 1000 + turn, 'happiness': 50})
+        events = [{'type': 'random_event', 'title': f'a{turn}', 'target_civilization': 'a', 'turn': turn}]
+        if turn % 2 == 0:
+            events.append({'type': 'disaster', 'title': f'world{turn}', 'turn': turn})
+        if turn % 3 == 0:
+            events.append({'type': 'random_event', 'title': f'b{turn}', 'target_civilization': 'b', 'turn': turn})
+        decisions = {'a': {'leader': {'summary': f'a plan {turn}'}}, 'b': {'leader': {'summary': f'b plan {turn}'}}}
+        observer.record_turn(turn, world_state, {'a': None, 'b': None}, decisions, {}, events, None)
+
+
+def store_observer(directory):
+    observer = ObserverAgent('Observer', history_store=HistoryStore(str(directory), keyframe_interval=3))
+    observer.initialize(['a', 'b'])
+    return observer
+
+
+def titles(events):
+    return [event['title'] for event in events]
+
+
+def test_store_backed_range_queries(tmp_path):
+    observer = store_observer(tmp_path)
+    play(observer, 10)
+
+    assert titles(observer._extract_key_events('a', 3, 5)) == ['a3', 'a4', 'a5']
+    assert titles(observer._extract_key_events('b', 1, 10)) == ['b3', 'b6', 'b9']
+    assert titles(observer._extract_world_events(5, 8)) == ['world6', 'world8']
+    assert observer._extract_decisions('b', 9, 20) == [
+        {'turn': 9, 'content': {'leader': {'summary': 'b plan 9'}}},
+        {'turn': 10, 'content': {'leader': {'summary': 'b plan 10'}}}
+    ]
+    assert observer._extract_key_events('c', 1, 10) == []
+
+    report = observer.generate_report(2, 4)
+    assert titles(report['civilizations']['a']['key_events']) == ['a2', 'a3', 'a4']
+    assert [d['turn'] for d in report['civilizations']['b']['decisions']] == [2, 3, 4]
+    assert titles(report['world_events']) == ['world2', 'world4']
+
+
+def test_indexes_hold_turn_numbers_only(tmp_path):
+    observer = store_observer(tmp_path)
+    play(observer, 6)
+    assert observer.events_by_civilization == {'a': [1, 2, 3, 4, 5, 6], 'b': [3, 6]}
+    assert observer.world_events == [2, 4, 6]
+    assert observer.decisions_by_civilization == {'a': [1, 2, 3, 4, 5, 6], 'b': [1, 2, 3, 4, 5, 6]}
+    assert list(observer.history) == [6]
+
+
+def test_range_queries_after_restoring_from_a_resume_point(tmp_path):
+    observer = store_observer(tmp_path / 'history')
+    play(observer, 4)
+    state = pickle.loads(pickle.dumps(observer.get_state()))
+    assert 'history' not in state
+    play(observer, 2, start=5)
+    observer.close()
+
+    restored = store_observer(tmp_path / 'history')
+    restored.set_state(state)
+    assert restored.history_store.turns() == [1, 2, 3, 4]
+    assert titles(restored._extract_key_events('a', 1, 10)) == ['a1', 'a2', 'a3', 'a4']
+
+    play(restored, 2, start=5)
+    assert titles(restored._extract_key_events('b', 1, 10)) == ['b3', 'b6']
+    assert [d['turn'] for d in restored._extract_decisions('a', 3, 6)] == [3, 4, 5, 6]
+
+
+def test_in_memory_observer_answers_the_same_queries(tmp_path):
+    stored = store_observer(tmp_path)
+    in_memory = ObserverAgent('Observer')
+    in_memory.initialize(['a', 'b'])
+    play(stored, 7)
+    play(in_memory, 7)
+    for civ_id in ('a', 'b'):
+        assert stored.generate_report(1, 7)['civilizations'][civ_id]['key_events'] == \
+            in_memory.generate_report(1, 7)['civilizations'][civ_id]['key_events']
+    assert stored._extract_world_events(1, 7) == in_memory._extract_world_events(1, 7)
@@ -0,0 +1,69 @@
+import random
+import statistics
+
+import numpy as np
+import pytest
+
+from utils.online_stats import EWMA, MetricStatistics, P2Quantile, RunningStats, WindowedExtrema
+
+
+def test_welford_matches_two_pass_statistics():
+    rng = random.Random(3)
+    # 大偏移量下朴素的平方和公式会丢失精度
+    values = [1e9 + rng.gauss(0, 1) for _ in range(1000)]
+    stats = RunningStats()
+    for value in values:
+        stats.update(value)
+    assert stats.count == 1000
+    assert stats.mean == pytest.approx(statistics.fmean(values), rel=1e-12)
+    assert stats.variance == pytest.approx(statistics.variance(values), rel=1e-6)
+    assert RunningStats().variance == 0.0
+
+
+def test_ewma():
+    ewma = EWMA(alpha=0.5)
+    for value in (10, 20, 0):
+        ewma.update(value)
+    assert ewma.value == pytest.approx(7.5)
+
+
+def test_windowed_extrema_match_brute_force():
+    rng = random.Random(5)
+    values = [rng.randint(0, 100) for _ in range(200)]
+    extrema = WindowedExtrema(window=7)
+    for index, value in enumerate(values):
+        extrema.update(value)
+        window = values[max(0, index - 6):index + 1]
+        assert (extrema.minimum, extrema.maximum) == (min(window), max(window))
+
+
+@pytest.mark.parametrize('p', [0.1, 0.5, 0.9])
+def test_p2_quantile_tracks_exact_quantile(p):
+    rng = np.random.default_rng(11)
+    values = rng.normal(100, 15, 5000)
+    estimator = P2Quantile(p)
+    for value in values:
+        estimator.update(float(value))
+    assert estimator.value == pytest.approx(float(np.quantile(values, p)), abs=1.0)
+
+
+def test_p2_quantile_before_five_samples():
+    estimator = P2Quantile(0.5)
+    assert estimator.value is None
+    for value in (5, 1, 3):
+        estimator.update(value)
+    assert estimator.value == 3
+
+
+def test_metric_statistics_growth_and_summary():
+    stats = MetricStatistics(window=2)
+    for turn, value in enumerate((100, 110, 99, 0, 10), start=1):
+        stats.update(value, turn)
+    summary = stats.summary()
+    assert summary['count'] == 5
+    assert summary['window_min'] == 0 and summary['window_max'] == 10
+    # 从0开始的变化率无定义，不计入增长率统计
+    assert stats.growth.count == 3
+    assert summary['growth_rate'] == pytest.approx(-1.0)
+    assert summary['mean_growth_rate'] == pytest.approx((0.1 - 0.1 - 1.0) / 3)
+    assert stats.last_turn == 5
@@ -0,0 +1,164 @@
+import contextvars
+import threading
+import time
+
+import pytest
+
+from config.llm_config import LLMConfig
+from llm.deadline import TurnDeadline, turn_deadline
+from llm.llm_interface import DeadlineExceeded, LLMInterface
+from llm.rate_limiter import (AIMDConcurrencyLimiter, PRIORITY_BACKGROUND, PRIORITY_CRITICAL, PRIORITY_NORMAL,
+                              TokenBucket, get_provider_limiter)
+from utils.concurrency import map_concurrently
+
+
+def test_token_bucket_allows_capacity_then_reports_wait():
+    bucket = TokenBucket(60)
+    assert bucket.reserve(60) == 0.0
+    # 欠1个令牌，每秒补充1个
+    assert bucket.reserve(1) == pytest.approx(1.0, abs=0.05)
+
+
+def test_token_bucket_adjust_refunds_unused_tokens():
+    bucket = TokenBucket(600)
+    bucket.reserve(600)
+    bucket.adjust(-300)
+    assert bucket.reserve(300) == 0.0
+
+
+def test_aimd_increases_additively_and_decreases_multiplicatively():
+    limiter = AIMDConcurrencyLimiter(initial_limit=4, min_limit=1, max_limit=16, target_latency=10.0)
+    limiter.acquire()
+    limiter.release(latency=1.0)
+    assert limiter.limit == pytest.approx(4.25)
+
+    limiter.acquire()
+    limiter.release(latency=0.5, overloaded=True)
+    assert limiter.limit == pytest.approx(2.125)
+
+
+def test_limiters_are_shared_only_for_identical_quotas():
+    first = get_provider_limiter('test-provider', LLMConfig(requests_per_minute=30))
+    same = get_provider_limiter('test-provider', LLMConfig(requests_per_minute=30))
+    other_quota = get_provider_limiter('test-provider', LLMConfig(requests_per_minute=600))
+    other_key = get_provider_limiter('test-provider', LLMConfig(requests_per_minute=30, api_key='second'))
+
+    assert first is same
+    assert other_quota is not first
+    assert other_quota.request_bucket.capacity == 600
+    assert other_key is not first
+
+
+def acquire_order(limiter, priorities):
+    """在唯一的并发槽位被占用时依次排队priorities中的调用，释放后返回获得槽位的顺序"""
+    order = []
+
+    def worker(priority):
+        limiter.acquire(priority)
+        order.append(priority)
+        limiter.release(latency=0.0)
+
+    limiter.acquire(PRIORITY_CRITICAL)
+    threads = []
+    for priority in priorities:
+        thread = threading.Thread(target=worker, args=(priority,))
+        thread.start()
+        threads.append(thread)
+        # 等到该调用已进入等待队列再排下一个
+        while len(limiter._waiters) < len(threads):
+            time.sleep(0.001)
+    limiter.release(latency=0.0)
+    for thread in threads:
+        thread.join(timeout=5)
+    return order
+
+
+def single_slot_limiter(aging_interval):
+    return AIMDConcurrencyLimiter(initial_limit=1, min_limit=1, max_limit=1, target_latency=10.0,
+                                  aging_interval=aging_interval)
+
+
+def test_critical_calls_jump_ahead_under_contention():
+    order = acquire_order(single_slot_limiter(aging_interval=10.0),
+                          [PRIORITY_BACKGROUND, PRIORITY_NORMAL, PRIORITY_CRITICAL])
+    assert order == [PRIORITY_CRITICAL, PRIORITY_NORMAL, PRIORITY_BACKGROUND]
+
+
+def test_waiting_background_calls_age_past_new_critical_calls():
+    # 老化间隔极短时，先排队的后台调用等待的时间已足以提升到最高优先级
+    limiter = single_slot_limiter(aging_interval=1e-6)
+    order = acquire_order(limiter, [PRIORITY_BACKGROUND, PRIORITY_CRITICAL])
+    assert order == [PRIORITY_BACKGROUND, PRIORITY_CRITICAL]
+
+
+def test_queued_acquire_gives_up_after_timeout():
+    limiter = single_slot_limiter(aging_interval=10.0)
+    limiter.acquire(PRIORITY_CRITICAL)
+    started = time.monotonic()
+    assert limiter.acquire(PRIORITY_NORMAL, timeout=0.1) is False
+    assert 0.1 <= time.monotonic() - started < 1.0
+    assert limiter._waiters == [] and limiter.in_flight == 1
+
+    limiter.release(latency=0.0)
+    assert limiter.acquire(PRIORITY_NORMAL, timeout=0.1) is True
+
+
+def saturated_interface(monkeypatch, api_key):
+    """只有一个并发槽位且已被占用的LLM接口，记录每次调用的超时"""
+    timeouts = []
+    monkeypatch.setattr(LLMInterface, 'setup_llm_client', lambda self: setattr(self, 'client_type', 'offline'))
+    monkeypatch.setattr(LLMInterface, '_call_provider',
+                        lambda self, *args, timeout=None, **kwargs: (timeouts.append(timeout) or 'text', 10))
+    interface = LLMInterface(LLMConfig(api_key=api_key, initial_concurrency=1, min_concurrency=1, max_concurrency=1))
+    interface.rate_limiter.concurrency.acquire(PRIORITY_CRITICAL)
+    return interface, timeouts
+
+
+def test_queued_call_is_cancelled_when_its_reserve_passes(monkeypatch):
+    interface, timeouts = saturated_interface(monkeypatch, 'saturated-cancel')
+    concurrency = interface.rate_limiter.concurrency
+    deadline = TurnDeadline(1.0, background_reserve=0.8)
+
+    started = time.monotonic()
+    with turn_deadline(deadline), pytest.raises(DeadlineExceeded):
+        interface.generate_response('narrate', priority=PRIORITY_BACKGROUND)
+    assert time.monotonic() - started < 0.6
+    assert timeouts == []
+    assert [d['action'] for d in deadline.degradations] == ['queue_timed_out']
+    assert concurrency._waiters == [] and concurrency.in_flight == 1
+    concurrency.release(latency=0.0)
+
+
+def test_call_that_waited_in_queue_uses_the_remaining_time(monkeypatch):
+    interface, timeouts = saturated_interface(monkeypatch, 'saturated-timeout')
+    concurrency = interface.rate_limiter.concurrency
+    deadline = TurnDeadline(2.0, normal_reserve=0.25)
+    threading.Timer(0.3, concurrency.release, kwargs={'latency': 0.0}).start()
+
+    with turn_deadline(deadline):
+        assert interface.generate_response('advise', priority=PRIORITY_NORMAL) == 'text'
+    # 超时在获得槽位之后计算，扣除了排队的时间
+    assert timeouts[0] <= 1.5 - 0.3 + 0.01
+    assert concurrency.in_flight == 0
+
+
+def test_map_concurrently_preserves_order_and_context():
+    variable = contextvars.ContextVar('variable', default=None)
+    variable.set('turn')
+    started = threading.Barrier(3, timeout=5)
+
+    def work(item):
+        started.wait()  # 三个任务同时运行才能通过
+        return item, variable.get()
+
+    assert map_concurrently(work, [1, 2, 3], max_workers=3) == [(1, 'turn'), (2, 'turn'), (3, 'turn')]
+
+
+def test_map_concurrently_reraises_task_errors():
+    def work(item):
+        if item == 2:
+            raise ValueError(item)
+        return item
+
+    with pytest.raises(ValueError):
+        map_concurrently(work, [1, 2, 3], max_workers=2)
@@ -0,0 +1,97 @@
+import json
+import logging
+import sys
+
+import pytest
+
+import main
+from config.simulation_config import SimulationConfig
+from llm.llm_interface import LLMInterface
+from utils.checkpoint import list_resume_points, load_resume_point
+
+
+class CivilizationConfig:
+    def __init__(self, id, name):
+        self.id = id
+        self.name = name
+        self.initial_state = {'population': 1000}
+
+
+@pytest.fixture(autouse=True)
+def offline_llm(monkeypatch):
+    """不连接提供商：结构化请求返回按schema填充的默认值，其余返回固定文本"""
+    def call_provider(self, full_prompt, model, temperature, max_tokens, json_schema=None, timeout=None):
+        if json_schema is not None:
+            defaults = {'array': [], 'number': 0, 'integer': 0, 'string': '', 'boolean': False, 'object': {}}
+            response = {}
+            for key, spec in json_schema.get('properties', {}).items():
+                kind = spec.get('type')
+                response[key] = defaults.get(kind[0] if isinstance(kind, list) else kind)
+            return json.dumps(response), 10
+        return 'narrative', 10
+
+    monkeypatch.setattr(LLMInterface, 'setup_llm_client', lambda self: setattr(self, 'client_type', 'offline'))
+    monkeypatch.setattr(LLMInterface, '_call_provider', call_provider)
+
+
+def make_config(output_dir, max_turns):
+    # 快进覆盖全部回合，各文明使用不调用LLM的启发式策略
+    return SimulationConfig(
+        max_turns=max_turns,
+        world_size={'width': 6, 'height': 6},
+        civilizations=[CivilizationConfig('a', 'A'), CivilizationConfig('b', 'B')],
+        seed=11,
+        output_dir=str(output_dir),
+        save_interval=2,
+        fast_forward_turns=max_turns
+    )
+
+
+def run(config, resume=False):
+    return main.run_simulation(config, LLMInterface(), logging.getLogger('test'), resume=resume)
+
+
+def test_resume_continues_from_last_resume_point(tmp_path):
+    run(make_config(tmp_path / 'resumed', 3))
+    assert [turn for turn, _ in list_resume_points(str(tmp_path / 'resumed' / 'checkpoints'))] == [2, 3]
+
+    resumed = run(make_config(tmp_path / 'resumed', 6), resume=True)
+    uninterrupted = run(make_config(tmp_path / 'uninterrupted', 6))
+
+    assert resumed['world_state'].current_turn == 6
+    assert resumed['world_state'].civilization_states == uninterrupted['world_state'].civilization_states
+    assert (tmp_path / 'resumed' / 'full_narrative.txt').read_text(encoding='utf-8') == 'narrative'
+
+
+def test_resume_without_resume_point_starts_over(tmp_path):
+    result = run(make_config(tmp_path, 2), resume=True)
+    assert result['world_state'].current_turn == 2
+
+
+def test_cli_resume(tmp_path, monkeypatch, capsys):
+    output_dir = str(tmp_path / 'cli')
+    monkeypatch.setattr(sys, 'argv', ['main.py', '--output', output_dir, '--turns', '2'])
+    assert main.main() == 0
+    assert 'Starting turn 2' in capsys.readouterr().out
+
+    monkeypatch.setattr(sys, 'argv', ['main.py', '--output', output_dir, '--turns', '3', '--resume'])
+    assert main.main() == 0
+    started = [line for line in capsys.readouterr().out.splitlines() if line.startswith('Starting turn')]
+    assert started == ['Starting turn 3']
+
+
+def test_resume_point_excludes_observer_history(tmp_path):
+    run(make_config(tmp_path, 4))
+    state = load_resume_point(str(tmp_path / 'checkpoints'))
+    assert 'history' not in state['system_agents']['observer']
+
+    # 恢复点之前的历史从磁盘历史存储读取
+    resumed = run(make_config(tmp_path, 6), resume=True)
+    assert list(resumed['history']) == [1, 2, 3, 4, 5, 6]
+    assert resumed['history'][2]['world_state']['current_turn'] == 2
+
+
+def test_fresh_run_discards_history_left_in_the_output_directory(tmp_path):
+    run(make_config(tmp_path, 4))
+    result = run(make_config(tmp_path, 2))
+    assert list(result['history']) == [1, 2]
@@ -0,0 +1,94 @@
+import json
+
+import pytest
+
+from llm.structured_output import (IncrementalJSONParser, SchemaValidationError, extract_first_json,
+                                   parse_type_hint, repair_json, to_json_schema, validate_response)
+
+ORDER_FORMAT = {'type': 'string', 'target': 'string or null', 'resources': 'number', 'priority': 'integer'}
+
+
+def test_type_hints():
+    assert parse_type_hint('number') == ('number', False)
+    assert parse_type_hint('string or null') == ('string', True)
+    assert parse_type_hint('integer number of turns') == ('integer', False)
+    assert parse_type_hint('Detailed description of the event') == (None, False)
+
+
+def test_response_format_to_json_schema():
+    schema = to_json_schema({'summary': 'string', 'orders': [ORDER_FORMAT]})
+    assert schema['required'] == ['summary', 'orders']
+    assert schema['properties']['orders']['type'] == 'array'
+    item = schema['properties']['orders']['items']
+    assert item['properties']['target']['type'] == ['string', 'null']
+    assert item['properties']['priority']['type'] == 'integer'
+    assert to_json_schema('free text') == {'description': 'free text'}
+
+
+def test_incremental_parser_across_chunks():
+    parser = IncrementalJSONParser()
+    chunks = ['Sure, here it is: {"a": "has } brace", ', '"b": [1, {"c": "\\"q\\""}]', '} and more {"x": 1}']
+    results = [parser.feed(chunk) for chunk in chunks]
+    assert results == [False, False, True]
+    assert parser.result == {'a': 'has } brace', 'b': [1, {'c': '"q"'}]}
+
+
+def test_incremental_parser_skips_invalid_candidate():
+    parser = IncrementalJSONParser()
+    assert parser.feed('{not json at all} then {"ok": true}')
+    assert parser.result == {'ok': True}
+
+
+@pytest.mark.parametrize('text, expected', [
+    ('{"a": 1, "b": [1, 2,],}', {'a': 1, 'b': [1, 2]}),
+    ('{"a": True, "b": None}', {'a': True, 'b': None}),
+    ('{"a": 1, // note\n "b": 2}', {'a': 1, 'b': 2}),
+    ('{"a": "line\nbreak"}', {'a': 'line\nbreak'}),
+])
+def test_repair_common_mistakes(text, expected):
+    assert json.loads(repair_json(text)) == expected
+
+
+@pytest.mark.parametrize('text, expected', [
+    ('{"a": [1, 2', {'a': [1, 2]}),
+    ('{"a": "trunc', {'a': 'trunc'}),
+    ('{"a": 1, "b":', {'a': 1, 'b': None}),
+    ('{"a": 1, "dangling', {'a': 1}),
+])
+def test_repair_truncated_output(text, expected):
+    assert json.loads(repair_json(text)) == expected
+
+
+def test_extract_first_json_reports_truncation():
+    assert extract_first_json('```json\n{"a": 1}\n```') == ({'a': 1}, False)
+    assert extract_first_json('{"orders": [{"type": "train"}, {"ty') == ({'orders': [{'type': 'train'}, {}]}, True)
+    with pytest.raises(ValueError):
+        extract_first_json('no json here')
+
+
+def test_validate_coerces_types_and_fills_optional_fields():
+    data = {'summary': 42, 'orders': {'type': 'train', 'resources': '20', 'priority': 1.0}}
+    result = validate_response(data, {'summary': 'string', 'orders': [ORDER_FORMAT], 'notes': [ORDER_FORMAT]})
+    assert result == {
+        'summary': '42',
+        'orders': [{'type': 'train', 'target': None, 'resources': 20, 'priority': 1}],
+        'notes': []
+    }
+
+
+def test_validate_reports_every_error():
+    with pytest.raises(SchemaValidationError) as error:
+        validate_response({'orders': [{'type': 'a', 'resources': 'lots', 'priority': True}]},
+                          {'summary': 'string', 'orders': [ORDER_FORMAT]})
+    assert error.value.errors == [
+        '$.summary: missing',
+        "$.orders[0].resources: expected number, got 'lots'",
+        '$.orders[0].priority: expected integer, got boolean'
+    ]
+
+
+def test_validate_drops_incomplete_last_item_only_when_truncated():
+    data = {'orders': [{'type': 'a', 'resources': 1, 'priority': 1}, {'type': 'b'}]}
+    assert len(validate_response(data, {'orders': [ORDER_FORMAT]}, truncated=True)['orders']) == 1
+    with pytest.raises(SchemaValidationError):
+        validate_response(data, {'orders': [ORDER_FORMAT]})
@@ -0,0 +1,81 @@
+import numpy as np
+
+from agents.civilization_agents.leader_agent import LeaderAgent
+from llm.llm_interface import LLMInterface
+from models.decision import NON_LLM_SOURCES, SOURCE_HEURISTIC, SOURCE_SURROGATE, build_decision
+from models.surrogate import DecisionSurrogate, SoftmaxRegression, extract_samples
+from models.world_state import WorldState
+
+
+def states(military_a=100):
+    return {
+        'a': {'population': 1000, 'military_power': military_a, 'economic_power': 100, 'technology_level': 1,
+              'cultural_influence': 50, 'happiness': 50, 'diplomatic_relations': {'b': 0}},
+        'b': {'population': 1000, 'military_power': 100, 'economic_power': 100, 'technology_level': 1,
+              'cultural_influence': 50, 'happiness': 50, 'diplomatic_relations': {'a': 0}}
+    }
+
+
+def turn(civ_states, source=None, military_order=None):
+    leader = {'summary': 'x'} if source is None else {'summary': 'x', 'source': source}
+    military = [{'details': military_order}] if military_order else []
+    return {'civilization_states': civ_states, 'decisions': {'a': {'leader': leader, 'military': military}}}
+
+
+def test_build_decision_fills_every_department_and_tags_source():
+    decision = build_decision({'military_orders': [{'type': 'defend', 'target': 'b'}],
+                               'economic_orders': [{'type': 'build', 'target': None}]}, SOURCE_SURROGATE)
+    assert decision['summary'] == 'defend:b; build'
+    assert decision['cultural_orders'] == [] and decision['diplomatic_orders'] == []
+    assert decision['source'] == SOURCE_SURROGATE
+    assert build_decision({}, SOURCE_HEURISTIC)['summary'] == 'hold'
+
+
+def test_softmax_regression_separates_classes():
+    features = np.array([[-2.0], [-1.0], [1.0], [2.0]])
+    model = SoftmaxRegression(['low', 'high'], epochs=300).fit(features, ['low', 'low', 'high', 'high'])
+    probabilities = model.predict_proba(np.array([[-1.5], [1.5]]))
+    assert np.allclose(probabilities.sum(axis=1), 1.0)
+    assert probabilities[0, 0] > 0.8 and probabilities[1, 1] > 0.8
+
+
+def test_extract_samples_skips_non_llm_decisions():
+    defend = {'type': 'defend', 'target': 'b', 'priority': 1}
+    history = {1: turn(states())}
+    for number, source in enumerate(NON_LLM_SOURCES + (None,), start=2):
+        history[number] = turn(states(), source=source, military_order=defend)
+    samples = extract_samples(history)
+    assert len(samples) == 1
+    assert samples[0][2]['military'] == defend
+
+
+def test_heuristic_and_surrogate_decisions_are_excluded_from_training(monkeypatch):
+    monkeypatch.setattr(LLMInterface, 'setup_llm_client', lambda self: setattr(self, 'client_type', 'offline'))
+    # 启发式决策和代理模型决策的来源标记必须与extract_samples过滤的来源一致
+    world_state = WorldState({'width': 2, 'height': 2}, {}, {}, {}, current_turn=1)
+    for civ_id, state in states().items():
+        world_state.update_civilization_state(civ_id, state)
+    heuristic = LeaderAgent('Leader', 'a', 'balanced').heuristic_decision(world_state)
+
+    surrogate = DecisionSurrogate().fit([('a', states(), {'military': {'type': 'train', 'target': None}})])
+    predicted, _ = surrogate.predict('a', states())
+    assert {heuristic['source'], predicted['source']} == set(NON_LLM_SOURCES)
+
+    history = {1: turn(states()), 2: turn(states())}
+    history[2]['decisions']['a']['leader'] = heuristic
+    history[3] = turn(states())
+    history[3]['decisions']['a']['leader'] = predicted
+    assert extract_samples(history) == []
+
+
+def test_surrogate_save_load_round_trip(tmp_path):
+    samples = [('a', states(military_a), {'military': {'type': kind, 'target': None}})
+               for military_a, kind in [(50, 'train'), (60, 'train'), (200, 'attack'), (220, 'attack')]]
+    surrogate = DecisionSurrogate().fit(samples, epochs=300)
+    path = str(tmp_path / 'surrogate')
+    surrogate.save(path)
+    loaded = DecisionSurrogate.load(path)
+
+    for military_a in (55, 210):
+        assert loaded.predict('a', states(military_a)) == surrogate.predict('a', states(military_a))
+    assert surrogate.predict('a', states(210))[0]['military_orders'][0]['type'] == 'attack'
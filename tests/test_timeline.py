@@ -0,0 +1,85 @@
+import json
+import pickle
+
+import pytest
+
+from config.llm_config import LLMConfig
+from config.simulation_config import SimulationConfig
+from core.simulation import Simulation
+from core.timeline import fork_simulation
+from llm.llm_interface import LLMInterface
+
+
+class CivilizationConfig:
+    def __init__(self, id, name):
+        self.id = id
+        self.name = name
+        self.initial_state = {'population': 1000}
+
+
+@pytest.fixture
+def calls(monkeypatch):
+    """记录每次LLM调用使用的接口配置和模型"""
+    calls = []
+
+    def call_provider(self, full_prompt, model, temperature, max_tokens, json_schema=None, timeout=None):
+        calls.append((self.config.api_key, model))
+        return (json.dumps({}) if json_schema is not None else 'narrative'), 10
+
+    monkeypatch.setattr(LLMInterface, 'setup_llm_client', lambda self: setattr(self, 'client_type', 'offline'))
+    monkeypatch.setattr(LLMInterface, '_call_provider', call_provider)
+    return calls
+
+
+def parent_simulation(tmp_path, civilizations):
+    config = SimulationConfig(
+        max_turns=4,
+        world_size={'width': 4, 'height': 4},
+        civilizations=civilizations,
+        seed=5,
+        output_dir=str(tmp_path),
+        save_interval=100
+    )
+    llm_interface = LLMInterface(LLMConfig(api_key='parent-key', model='custom-model'))
+    simulation = Simulation(config, llm_interface)
+    simulation.initialize()
+    simulation.fast_forward(1)
+    return simulation
+
+
+def branch_agents(simulation):
+    agents = list(simulation.system_agents().values())
+    for civilization in simulation.civilizations.values():
+        agents.append(civilization.leader)
+        agents.extend(civilization.leader.advisors.values())
+    return agents
+
+
+def test_branch_uses_the_parent_llm_interface(tmp_path, calls):
+    parent = parent_simulation(tmp_path, [CivilizationConfig('a', 'A'), CivilizationConfig('b', 'B')])
+    branch = fork_simulation(parent, branches=1)[0]
+    simulation = branch.build()
+    assert all(agent.llm_interface is parent.llm_interface for agent in branch_agents(simulation))
+    branch.close()
+
+
+def test_forked_branch_turn_calls_the_parent_model(tmp_path, calls):
+    parent = parent_simulation(tmp_path, [])
+    branch = fork_simulation(parent, branches=1)[0]
+    branch.run(until_turn=2)
+    branch.close()
+    assert calls
+    assert set(calls) == {('parent-key', 'custom-model')}
+
+
+def test_branch_in_another_process_rebuilds_the_interface_from_config(tmp_path, calls):
+    parent = parent_simulation(tmp_path, [CivilizationConfig('a', 'A')])
+    shipped = pickle.loads(pickle.dumps(fork_simulation(parent, branches=1)[0]))
+    assert shipped.llm_interface is None
+
+    simulation = shipped.build()
+    interface = simulation.observer.llm_interface
+    assert interface is not parent.llm_interface
+    assert (interface.config.api_key, interface.config.model) == ('parent-key', 'custom-model')
+    assert all(agent.llm_interface is interface for agent in branch_agents(simulation))
+    shipped.close()
@@ -0,0 +1,63 @@
+from core.event_effects import EventEffectEngine
+from models.world_state import WorldState
+
+
+def make_world():
+    world_state = WorldState({'width': 2, 'height': 2}, {}, {}, {}, current_turn=1)
+    world_state.update_civilization_state('a', {'population': 1000, 'economic_power': 10})
+    world_state.update_civilization_state('b', {'population': 2000, 'economic_power': 20})
+    return world_state
+
+
+def add_effect_event(world_state, engine, duration=3):
+    event = {'title': 'boom', 'target_civilization': 'a', 'effects': {'economic': 1}, 'duration': duration,
+             'turns_remaining': duration}
+    world_state.add_event(event)
+    engine.schedule(event, world_state.current_turn)
+    return event
+
+
+def test_unchanged_state_is_shared_between_snapshots():
+    world_state = make_world()
+    world_state.add_event({'title': 'quiet'})
+    first = world_state.snapshot()
+    world_state.update_civilization_state('a', {'population': 1100})
+    second = world_state.snapshot()
+
+    assert second.civilization_states['b'] is first.civilization_states['b']
+    assert second.civilization_states['a'] is not first.civilization_states['a']
+    assert first.civilization_states['a']['population'] == 1000
+    assert dict(second.event_buckets)[1] is dict(first.event_buckets)[1]
+
+
+def test_snapshot_events_are_not_changed_by_effect_engine():
+    world_state = make_world()
+    engine = EventEffectEngine()
+    event = add_effect_event(world_state, engine)
+
+    engine.apply_turn(world_state)
+    first = world_state.snapshot()
+    assert first.events[0]['turns_remaining'] == 2
+
+    world_state.current_turn = 2
+    engine.apply_turn(world_state)
+    second = world_state.snapshot()
+
+    assert event['turns_remaining'] == 1
+    assert first.events[0]['turns_remaining'] == 2
+    assert second.events[0]['turns_remaining'] == 1
+
+
+def test_expired_event_reaches_snapshot():
+    world_state = make_world()
+    engine = EventEffectEngine()
+    add_effect_event(world_state, engine, duration=1)
+    before = world_state.snapshot()
+
+    world_state.current_turn = 2
+    expired = engine.apply_turn(world_state)
+    after = world_state.snapshot()
+
+    assert [e['title'] for e in expired] == ['boom']
+    assert before.events[0]['turns_remaining'] == 1
+    assert after.events[0]['turns_remaining'] == 0
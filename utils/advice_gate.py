@@ -0,0 +1,78 @@
+import numbers
+
+class AdviceGate:
+    """按输入变化决定顾问是否重新生成建议
+
+    顾问把写入提示词的输入交给lookup()：与上次生成建议时的输入相同，或所有数值字段的变化都在容差内时
+    沿用上次的建议，否则返回None由顾问重新调用LLM并store()新的建议。比较的基准始终是上次生成建议时的输入，
+    小变化累积超过容差后也会刷新；距上次生成满refresh_interval回合时无论输入如何都强制刷新。
+
+    tolerances为 字段 -> 容差，字段可以是完整路径（如 'civilization_state.population'）或末级键名
+    （如 'happiness'）；数值表示绝对容差，'2%' 形式的字符串表示相对容差。未列出的字段必须完全相同。
+    """
+
+    def __init__(self, refresh_interval=5, tolerances=None):
+        self.refresh_interval = refresh_interval
+        self.tolerances = dict(tolerances or {})
+        self._inputs = None  # 上次生成建议时的输入（展平为 路径 -> 值）
+        self._advice = None
+        self._turn = None  # 上次生成建议的回合
+        self.reused = 0  # 沿用建议的次数
+        self.refreshed = 0  # 重新生成建议的次数
+
+    def lookup(self, turn, inputs):
+        """输入未变化（或在容差内）且未到强制刷新时返回上次的建议，否则返回None"""
+        if self._inputs is None:
+            return None
+        if self.refresh_interval and turn - self._turn >= self.refresh_interval:
+            return None
+        if not self._matches(_flatten(inputs)):
+            return None
+        self.reused += 1
+        return self._advice
+
+    def store(self, turn, inputs, advice):
+        """记录新生成的建议及其输入"""
+        self._inputs = _flatten(inputs)
+        self._advice = advice
+        self._turn = turn
+        self.refreshed += 1
+
+    def _matches(self, inputs):
+        if inputs.keys() != self._inputs.keys():
+            return False
+        for path, value in inputs.items():
+            previous = self._inputs[path]
+            if value == previous:
+                continue
+            if not (_is_number(value) and _is_number(previous)):
+                return False
+            tolerance = self.tolerances.get(path, self.tolerances.get(path.rsplit('.', 1)[-1]))
+            if tolerance is None or abs(value - previous) > self._absolute(tolerance, previous):
+                return False
+        return True
+
+    @staticmethod
+    def _absolute(tolerance, reference):
+        if isinstance(tolerance, str) and tolerance.endswith('%'):
+            return abs(reference) * float(tolerance[:-1]) / 100
+        return float(tolerance)
+
+
+def _is_number(value):
+    return isinstance(value, numbers.Number) and not isinstance(value, bool)
+
+
+def _flatten(value, prefix=''):
+    """把嵌套的字典/列表展平为 路径 -> 末级值，同时得到输入的独立副本"""
+    if isinstance(value, dict):
+        flat = {}
+        for key in sorted(value, key=str):
+            flat.update(_flatten(value[key], f"{prefix}.{key}" if prefix else str(key)))
+        return flat
+    if isinstance(value, (list, tuple)):
+        flat = {f"{prefix}.#": len(value)}
+        for index, item in enumerate(value):
+            flat.update(_flatten(item, f"{prefix}.{index}"))
+        return flat
+    return {prefix: value}
@@ -0,0 +1,309 @@
+import glob
+import json
+import lzma
+import os
+import pickle
+import queue
+import random
+import re
+import threading
+import zlib
+
+from utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+_COMPRESSORS = {
+    'zlib': (zlib.compress, zlib.decompress),
+    'lzma': (lzma.compress, lzma.decompress)
+}
+
+_CHECKPOINT_PATTERN = re.compile(r'checkpoint_(\d+)\.(full|delta)\.(zlib|lzma)$')
+_RESUME_PATTERN = re.compile(r'resume_(\d+)\.pkl\.(zlib|lzma)$')
+
+RESUME_FORMAT_VERSION = 1
+
+_STOP = object()
+
+class CheckpointWriter:
+    """后台增量检查点写入
+
+    submit()只把不可变的世界快照放入队列，序列化、压缩和写盘都在后台线程完成。
+    每full_interval个检查点写一次完整检查点，其间只写相对上一个检查点的变化：
+    文明状态按快照间的对象共享判断是否变化，事件只写新的或有变化的回合桶（快照中有变化的桶是新的元组），灾害只写新增部分。
+    文件先写临时文件并fsync，再原子替换为正式文件名。
+    """
+
+    def __init__(self, directory, compression='zlib', full_interval=10, keep_resume=2):
+        if compression not in _COMPRESSORS:
+            raise ValueError(f"不支持的压缩方式: {compression}")
+        self.directory = directory
+        self.compression = compression
+        self.full_interval = full_interval  # 每隔多少个检查点写一次完整检查点
+        self.keep_resume = keep_resume  # 保留的恢复点个数
+
+        self._compress = _COMPRESSORS[compression][0]
+        self._queue = queue.Queue()
+        self._previous = None  # 上一个检查点的快照（只在后台线程中访问）
+        self._since_full = 0
+        self.last_error = None
+
+        if not os.path.exists(directory):
+            os.makedirs(directory)
+
+        self._thread = threading.Thread(target=self._run, name="checkpoint-writer", daemon=True)
+        self._thread.start()
+
+    def submit(self, turn, snapshot, extra=None, files=None):
+        """提交检查点，立即返回
+
+        snapshot为WorldSnapshot；extra为需要一并保存的可JSON序列化数据；
+        files为 相对路径 -> 文本内容，由后台线程写入检查点目录之外的输出文件。
+        """
+        self._queue.put((self._write, (turn, snapshot, extra, files)))
+
+    def submit_state(self, turn, state):
+        """提交完整的恢复点（见capture_simulation_state）
+
+        状态在调用线程中序列化，保证与当前回合一致；压缩和写盘在后台线程完成。
+        """
+        payload = pickle.dumps(state, protocol=pickle.HIGHEST_PROTOCOL)
+        self._queue.put((self._write_state, (turn, payload)))
+
+    def flush(self):
+        """等待已提交的检查点全部写完"""
+        self._queue.join()
+
+    def close(self):
+        if self._thread.is_alive():
+            self._queue.put(_STOP)
+            self._thread.join()
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            try:
+                if item is _STOP:
+                    return
+                write, args = item
+                write(*args)
+            except Exception as e:
+                self.last_error = e
+                logger.error(f"写入检查点时出错: {e}")
+            finally:
+                self._queue.task_done()
+
+    def _write(self, turn, snapshot, extra, files):
+        full = self._previous is None or self._since_full >= self.full_interval
+        record = self._full_record(snapshot) if full else self._delta_record(snapshot, self._previous)
+        record['turn'] = turn
+        record['extra'] = extra
+
+        payload = self._compress(json.dumps(record, ensure_ascii=False, default=str).encode('utf-8'))
+        kind = 'full' if full else 'delta'
+        atomic_write(os.path.join(self.directory, f"checkpoint_{turn:06d}.{kind}.{self.compression}"), payload)
+
+        for relative_path, content in (files or {}).items():
+            atomic_write(relative_path, content.encode('utf-8'))
+
+        self._previous = snapshot
+        self._since_full = 1 if full else self._since_full + 1
+
+    def _write_state(self, turn, payload):
+        atomic_write(os.path.join(self.directory, f"resume_{turn:06d}.pkl.{self.compression}"),
+                     self._compress(payload))
+        for _, path in list_resume_points(self.directory)[:-self.keep_resume]:
+            os.remove(path)
+
+    def _full_record(self, snapshot):
+        return {
+            'kind': 'full',
+            'size': snapshot.size,
+            'current_turn': snapshot.current_turn,
+            'civilization_states': snapshot.civilization_states,
+            'event_buckets': [[turn, list(bucket)] for turn, bucket in snapshot.event_buckets],
+            'disasters': snapshot.disasters
+        }
+
+    def _delta_record(self, snapshot, previous):
+        previous_states = previous.civilization_states
+        previous_buckets = dict(previous.event_buckets)
+        previous_disaster_count = len(previous.disasters)
+
+        return {
+            'kind': 'delta',
+            'size': snapshot.size,
+            'current_turn': snapshot.current_turn,
+            # 快照间共享的状态对象即未变化
+            'civilization_states': {civ_id: state for civ_id, state in snapshot.civilization_states.items()
+                                    if previous_states.get(civ_id) is not state},
+            'removed_civilizations': [civ_id for civ_id in previous_states
+                                      if civ_id not in snapshot.civilization_states],
+            # 快照只为版本变化的桶创建新的冻结副本，未变化的桶在快照间共享
+            'event_buckets': [[turn, list(bucket)] for turn, bucket in snapshot.event_buckets
+                              if previous_buckets.get(turn) is not bucket],
+            'retained_turns': [turn for turn, _ in snapshot.event_buckets],
+            'disasters': snapshot.disasters[previous_disaster_count:]
+        }
+
+
+def atomic_write(path, data):
+    """写入临时文件、fsync后原子替换目标文件"""
+    directory = os.path.dirname(path)
+    if directory and not os.path.exists(directory):
+        os.makedirs(directory)
+
+    temp_path = path + '.tmp'
+    with open(temp_path, 'wb') as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temp_path, path)
+
+    if hasattr(os, 'O_DIRECTORY'):
+        dir_fd = os.open(directory or '.', os.O_RDONLY | os.O_DIRECTORY)
+        try:
+            os.fsync(dir_fd)
+        finally:
+            os.close(dir_fd)
+
+
+def list_checkpoints(directory):
+    """按回合排序返回 [(回合, 类型, 路径)]"""
+    checkpoints = []
+    for path in glob.glob(os.path.join(directory, 'checkpoint_*')):
+        match = _CHECKPOINT_PATTERN.search(os.path.basename(path))
+        if match:
+            checkpoints.append((int(match.group(1)), match.group(2), path))
+    return sorted(checkpoints)
+
+
+def read_checkpoint_file(path):
+    """读取单个检查点文件"""
+    compression = path.rsplit('.', 1)[1]
+    with open(path, 'rb') as f:
+        return json.loads(_COMPRESSORS[compression][1](f.read()).decode('utf-8'))
+
+
+def load_checkpoint(directory, turn=None):
+    """从最近的完整检查点开始应用增量，还原到turn（默认最新）回合的世界状态字典"""
+    checkpoints = [c for c in list_checkpoints(directory) if turn is None or c[0] <= turn]
+    full_positions = [i for i, c in enumerate(checkpoints) if c[1] == 'full']
+    if not full_positions:
+        return None
+
+    state = None
+    for _, kind, path in checkpoints[full_positions[-1]:]:
+        record = read_checkpoint_file(path)
+        if kind == 'full':
+            state = {
+                'size': record['size'],
+                'current_turn': record['current_turn'],
+                'civilization_states': record['civilization_states'],
+                'event_buckets': dict((t, events) for t, events in record['event_buckets']),
+                'disasters': record['disasters'],
+                'extra': record['extra']
+            }
+            continue
+
+        state['size'] = record['size']
+        state['current_turn'] = record['current_turn']
+        state['civilization_states'].update(record['civilization_states'])
+        for civ_id in record['removed_civilizations']:
+            state['civilization_states'].pop(civ_id, None)
+        state['event_buckets'].update((t, events) for t, events in record['event_buckets'])
+        state['event_buckets'] = {t: state['event_buckets'][t] for t in record['retained_turns']}
+        state['disasters'].extend(record['disasters'])
+        state['extra'] = record['extra']
+
+    buckets = state.pop('event_buckets')
+    state['events'] = [event for t in sorted(buckets) for event in buckets[t]]
+    return state
+
+
+def list_resume_points(directory):
+    """按回合排序返回 [(回合, 路径)]"""
+    points = []
+    for path in glob.glob(os.path.join(directory, 'resume_*')):
+        match = _RESUME_PATTERN.search(os.path.basename(path))
+        if match:
+            points.append((int(match.group(1)), path))
+    return sorted(points)
+
+
+def load_resume_point(directory, turn=None):
+    """读取turn（默认最新）回合的恢复点，没有时返回None"""
+    points = [p for p in list_resume_points(directory) if turn is None or p[0] == turn]
+    if not points:
+        return None
+    path = points[-1][1]
+    compression = path.rsplit('.', 1)[1]
+    with open(path, 'rb') as f:
+        state = pickle.loads(_COMPRESSORS[compression][1](f.read()))
+    if state.get('version') != RESUME_FORMAT_VERSION:
+        raise ValueError(f"不支持的恢复点版本: {state.get('version')}")
+    return state
+
+
+def _civilization_agents(civilization):
+    """文明对象中的Agent：直接属性或Agent字典中的条目，键为属性路径"""
+    from agents.base_agent import BaseAgent
+
+    agents = {}
+    for key, value in vars(civilization).items():
+        if isinstance(value, BaseAgent):
+            agents[key] = value
+        elif isinstance(value, dict):
+            for name, item in value.items():
+                if isinstance(item, BaseAgent):
+                    agents[f"{key}.{name}"] = item
+    return agents
+
+
+def capture_simulation_state(turn, world_state, civilizations, system_agents, effect_engine, extra=None):
+    """收集恢复模拟所需的全部状态：世界、各Agent、事件效果、观察者位置和随机数状态"""
+    civilization_states = {}
+    for civ_id, civilization in civilizations.items():
+        agents = _civilization_agents(civilization)
+        agent_keys = {key.split('.')[0] for key in agents}
+        civilization_states[civ_id] = {
+            'attributes': {key: value for key, value in vars(civilization).items() if key not in agent_keys},
+            'agents': {key: agent.get_state() for key, agent in agents.items()}
+        }
+
+    return {
+        'version': RESUME_FORMAT_VERSION,
+        'turn': turn,
+        'world_state': world_state,
+        'civilizations': civilization_states,
+        'system_agents': {key: agent.get_state() for key, agent in system_agents.items()},
+        'effect_engine': effect_engine,
+        'random_state': random.getstate(),
+        'extra': extra or {}
+    }
+
+
+def restore_simulation_state(state, civilizations, system_agents, truncate_spill=True):
+    """将恢复点中的状态写回新创建的文明和系统Agent，返回(世界状态, 事件效果引擎)
+
+    truncate_spill为True时截掉事件归档文件中检查点之后的内容（原地恢复）；分叉时应为False。
+    """
+    for civ_id, saved in state['civilizations'].items():
+        civilization = civilizations[civ_id]
+        for key, value in saved['attributes'].items():
+            setattr(civilization, key, value)
+        agents = _civilization_agents(civilization)
+        for key, agent_state in saved['agents'].items():
+            if key in agents:
+                agents[key].set_state(agent_state)
+
+    for key, agent_state in state['system_agents'].items():
+        if key in system_agents:
+            system_agents[key].set_state(agent_state)
+
+    world_state = state['world_state']
+    if truncate_spill:
+        world_state.events.restore_spill()
+
+    random.setstate(state['random_state'])
+    return world_state, state['effect_engine']
@@ -0,0 +1,17 @@
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+
+def map_concurrently(function, items, max_workers):
+    """在线程池中对items的每一项调用function，按items的顺序返回结果
+
+    每个任务在调用线程上下文的副本中运行，当前回合的时间预算（llm.deadline）在工作线程中同样生效。
+    LLM调用由提供商限流器统一排队：并发饱和时关键调用排在建议、叙事等调用之前。
+    max_workers不大于1或只有一项时在当前线程中依次调用；任务的异常在取结果时重新抛出。
+    """
+    items = list(items)
+    if not max_workers or max_workers <= 1 or len(items) <= 1:
+        return [function(item) for item in items]
+
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(items))) as executor:
+        futures = [executor.submit(contextvars.copy_context().run, function, item) for item in items]
+        return [future.result() for future in futures]
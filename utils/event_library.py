@@ -0,0 +1,207 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+预生成事件库
+离线批量生成事件模板，运行时按(事件类型, 规模)抽样并代入文明信息，避免每回合的实时LLM调用
+"""
+
+import os
+import sys
+import json
+import random
+import argparse
+from utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+# 事件模板中的占位符，运行时替换为具体文明的信息
+CIVILIZATION_PLACEHOLDER = '{civilization_name}'
+LEADER_PLACEHOLDER = '{leader_name}'
+
+def _index_key(event_type, event_scale):
+    return f"{event_type}|{event_scale}"
+
+def _scan_offsets(data_path):
+    """扫描数据文件，重建 (事件类型|规模) -> 行偏移量 的索引"""
+    entries = {}
+    with open(data_path, 'rb') as f:
+        offset = f.tell()
+        line = f.readline()
+        while line:
+            try:
+                record = json.loads(line)
+                key = _index_key(record['event_type'], record['event_scale'])
+                entries.setdefault(key, []).append(offset)
+            except (ValueError, KeyError):
+                # 跳过被中断写入的残缺行
+                pass
+            offset = f.tell()
+            line = f.readline()
+    return entries
+
+
+class EventLibrary:
+    """只读事件库：JSON Lines数据文件 + 偏移量索引，按需随机读取单条事件"""
+
+    def __init__(self, path):
+        self.data_path = path + '.jsonl'
+        self.index_path = path + '.index.json'
+
+        if os.path.exists(self.index_path):
+            with open(self.index_path, 'r', encoding='utf-8') as f:
+                self.entries = json.load(f)['entries']
+        else:
+            self.entries = _scan_offsets(self.data_path)
+
+        self._file = open(self.data_path, 'rb')
+
+    def has(self, event_type, event_scale):
+        """检查事件库是否覆盖指定组合"""
+        return bool(self.entries.get(_index_key(event_type, event_scale)))
+
+    def sample(self, event_type, event_scale, civilization=None):
+        """随机抽取一条事件模板，并代入文明名称和领导者"""
+        offsets = self.entries.get(_index_key(event_type, event_scale))
+        if not offsets:
+            return None
+
+        self._file.seek(random.choice(offsets))
+        event = json.loads(self._file.readline())['event']
+
+        if civilization is not None:
+            replacements = {
+                CIVILIZATION_PLACEHOLDER: civilization.name,
+                LEADER_PLACEHOLDER: getattr(getattr(civilization, 'leader', None), 'name', civilization.name)
+            }
+            event = _substitute(event, replacements)
+
+        return event
+
+    def size(self):
+        """事件库中的事件总数"""
+        return sum(len(offsets) for offsets in self.entries.values())
+
+    def close(self):
+        self._file.close()
+
+
+class EventLibraryWriter:
+    """追加写入事件库；已有数据文件时从中断处继续"""
+
+    def __init__(self, path):
+        self.data_path = path + '.jsonl'
+        self.index_path = path + '.index.json'
+
+        directory = os.path.dirname(self.data_path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory)
+
+        # 以数据文件为准重建索引，中途崩溃也不会丢失已生成的事件
+        self.entries = _scan_offsets(self.data_path) if os.path.exists(self.data_path) else {}
+        self._file = open(self.data_path, 'ab')
+
+    def count(self, event_type, event_scale):
+        """已生成的指定组合事件数"""
+        return len(self.entries.get(_index_key(event_type, event_scale), []))
+
+    def add(self, event_type, event_scale, event):
+        """追加一条事件"""
+        record = {'event_type': event_type, 'event_scale': event_scale, 'event': event}
+        offset = self._file.tell()
+        self._file.write(json.dumps(record, ensure_ascii=False).encode('utf-8') + b'\n')
+        self.entries.setdefault(_index_key(event_type, event_scale), []).append(offset)
+
+    def close(self):
+        """刷新数据并原子地写入索引文件"""
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._file.close()
+
+        temp_path = self.index_path + '.tmp'
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump({'version': 1, 'entries': self.entries}, f)
+        os.replace(temp_path, self.index_path)
+
+
+def _substitute(value, replacements):
+    """递归替换字符串中的占位符"""
+    if isinstance(value, str):
+        for placeholder, replacement in replacements.items():
+            value = value.replace(placeholder, replacement)
+        return value
+    if isinstance(value, dict):
+        return {key: _substitute(item, replacements) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_substitute(item, replacements) for item in value]
+    return value
+
+def build_event_library(llm_interface, path, events_per_combination, event_types, event_scales):
+    """离线生成事件库：每个(事件类型, 规模)组合生成events_per_combination条事件"""
+    # 延迟导入，避免运行时加载事件库时引入Agent依赖
+    from agents.system_agents.event_generator import EVENT_CONTENT_FORMAT
+    from llm.prompt_templates import EVENT_GENERATION_TEMPLATE
+    from llm.llm_interface import StructuredOutputError
+
+    writer = EventLibraryWriter(path)
+    try:
+        for event_type in event_types:
+            for event_scale in event_scales:
+                while writer.count(event_type, event_scale) < events_per_combination:
+                    prompt = EVENT_GENERATION_TEMPLATE.format(
+                        civilization_name=CIVILIZATION_PLACEHOLDER,
+                        civilization_state='通用事件模板，不针对具体文明状态',
+                        event_type=event_type,
+                        event_scale=event_scale,
+                        current_turn='任意'
+                    )
+                    prompt += (f"\n请在标题和描述中用 {CIVILIZATION_PLACEHOLDER} 指代文明名称，"
+                               f"用 {LEADER_PLACEHOLDER} 指代领导者，不要编造具体名字。")
+
+                    try:
+                        event = llm_interface.generate_structured_response(
+                            prompt,
+                            response_format=EVENT_CONTENT_FORMAT,
+                            temperature=1.0
+                        )
+                    except StructuredOutputError as e:
+                        logger.warning(f"skipped one {event_scale} {event_type} event: {e}")
+                        continue
+
+                    writer.add(event_type, event_scale, event)
+
+                print(f"{event_type}/{event_scale}: {writer.count(event_type, event_scale)} events")
+    finally:
+        writer.close()
+
+def main():
+    """命令行入口：python -m utils.event_library --output <路径>"""
+    from config.llm_config import LLMConfig
+    from llm.llm_interface import LLMInterface
+    from agents.system_agents.event_generator import EventGeneratorAgent
+
+    parser = argparse.ArgumentParser(description='离线生成事件库')
+    parser.add_argument('--output', type=str, required=True, help='事件库路径（不含扩展名）')
+    parser.add_argument('--per-combination', type=int, default=1000, help='每个(类型, 规模)组合生成的事件数')
+    parser.add_argument('--api-key', type=str, help='LLM API密钥')
+    parser.add_argument('--model', type=str, help='LLM模型名称')
+    args = parser.parse_args()
+
+    llm_kwargs = {'api_key': args.api_key or ''}
+    if args.model:
+        llm_kwargs['model'] = args.model
+    llm_interface = LLMInterface(LLMConfig(**llm_kwargs))
+
+    # 与运行时的事件生成器使用相同的类型和规模
+    generator = EventGeneratorAgent("事件生成器", llm_interface=llm_interface)
+    build_event_library(
+        llm_interface,
+        args.output,
+        args.per_combination,
+        generator.event_types,
+        list(generator.event_probabilities.keys())
+    )
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
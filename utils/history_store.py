@@ -0,0 +1,332 @@
+import bisect
+import os
+import pickle
+import struct
+import zlib
+from collections.abc import Mapping
+
+# 记录帧格式：4字节大端长度 + zlib压缩的pickle数据
+_FRAME_HEADER = struct.Struct('>I')
+
+class HistoryStore:
+    """按回合追加写入的历史存储
+
+    每回合写入一条压缩记录到分段日志；文明状态每keyframe_interval回合写一次完整关键帧，
+    其余回合只写相对上一回合的变化。内存中只保留回合 -> (分段, 偏移) 的索引和上一回合的
+    文明状态，因此内存占用不随回合数增长。打开已有目录时会重建索引并截掉崩溃时写了一半的记录。
+    """
+
+    def __init__(self, directory, keyframe_interval=20, segment_max_bytes=64 * 1024 * 1024):
+        self.directory = directory
+        self.keyframe_interval = keyframe_interval
+        self.segment_max_bytes = segment_max_bytes
+
+        self._index = {}  # 回合 -> (分段序号, 偏移量)
+        self._turns = []  # 已记录的回合（递增）
+        self._keyframes = []  # 关键帧回合（递增）
+        self._last_states = {}  # 上一条记录的文明状态，用于计算差量
+        self._segment = 0
+        self._file = None
+        self._read_cache = None  # (回合, 文明状态)，顺序读取时避免重复回放
+
+        if not os.path.exists(directory):
+            os.makedirs(directory)
+        self._recover()
+        self._open_segment(self._segment)
+
+    # ------------------------------------------------------------------
+    # 写入
+    # ------------------------------------------------------------------
+
+    def append_turn(self, turn, turn_data):
+        """追加一回合的数据"""
+        civilization_states = dict(turn_data.get('civilization_states', {}))
+        keyframe = not self._keyframes or turn - self._keyframes[-1] >= self.keyframe_interval
+
+        if keyframe:
+            states_record = {'full': civilization_states}
+            # 新的关键帧从新分段开始，便于按分段清理旧历史
+            if self._file.tell() >= self.segment_max_bytes:
+                self._open_segment(self._segment + 1)
+        else:
+            states_record = self._diff_states(self._last_states, civilization_states)
+
+        record = {
+            'turn': turn,
+            'keyframe': keyframe,
+            'civilization_states': states_record,
+            'world_state': self._encode_world_state(turn, turn_data.get('world_state', {})),
+            'decisions': turn_data.get('decisions', {}),
+            'interaction_results': turn_data.get('interaction_results', {}),
+            'events': turn_data.get('events', []),
+            'historical_assessment': turn_data.get('historical_assessment')
+        }
+        for key, value in turn_data.items():
+            if key not in record:
+                record[key] = value
+
+        offset = self._file.tell()
+        payload = zlib.compress(pickle.dumps(record, protocol=pickle.HIGHEST_PROTOCOL))
+        self._file.write(_FRAME_HEADER.pack(len(payload)) + payload)
+        self._file.flush()
+
+        self._index[turn] = (self._segment, offset)
+        self._turns.append(turn)
+        if keyframe:
+            self._keyframes.append(turn)
+        self._last_states = civilization_states
+
+    def truncate_after(self, turn):
+        """删除turn之后的所有记录（从检查点恢复时使用）"""
+        later = [t for t in self._turns if t > turn]
+        if not later:
+            return
+
+        segment, offset = self._index[later[0]]
+        self._file.close()
+        self._file = None
+        with open(self._segment_path(segment), 'r+b') as f:
+            f.truncate(offset)
+        for name in os.listdir(self.directory):
+            if name.startswith('segment_') and name.endswith('.log'):
+                if int(name[len('segment_'):-len('.log')]) > segment:
+                    os.remove(os.path.join(self.directory, name))
+
+        for t in later:
+            del self._index[t]
+        self._turns = [t for t in self._turns if t <= turn]
+        self._keyframes = [t for t in self._keyframes if t <= turn]
+        self._read_cache = None
+        self._open_segment(segment)
+        self._last_states = (self._reconstruct_states(self._turns[-1], self._read_record(self._turns[-1]))
+                             if self._turns else {})
+
+    def sync(self):
+        """将已写入的数据刷到磁盘"""
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def close(self):
+        if self._file:
+            self.sync()
+            self._file.close()
+            self._file = None
+
+    # ------------------------------------------------------------------
+    # 读取
+    # ------------------------------------------------------------------
+
+    def __contains__(self, turn):
+        return turn in self._index
+
+    def turns(self):
+        """已记录的回合列表"""
+        return list(self._turns)
+
+    def last_turn(self):
+        """最后记录的回合，没有记录时返回None"""
+        return self._turns[-1] if self._turns else None
+
+    def get_turn(self, turn):
+        """读取某回合的完整数据（文明状态由最近的关键帧加差量回放得到）"""
+        if turn not in self._index:
+            return {}
+
+        record = self._read_record(turn)
+        civilization_states = self._reconstruct_states(turn, record)
+
+        turn_data = dict(record)
+        turn_data.pop('turn', None)
+        turn_data.pop('keyframe', None)
+        turn_data['civilization_states'] = civilization_states
+        turn_data['world_state'] = dict(record['world_state'], civilization_states=civilization_states)
+        return turn_data
+
+    def history_view(self):
+        """返回按需读取的只读历史映射（回合 -> 回合数据）"""
+        return HistoryView(self)
+
+    # ------------------------------------------------------------------
+    # 内部实现
+    # ------------------------------------------------------------------
+
+    def _segment_path(self, segment):
+        return os.path.join(self.directory, f"segment_{segment:06d}.log")
+
+    def _open_segment(self, segment):
+        if self._file:
+            self._file.close()
+        self._segment = segment
+        self._file = open(self._segment_path(segment), 'ab')
+
+    def _recover(self):
+        """扫描已有分段重建索引，截掉不完整的尾部记录"""
+        segments = sorted(
+            int(name[len('segment_'):-len('.log')])
+            for name in os.listdir(self.directory)
+            if name.startswith('segment_') and name.endswith('.log')
+        )
+
+        for segment in segments:
+            path = self._segment_path(segment)
+            valid_end = 0
+            with open(path, 'rb') as f:
+                while True:
+                    offset = f.tell()
+                    header = f.read(_FRAME_HEADER.size)
+                    if len(header) < _FRAME_HEADER.size:
+                        break
+                    payload = f.read(_FRAME_HEADER.unpack(header)[0])
+                    try:
+                        record = pickle.loads(zlib.decompress(payload))
+                    except Exception:
+                        break
+                    self._index[record['turn']] = (segment, offset)
+                    self._turns.append(record['turn'])
+                    if record['keyframe']:
+                        self._keyframes.append(record['turn'])
+                    valid_end = f.tell()
+
+            if valid_end < os.path.getsize(path):
+                with open(path, 'r+b') as f:
+                    f.truncate(valid_end)
+            self._segment = segment
+
+        if self._turns:
+            self._last_states = self._reconstruct_states(self._turns[-1], self._read_record(self._turns[-1]))
+
+    def _read_record(self, turn):
+        segment, offset = self._index[turn]
+        if self._file and segment == self._segment:
+            self._file.flush()
+        with open(self._segment_path(segment), 'rb') as f:
+            f.seek(offset)
+            length = _FRAME_HEADER.unpack(f.read(_FRAME_HEADER.size))[0]
+            return pickle.loads(zlib.decompress(f.read(length)))
+
+    def _reconstruct_states(self, turn, record):
+        """从最近的关键帧回放差量得到某回合的文明状态"""
+        if record['keyframe']:
+            states = dict(record['civilization_states']['full'])
+        else:
+            cached_turn, cached_states = self._read_cache or (None, None)
+            position = bisect.bisect_left(self._turns, turn)
+            previous_turn = self._turns[position - 1]
+
+            if cached_turn == previous_turn:
+                states = dict(cached_states)
+                replay = [record]
+            else:
+                keyframe_turn = self._keyframes[bisect.bisect_right(self._keyframes, turn) - 1]
+                keyframe_position = bisect.bisect_left(self._turns, keyframe_turn)
+                states = dict(self._read_record(keyframe_turn)['civilization_states']['full'])
+                replay = [self._read_record(t) for t in self._turns[keyframe_position + 1:position]] + [record]
+
+            for delta_record in replay:
+                states = self._apply_diff(states, delta_record['civilization_states'])
+
+        self._read_cache = (turn, states)
+        return states
+
+    def _diff_states(self, old_states, new_states):
+        """计算文明状态的差量；快照间共享的状态对象直接跳过"""
+        changed = {}
+        removed_keys = {}
+        for civ_id, state in new_states.items():
+            old_state = old_states.get(civ_id)
+            if old_state is state:
+                continue
+            if old_state is None:
+                changed[civ_id] = dict(state)
+                continue
+            updates = {key: value for key, value in state.items()
+                       if key not in old_state or old_state[key] != value}
+            if updates:
+                changed[civ_id] = updates
+            missing = [key for key in old_state if key not in state]
+            if missing:
+                removed_keys[civ_id] = missing
+
+        return {
+            'changed': changed,
+            'removed_keys': removed_keys,
+            'removed_civilizations': [civ_id for civ_id in old_states if civ_id not in new_states]
+        }
+
+    def _apply_diff(self, states, diff):
+        """将差量应用到文明状态上（不修改原对象）"""
+        states = dict(states)
+        for civ_id in diff['removed_civilizations']:
+            states.pop(civ_id, None)
+        for civ_id, updates in diff['changed'].items():
+            states[civ_id] = dict(states.get(civ_id, {}), **updates) if civ_id in states else dict(updates)
+        for civ_id, keys in diff['removed_keys'].items():
+            states[civ_id] = {key: value for key, value in states[civ_id].items() if key not in keys}
+        return states
+
+    def _encode_world_state(self, turn, world_state):
+        """世界状态只记录本回合新增的事件和灾害，文明状态由civilization_states记录"""
+        if hasattr(world_state, 'disasters_for_turn'):
+            disasters = world_state.disasters_for_turn(turn)
+        else:
+            disasters = [d for d in world_state.get('disasters', []) if d.get('turn') == turn]
+
+        return {
+            'size': world_state.get('size'),
+            'current_turn': world_state.get('current_turn', turn),
+            'events': [event for event in world_state.get('events', []) if event.get('turn') == turn],
+            'disasters': disasters
+        }
+
+
+class HistoryView(Mapping):
+    """HistoryStore的只读映射视图，按回合顺序惰性读取"""
+
+    def __init__(self, store):
+        self._store = store
+
+    def __getitem__(self, turn):
+        if turn not in self._store:
+            raise KeyError(turn)
+        return self._store.get_turn(turn)
+
+    def __iter__(self):
+        return iter(self._store.turns())
+
+    def __len__(self):
+        return len(self._store.turns())
+
+    def __contains__(self, turn):
+        return turn in self._store
+
+
+class ChainedHistoryView(Mapping):
+    """分叉时间线的历史视图：fork_turn及之前的回合读取共享的父历史，之后读取分支自己的历史"""
+
+    def __init__(self, base, fork_turn, own):
+        self._base = base
+        self._fork_turn = fork_turn
+        self._own = own
+
+    def __getitem__(self, turn):
+        if turn <= self._fork_turn:
+            if turn in self._base:
+                return self._base[turn]
+            raise KeyError(turn)
+        return self._own[turn]
+
+    def __iter__(self):
+        for turn in self._base:
+            if turn <= self._fork_turn:
+                yield turn
+        for turn in self._own:
+            if turn > self._fork_turn:
+                yield turn
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+    def __contains__(self, turn):
+        if turn <= self._fork_turn:
+            return turn in self._base
+        return turn in self._own
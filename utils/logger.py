@@ -3,6 +3,9 @@ import os
 import sys
 from datetime import datetime
 
+# 各模块的日志记录器都是civilization_sim的子记录器；没有调用setup_logger时（如批量运行的工作进程）不输出
+logging.getLogger('civilization_sim').addHandler(logging.NullHandler())
+
 def setup_logger(name='civilization_sim', log_file=None, verbose=False):
     """设置日志记录器"""
     # 创建日志记录器
@@ -46,4 +49,8 @@ def get_default_log_file():
     if not os.path.exists(log_dir):
         os.makedirs(log_dir)
         
-    return os.path.join(log_dir, f'simulation_{timestamp}.log') 
\ No newline at end of file
+    return os.path.join(log_dir, f'simulation_{timestamp}.log')
+
+def get_logger(name):
+    """获取模块日志记录器，输出由setup_logger为civilization_sim配置的处理器统一处理"""
+    return logging.getLogger(f'civilization_sim.{name}')
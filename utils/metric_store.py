@@ -0,0 +1,195 @@
+import numpy as np
+
+# 观察者记录的基本指标及缺省值
+METRIC_DEFAULTS = {
+    'population': 0,
+    'military_power': 0,
+    'economic_power': 0,
+    'technology_level': 0,
+    'cultural_influence': 0,
+    'happiness': 50
+}
+
+class MetricStore:
+    """按列存储的文明指标
+
+    指标保存在 文明 x 指标 x 回合 的预分配数组中，外交关系保存在 文明 x 文明 x 回合 的张量中，
+    回合直接作为最后一维的下标。mask记录哪些位置有数据，后加入的文明在加入前的回合为缺失值。
+    超出预分配大小时按倍数扩容。
+    """
+
+    def __init__(self, metric_names=None, max_turns=100, initial_civilizations=8):
+        self.metric_names = list(metric_names or METRIC_DEFAULTS)
+        self._metric_index = {name: i for i, name in enumerate(self.metric_names)}
+        self.civilization_ids = []  # 行号 -> 文明ID
+        self._civ_index = {}  # 文明ID -> 行号
+
+        civ_capacity = max(1, initial_civilizations)
+        turn_capacity = max_turns + 1  # 回合从0开始编号
+        self.values = np.zeros((civ_capacity, len(self.metric_names), turn_capacity))
+        self.mask = np.zeros(self.values.shape, dtype=bool)
+        self.relations = np.zeros((civ_capacity, civ_capacity, turn_capacity))
+        self.relation_mask = np.zeros(self.relations.shape, dtype=bool)
+        self.last_turn = -1  # 已记录的最大回合
+
+    # ------------------------------------------------------------------
+    # 写入
+    # ------------------------------------------------------------------
+
+    def add_civilization(self, civ_id):
+        """登记文明，返回其行号"""
+        if civ_id in self._civ_index:
+            return self._civ_index[civ_id]
+
+        row = len(self.civilization_ids)
+        if row >= self.values.shape[0]:
+            self._grow(civ_capacity=self.values.shape[0] * 2)
+        self.civilization_ids.append(civ_id)
+        self._civ_index[civ_id] = row
+        return row
+
+    def record(self, civ_id, turn, civ_state):
+        """记录文明在某回合的指标和外交关系"""
+        if turn >= self.values.shape[2]:
+            self._grow(turn_capacity=max(turn + 1, self.values.shape[2] * 2))
+        row = self.add_civilization(civ_id)
+
+        for name, column in self._metric_index.items():
+            value = self._to_number(civ_state.get(name, METRIC_DEFAULTS.get(name, 0)))
+            if value is not None:
+                self.values[row, column, turn] = value
+                self.mask[row, column, turn] = True
+
+        for other_civ, relation in civ_state.get('diplomatic_relations', {}).items():
+            value = self._to_number(relation)
+            if value is None:
+                continue
+            other_row = self.add_civilization(other_civ)
+            self.relations[row, other_row, turn] = value
+            self.relation_mask[row, other_row, turn] = True
+
+        self.last_turn = max(self.last_turn, turn)
+
+    # ------------------------------------------------------------------
+    # 查询
+    # ------------------------------------------------------------------
+
+    def __contains__(self, civ_id):
+        return civ_id in self._civ_index
+
+    def series(self, civ_id, metric, start_turn, end_turn):
+        """返回(数值数组, 掩码数组)，为数组视图，不复制数据"""
+        row = self._civ_index[civ_id]
+        column = self._metric_index[metric]
+        return (self.values[row, column, start_turn:end_turn + 1],
+                self.mask[row, column, start_turn:end_turn + 1])
+
+    def extract(self, civ_id, start_turn, end_turn):
+        """提取文明在[start_turn, end_turn]回合的指标，缺失的回合为None"""
+        if civ_id not in self._civ_index:
+            return {}
+        row = self._civ_index[civ_id]
+        # 超出已分配回合的部分补None，保证每个列表长度都等于区间长度
+        padding = [None] * max(0, end_turn - max(start_turn, self.values.shape[2]) + 1)
+        end_turn = min(end_turn, self.values.shape[2] - 1)
+
+        extracted = {}
+        for name, column in self._metric_index.items():
+            extracted[name] = self._masked_list(
+                self.values[row, column, start_turn:end_turn + 1],
+                self.mask[row, column, start_turn:end_turn + 1]
+            ) + padding
+
+        extracted['diplomatic_relations'] = {}
+        relation_mask = self.relation_mask[row, :, start_turn:end_turn + 1]
+        for other_row in np.flatnonzero(relation_mask.any(axis=1)):
+            extracted['diplomatic_relations'][self.civilization_ids[other_row]] = self._masked_list(
+                self.relations[row, other_row, start_turn:end_turn + 1],
+                relation_mask[other_row]
+            ) + padding
+        return extracted
+
+    def history(self, civ_id):
+        """文明全部已记录的指标（只包含有数据的回合，与原列表格式兼容）"""
+        if civ_id not in self._civ_index:
+            return {}
+        row = self._civ_index[civ_id]
+        end = self.last_turn + 1
+
+        metrics = {}
+        for name, column in self._metric_index.items():
+            values = self.values[row, column, :end]
+            metrics[name] = values[self.mask[row, column, :end]].tolist()
+
+        metrics['diplomatic_relations'] = {}
+        relation_mask = self.relation_mask[row, :, :end]
+        for other_row in np.flatnonzero(relation_mask.any(axis=1)):
+            values = self.relations[row, other_row, :end]
+            metrics['diplomatic_relations'][self.civilization_ids[other_row]] = values[relation_mask[other_row]].tolist()
+        return metrics
+
+    def cross_section(self, metric, turn=None):
+        """某回合各文明的某项指标（默认最新回合），返回 文明ID -> 数值"""
+        turn = self.last_turn if turn is None else turn
+        if turn < 0 or turn >= self.values.shape[2]:
+            return {}
+        column = self._metric_index[metric]
+        count = len(self.civilization_ids)
+        values = self.values[:count, column, turn]
+        present = self.mask[:count, column, turn]
+        return {self.civilization_ids[row]: float(values[row]) for row in np.flatnonzero(present)}
+
+    def metric_matrix(self, metric, start_turn, end_turn):
+        """所有文明某项指标在回合区间内的矩阵（文明 x 回合），缺失值为NaN"""
+        column = self._metric_index[metric]
+        count = len(self.civilization_ids)
+        values = self.values[:count, column, start_turn:end_turn + 1]
+        return np.where(self.mask[:count, column, start_turn:end_turn + 1], values, np.nan)
+
+    def weighted_score(self, weights, turn=None):
+        """按权重组合多项指标得到各文明的综合分数，返回 文明ID -> 分数"""
+        turn = self.last_turn if turn is None else turn
+        if turn < 0 or turn >= self.values.shape[2]:
+            return {}
+        count = len(self.civilization_ids)
+        columns = [self._metric_index[name] for name in weights]
+        weight_vector = np.array(list(weights.values()), dtype=float)
+        values = self.values[:count, columns, turn]
+        present = self.mask[:count, columns, turn].all(axis=1)
+        scores = values @ weight_vector
+        return {self.civilization_ids[row]: float(scores[row]) for row in np.flatnonzero(present)}
+
+    # ------------------------------------------------------------------
+    # 内部实现
+    # ------------------------------------------------------------------
+
+    def _grow(self, civ_capacity=None, turn_capacity=None):
+        """扩容数组，保留已有数据"""
+        civ_capacity = civ_capacity or self.values.shape[0]
+        turn_capacity = turn_capacity or self.values.shape[2]
+        old_civs, _, old_turns = self.values.shape
+
+        values = np.zeros((civ_capacity, len(self.metric_names), turn_capacity))
+        mask = np.zeros(values.shape, dtype=bool)
+        values[:old_civs, :, :old_turns] = self.values
+        mask[:old_civs, :, :old_turns] = self.mask
+
+        relations = np.zeros((civ_capacity, civ_capacity, turn_capacity))
+        relation_mask = np.zeros(relations.shape, dtype=bool)
+        relations[:old_civs, :old_civs, :old_turns] = self.relations
+        relation_mask[:old_civs, :old_civs, :old_turns] = self.relation_mask
+
+        self.values, self.mask = values, mask
+        self.relations, self.relation_mask = relations, relation_mask
+
+    @staticmethod
+    def _masked_list(values, mask):
+        return [float(value) if present else None for value, present in zip(values, mask)]
+
+    @staticmethod
+    def _to_number(value):
+        if isinstance(value, bool):
+            return float(value)
+        if isinstance(value, (int, float, np.number)):
+            return float(value)
+        return None
@@ -0,0 +1,180 @@
+import math
+from collections import deque
+
+class RunningStats:
+    """Welford算法的在线均值和方差"""
+
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self._m2 = 0.0
+
+    def update(self, value):
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self._m2 += delta * (value - self.mean)
+
+    @property
+    def variance(self):
+        """样本方差，少于两个样本时为0"""
+        return self._m2 / (self.count - 1) if self.count > 1 else 0.0
+
+    @property
+    def std(self):
+        return math.sqrt(self.variance)
+
+
+class EWMA:
+    """指数加权移动平均"""
+
+    def __init__(self, alpha=0.3):
+        self.alpha = alpha  # 新样本权重，0-1之间
+        self.value = None
+
+    def update(self, value):
+        if self.value is None:
+            self.value = value
+        else:
+            self.value = self.alpha * value + (1 - self.alpha) * self.value
+
+
+class WindowedExtrema:
+    """最近window个样本的最小值和最大值（单调队列，每次更新均摊O(1)）"""
+
+    def __init__(self, window=10):
+        self.window = window
+        self._index = 0
+        self._min = deque()  # (序号, 值)，值递增
+        self._max = deque()  # (序号, 值)，值递减
+
+    def update(self, value):
+        while self._min and self._min[-1][1] >= value:
+            self._min.pop()
+        while self._max and self._max[-1][1] <= value:
+            self._max.pop()
+        self._min.append((self._index, value))
+        self._max.append((self._index, value))
+
+        oldest = self._index - self.window + 1
+        if self._min[0][0] < oldest:
+            self._min.popleft()
+        if self._max[0][0] < oldest:
+            self._max.popleft()
+        self._index += 1
+
+    @property
+    def minimum(self):
+        return self._min[0][1] if self._min else None
+
+    @property
+    def maximum(self):
+        return self._max[0][1] if self._max else None
+
+
+class P2Quantile:
+    """P²算法的流式分位数估计，只保存5个标记点"""
+
+    def __init__(self, p=0.5):
+        self.p = p
+        self._initial = []  # 前5个样本
+        self._heights = None  # 标记点高度
+        self._positions = None  # 标记点实际位置
+        self._desired = None  # 标记点期望位置
+        self._increments = (0.0, p / 2, p, (1 + p) / 2, 1.0)
+
+    def update(self, value):
+        if self._heights is None:
+            self._initial.append(value)
+            if len(self._initial) == 5:
+                self._heights = sorted(self._initial)
+                self._positions = [0, 1, 2, 3, 4]
+                self._desired = [0.0, 2 * self.p, 4 * self.p, 2 + 2 * self.p, 4.0]
+            return
+
+        q, n = self._heights, self._positions
+        if value < q[0]:
+            q[0] = value
+            k = 0
+        elif value >= q[4]:
+            q[4] = value
+            k = 3
+        else:
+            k = next(i for i in range(4) if q[i] <= value < q[i + 1])
+
+        for i in range(k + 1, 5):
+            n[i] += 1
+        for i in range(5):
+            self._desired[i] += self._increments[i]
+
+        # 调整中间三个标记点
+        for i in range(1, 4):
+            d = self._desired[i] - n[i]
+            if (d >= 1 and n[i + 1] - n[i] > 1) or (d <= -1 and n[i - 1] - n[i] < -1):
+                d = 1 if d > 0 else -1
+                height = self._parabolic(i, d)
+                if not q[i - 1] < height < q[i + 1]:
+                    height = q[i] + d * (q[i + d] - q[i]) / (n[i + d] - n[i])
+                q[i] = height
+                n[i] += d
+
+    def _parabolic(self, i, d):
+        q, n = self._heights, self._positions
+        return q[i] + d / (n[i + 1] - n[i - 1]) * (
+            (n[i] - n[i - 1] + d) * (q[i + 1] - q[i]) / (n[i + 1] - n[i])
+            + (n[i + 1] - n[i] - d) * (q[i] - q[i - 1]) / (n[i] - n[i - 1])
+        )
+
+    @property
+    def value(self):
+        """当前分位数估计，没有样本时为None"""
+        if self._heights is not None:
+            return self._heights[2]
+        if not self._initial:
+            return None
+        ordered = sorted(self._initial)
+        return ordered[int(round(self.p * (len(ordered) - 1)))]
+
+
+class MetricStatistics:
+    """单个指标序列的在线统计：均值/方差、EWMA、窗口极值、分位数、增长率和波动率，每次更新O(1)"""
+
+    def __init__(self, window=10, ewma_alpha=0.3, quantiles=(0.25, 0.5, 0.75)):
+        self.running = RunningStats()
+        self.ewma = EWMA(ewma_alpha)
+        self.extrema = WindowedExtrema(window)
+        self.quantiles = {p: P2Quantile(p) for p in quantiles}
+        self.growth = RunningStats()  # 相对变化率的统计，标准差即波动率
+        self.last_value = None
+        self.last_growth_rate = None
+        self.last_turn = None
+
+    def update(self, value, turn=None):
+        if self.last_value is not None and self.last_value != 0:
+            self.last_growth_rate = (value - self.last_value) / abs(self.last_value)
+            self.growth.update(self.last_growth_rate)
+
+        self.running.update(value)
+        self.ewma.update(value)
+        self.extrema.update(value)
+        for estimator in self.quantiles.values():
+            estimator.update(value)
+        self.last_value = value
+        self.last_turn = turn
+
+    def summary(self):
+        """以字典形式返回当前统计量"""
+        return {
+            'count': self.running.count,
+            'last': self.last_value,
+            'mean': self.running.mean,
+            'variance': self.running.variance,
+            'std': self.running.std,
+            'ewma': self.ewma.value,
+            'window_min': self.extrema.minimum,
+            'window_max': self.extrema.maximum,
+            'quantiles': {p: estimator.value for p, estimator in self.quantiles.items()},
+            'growth_rate': self.last_growth_rate,
+            'mean_growth_rate': self.growth.mean if self.growth.count else None,
+            'volatility': self.growth.std
+        }
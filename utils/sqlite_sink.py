@@ -0,0 +1,204 @@
+import json
+import queue
+import sqlite3
+import threading
+import time
+
+from utils.metric_store import METRIC_DEFAULTS
+from utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS turns (
+    turn INTEGER PRIMARY KEY,
+    recorded_at REAL,
+    historical_assessment TEXT
+);
+CREATE TABLE IF NOT EXISTS civilization_metrics (
+    turn INTEGER NOT NULL,
+    civ_id TEXT NOT NULL,
+    {metric_columns},
+    state TEXT,
+    PRIMARY KEY (civ_id, turn)
+);
+CREATE INDEX IF NOT EXISTS idx_civilization_metrics_turn ON civilization_metrics (turn);
+CREATE TABLE IF NOT EXISTS events (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    turn INTEGER NOT NULL,
+    type TEXT,
+    target_civ TEXT,
+    data TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_events_turn ON events (turn);
+CREATE INDEX IF NOT EXISTS idx_events_type ON events (type, turn);
+CREATE INDEX IF NOT EXISTS idx_events_target ON events (target_civ, turn);
+CREATE TABLE IF NOT EXISTS decisions (
+    turn INTEGER NOT NULL,
+    civ_id TEXT NOT NULL,
+    content TEXT,
+    PRIMARY KEY (civ_id, turn)
+);
+CREATE INDEX IF NOT EXISTS idx_decisions_turn ON decisions (turn);
+CREATE TABLE IF NOT EXISTS disasters (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    turn INTEGER NOT NULL,
+    type TEXT,
+    data TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_disasters_turn ON disasters (turn);
+"""
+
+_STOP = object()
+
+class SQLiteHistorySink:
+    """将观察者记录的回合数据写入SQLite数据库
+
+    写入在后台线程中进行，每回合一个事务，模拟主循环只需把数据放入队列。
+    数据库使用WAL模式，写入期间可以同时用query()做只读查询。
+    """
+
+    def __init__(self, db_path, max_pending_turns=100):
+        self.db_path = db_path
+        self.metric_names = list(METRIC_DEFAULTS)
+        self._queue = queue.Queue(maxsize=max_pending_turns)  # 队列满时主循环才会等待
+        self._error = None
+
+        # 建表在主线程完成，便于尽早发现路径错误
+        connection = self._connect()
+        metric_columns = ',\n    '.join(f"{name} REAL" for name in self.metric_names)
+        connection.executescript(_SCHEMA.format(metric_columns=metric_columns))
+        connection.close()
+
+        self._thread = threading.Thread(target=self._run, name="sqlite-history-sink", daemon=True)
+        self._thread.start()
+
+    def write_turn(self, turn, turn_data):
+        """提交一回合的数据；事件会被浅拷贝，后续对原事件的修改不影响写入内容"""
+        if self._error:
+            logger.error(f"历史数据库写入已停止: {self._error}")
+            return
+
+        world_state = turn_data.get('world_state', {})
+        if hasattr(world_state, 'disasters_for_turn'):
+            disasters = world_state.disasters_for_turn(turn)
+        else:
+            disasters = [d for d in world_state.get('disasters', []) if d.get('turn') == turn]
+
+        self._queue.put((turn, {
+            'civilization_states': dict(turn_data.get('civilization_states', {})),
+            'decisions': dict(turn_data.get('decisions') or {}),
+            'events': [dict(event) for event in turn_data.get('events', [])],
+            'disasters': [dict(disaster) for disaster in disasters],
+            'historical_assessment': turn_data.get('historical_assessment')
+        }))
+
+    def flush(self):
+        """等待队列中的数据全部写入"""
+        self._queue.join()
+
+    def close(self):
+        """写完剩余数据并关闭后台线程"""
+        if self._thread.is_alive():
+            self._queue.put(_STOP)
+            self._thread.join()
+
+    def truncate_after(self, turn):
+        """删除turn之后的所有记录（从检查点恢复时使用）"""
+        self.flush()
+        connection = self._connect()
+        try:
+            with connection:
+                for table in ('turns', 'civilization_metrics', 'events', 'decisions', 'disasters'):
+                    connection.execute(f"DELETE FROM {table} WHERE turn > ?", (turn,))
+        finally:
+            connection.close()
+
+    def query(self, sql, params=()):
+        """执行只读查询，返回行列表"""
+        connection = self._connect()
+        try:
+            return connection.execute(sql, params).fetchall()
+        finally:
+            connection.close()
+
+    def civilization_series(self, civ_id, metric, start_turn=None, end_turn=None):
+        """查询文明某项指标的(回合, 数值)序列"""
+        if metric not in self.metric_names:
+            raise ValueError(f"未知指标: {metric}")
+        return self.query(
+            f"SELECT turn, {metric} FROM civilization_metrics "
+            "WHERE civ_id = ? AND turn BETWEEN ? AND ? ORDER BY turn",
+            (str(civ_id),
+             start_turn if start_turn is not None else -1,
+             end_turn if end_turn is not None else 2 ** 62)
+        )
+
+    def _connect(self):
+        connection = sqlite3.connect(self.db_path)
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute("PRAGMA synchronous=NORMAL")
+        return connection
+
+    def _run(self):
+        """后台写入线程"""
+        connection = self._connect()
+        try:
+            while True:
+                item = self._queue.get()
+                try:
+                    if item is _STOP:
+                        return
+                    if not self._error:
+                        self._write(connection, *item)
+                except Exception as e:
+                    self._error = e
+                    logger.error(f"写入历史数据库时出错: {e}")
+                finally:
+                    self._queue.task_done()
+        finally:
+            connection.close()
+
+    def _write(self, connection, turn, data):
+        """在一个事务中写入一回合的数据"""
+        metric_rows = []
+        for civ_id, state in data['civilization_states'].items():
+            values = []
+            for name in self.metric_names:
+                value = state.get(name, METRIC_DEFAULTS[name])
+                values.append(value if isinstance(value, (int, float)) else None)
+            metric_rows.append((turn, str(civ_id), *values, self._dumps(state)))
+
+        placeholders = ', '.join('?' * (len(self.metric_names) + 3))
+        with connection:
+            connection.execute(
+                "INSERT OR REPLACE INTO turns (turn, recorded_at, historical_assessment) VALUES (?, ?, ?)",
+                (turn, time.time(), self._dumps(data['historical_assessment']))
+            )
+            # 重复写入同一回合时（例如从检查点恢复）先清除旧的事件和灾害
+            connection.execute("DELETE FROM events WHERE turn = ?", (turn,))
+            connection.execute("DELETE FROM disasters WHERE turn = ?", (turn,))
+            connection.executemany(
+                f"INSERT OR REPLACE INTO civilization_metrics "
+                f"(turn, civ_id, {', '.join(self.metric_names)}, state) VALUES ({placeholders})",
+                metric_rows
+            )
+            connection.executemany(
+                "INSERT INTO events (turn, type, target_civ, data) VALUES (?, ?, ?, ?)",
+                [(turn, event.get('type'),
+                  str(event['target_civilization']) if event.get('target_civilization') is not None else None,
+                  self._dumps(event))
+                 for event in data['events']]
+            )
+            connection.executemany(
+                "INSERT OR REPLACE INTO decisions (turn, civ_id, content) VALUES (?, ?, ?)",
+                [(turn, str(civ_id), self._dumps(decision)) for civ_id, decision in data['decisions'].items()]
+            )
+            connection.executemany(
+                "INSERT INTO disasters (turn, type, data) VALUES (?, ?, ?)",
+                [(turn, disaster.get('type'), self._dumps(disaster)) for disaster in data['disasters']]
+            )
+
+    @staticmethod
+    def _dumps(value):
+        return json.dumps(value, ensure_ascii=False, default=str)
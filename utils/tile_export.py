@@ -0,0 +1,207 @@
+import json
+import os
+
+import numpy as np
+
+# 每个地块导出的气候字段
+CLIMATE_VARIABLES = ('temperature', 'precipitation', 'wind_speed')
+
+MANIFEST_FILE = 'manifest.json'
+
+class TileSeriesExporter:
+    """将每回合的地块数据按变量追加写入分块的列式文件
+
+    每个变量一个目录，每chunk_turns个回合一个float32的.npy分块（形状为 回合 x 高 x 宽），
+    manifest.json记录地图大小、变量、回合和分块信息。分块保持未压缩的.npy格式，
+    读取时可以按需内存映射，只加载需要的回合和区域。地块上没有的资源记为0，
+    变量出现之前的回合记为NaN。
+    """
+
+    def __init__(self, directory, world_state, chunk_turns=16, resume_turn=None):
+        self.directory = directory
+        self.chunk_turns = chunk_turns
+        self.width = world_state.size['width']
+        self.height = world_state.size['height']
+        self._coords = [f"{x},{y}" for y in range(self.height) for x in range(self.width)]  # 行优先
+
+        self.turns = []  # 已导出的回合（按追加顺序）
+        self.variables = {}  # 变量名 -> 首次出现的回合
+        self.chunks = []  # 已写入的分块：{'index', 'first_turn', 'last_turn', 'length'}
+        self._buffers = {}  # 变量名 -> 当前分块缓冲区
+        self._buffered = 0  # 当前分块中已填充的回合数
+
+        if not os.path.exists(directory):
+            os.makedirs(directory)
+        if resume_turn is not None and os.path.exists(os.path.join(directory, MANIFEST_FILE)):
+            self._resume(resume_turn)
+
+    def _resume(self, resume_turn):
+        """从已有导出继续，丢弃resume_turn之后的回合，未满的分块重新载入缓冲区"""
+        with open(os.path.join(self.directory, MANIFEST_FILE), 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+        self.chunk_turns = manifest['chunk_turns']
+
+        self.turns = [turn for turn in manifest['turns'] if turn <= resume_turn]
+        self.variables = {name: first for name, first in manifest['variables'].items() if first <= resume_turn}
+        full_chunks, self._buffered = divmod(len(self.turns), self.chunk_turns)
+        self.chunks = [chunk for chunk in manifest['chunks'] if chunk['index'] < full_chunks]
+
+        if self._buffered:
+            for name in self.variables:
+                path = os.path.join(self.directory, name, f"chunk_{full_chunks:05d}.npy")
+                buffer = np.full((self.chunk_turns, self.height, self.width), np.nan, dtype=np.float32)
+                if os.path.exists(path):
+                    buffer[:self._buffered] = np.load(path)[:self._buffered]
+                self._buffers[name] = buffer
+            self.chunks.append({
+                'index': full_chunks,
+                'first_turn': self.turns[full_chunks * self.chunk_turns],
+                'last_turn': self.turns[-1],
+                'length': self._buffered
+            })
+        self._write_manifest()
+
+    def append(self, turn, world_state):
+        """追加一回合的地块数据"""
+        values = {}
+        for field in CLIMATE_VARIABLES:
+            values[field] = self._grid(
+                world_state.climate.get(coord, {}).get(field, np.nan) for coord in self._coords
+            )
+
+        resource_types = set()
+        for coord in self._coords:
+            resource_types.update(world_state.resources.get(coord, {}))
+        for resource in sorted(resource_types | {v[len('resource_'):] for v in self.variables if v.startswith('resource_')}):
+            values[f"resource_{resource}"] = self._grid(
+                world_state.resources.get(coord, {}).get(resource, 0.0) for coord in self._coords
+            )
+
+        for name, grid in values.items():
+            if name not in self.variables:
+                self.variables[name] = turn
+            buffer = self._buffers.get(name)
+            if buffer is None:
+                buffer = np.full((self.chunk_turns, self.height, self.width), np.nan, dtype=np.float32)
+                self._buffers[name] = buffer
+            buffer[self._buffered] = grid
+
+        self.turns.append(turn)
+        self._buffered += 1
+        if self._buffered == self.chunk_turns:
+            self.flush()
+
+    def flush(self):
+        """将当前（可能未满的）分块写入磁盘并更新manifest"""
+        if not self._buffered:
+            return
+
+        index = len(self.chunks)
+        if self.chunks and self.chunks[-1]['length'] < self.chunk_turns:
+            # 上次写入的是未满分块，继续填充同一个分块
+            index = self.chunks.pop()['index']
+
+        first_position = index * self.chunk_turns
+        for name, buffer in self._buffers.items():
+            variable_dir = os.path.join(self.directory, name)
+            if not os.path.exists(variable_dir):
+                os.makedirs(variable_dir)
+            self._atomic_save(os.path.join(variable_dir, f"chunk_{index:05d}.npy"), buffer[:self._buffered])
+
+        self.chunks.append({
+            'index': index,
+            'first_turn': self.turns[first_position],
+            'last_turn': self.turns[-1],
+            'length': self._buffered
+        })
+        if self._buffered == self.chunk_turns:
+            self._buffers = {}
+            self._buffered = 0
+        self._write_manifest()
+
+    def close(self):
+        self.flush()
+
+    def _grid(self, values):
+        return np.fromiter(values, dtype=np.float32, count=len(self._coords)).reshape(self.height, self.width)
+
+    def _atomic_save(self, path, array):
+        temp_path = path + '.tmp'
+        with open(temp_path, 'wb') as f:
+            np.save(f, array)
+        os.replace(temp_path, path)
+
+    def _write_manifest(self):
+        manifest = {
+            'width': self.width,
+            'height': self.height,
+            'dtype': 'float32',
+            'chunk_turns': self.chunk_turns,
+            'turns': self.turns,
+            'variables': self.variables,
+            'chunks': self.chunks
+        }
+        path = os.path.join(self.directory, MANIFEST_FILE)
+        with open(path + '.tmp', 'w', encoding='utf-8') as f:
+            json.dump(manifest, f)
+        os.replace(path + '.tmp', path)
+
+
+class TileSeriesReader:
+    """读取TileSeriesExporter的输出，按回合和地块范围内存映射读取"""
+
+    def __init__(self, directory):
+        self.directory = directory
+        with open(os.path.join(directory, MANIFEST_FILE), 'r', encoding='utf-8') as f:
+            self.manifest = json.load(f)
+        self.width = self.manifest['width']
+        self.height = self.manifest['height']
+        self.turns = self.manifest['turns']
+        self.variables = self.manifest['variables']
+
+    def read(self, variable, start_turn=None, end_turn=None, x_range=None, y_range=None):
+        """读取变量在[start_turn, end_turn]回合、x_range/y_range（左闭右开）区域内的数据
+
+        返回 (回合列表, 形状为 回合 x 高 x 宽 的数组)，变量不存在的回合为NaN。
+        """
+        if variable not in self.variables:
+            raise KeyError(variable)
+
+        x_slice = slice(*x_range) if x_range else slice(None)
+        y_slice = slice(*y_range) if y_range else slice(None)
+        chunk_turns = self.manifest['chunk_turns']
+
+        turns = []
+        parts = []
+        for chunk in self.manifest['chunks']:
+            if start_turn is not None and chunk['last_turn'] < start_turn:
+                continue
+            if end_turn is not None and chunk['first_turn'] > end_turn:
+                continue
+
+            first_position = chunk['index'] * chunk_turns
+            chunk_turn_list = self.turns[first_position:first_position + chunk['length']]
+            rows = [i for i, turn in enumerate(chunk_turn_list)
+                    if (start_turn is None or turn >= start_turn) and (end_turn is None or turn <= end_turn)]
+            if not rows:
+                continue
+
+            path = os.path.join(self.directory, variable, f"chunk_{chunk['index']:05d}.npy")
+            if os.path.exists(path):
+                data = np.load(path, mmap_mode='r')
+                parts.append(np.array(data[rows[0]:rows[-1] + 1, y_slice, x_slice]))
+            else:
+                # 变量出现之前的分块
+                height = len(range(self.height)[y_slice])
+                width = len(range(self.width)[x_slice])
+                parts.append(np.full((len(rows), height, width), np.nan, dtype=np.float32))
+            turns.extend(chunk_turn_list[rows[0]:rows[-1] + 1])
+
+        if not parts:
+            return [], np.empty((0, 0, 0), dtype=np.float32)
+        return turns, np.concatenate(parts)
+
+    def tile_series(self, variable, x, y, start_turn=None, end_turn=None):
+        """单个地块的时间序列"""
+        turns, data = self.read(variable, start_turn, end_turn, (x, x + 1), (y, y + 1))
+        return turns, data[:, 0, 0] if len(turns) else data.reshape(0)